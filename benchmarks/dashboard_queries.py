@@ -0,0 +1,303 @@
+"""
+Dashboard query benchmark.
+
+Replays the SQL issued by each dashboard panel (imported from ``src/dash/queries.py``, so
+the benchmark always measures what the app runs) over a grid of (year, major, subject)
+filters. It runs against the 50K cloud sample and synthetic star schemas of 1M / 10M fact
+rows. For every panel it reports p50/p95/p99 latency, rows scanned and peak RSS, and writes
+a JSON result that can be passed back as ``--baseline`` to diff a later run.
+
+    python benchmarks/dashboard_queries.py --datasets sample 1M
+    python benchmarks/dashboard_queries.py --baseline benchmarks/results/dashboard_queries.json
+
+Synthetic sources are the sample's students replicated under new ids, built through the
+regular ``convert_to_parquet`` ETL into ``data/benchmark/<dataset>/`` and reused on later runs.
+Each dataset is measured in a fresh process, so peak RSS is per dataset.
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import datetime
+from itertools import product
+import json
+import multiprocessing
+from pathlib import Path
+import platform
+import resource
+import sys
+import time
+
+import duckdb
+import numpy as np
+
+BASE_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BASE_DIR / "src" / "dash"))
+sys.path.insert(0, str(BASE_DIR / "src" / "etl"))
+
+from queries import (
+    create_star_schema_views, build_wide_filter, build_rollup_filter,
+    SUMMARY_QUERY, MAJOR_BAR_QUERY, SUBJECT_BAR_QUERY, HEATMAP_QUERY,
+    HIST_QUERY, RISK_SCATTER_QUERY, RISK_LIST_QUERY,
+    STUDENT_QUERY, HISTORY_QUERY,
+)
+from generate_star_schema import SCHEMA_VERSION, convert_to_parquet, load_manifest
+
+SAMPLE_SOURCE = BASE_DIR / 'data' / 'sample_50K_students.parquet'
+BENCHMARK_DATA_DIR = BASE_DIR / 'data' / 'benchmark'
+DEFAULT_OUTPUT = BASE_DIR / 'benchmarks' / 'results' / 'dashboard_queries.json'
+
+# Panel -> (SQL template, filter). 'wide' filters the row-level wide table; 'totals' and
+# 'by_subject' are the two rollup filters used by app.py. The at-risk count shown by the
+# Risk Analysis view is a column of the KPI summary query.
+PANELS = {
+    'kpi_summary': (SUMMARY_QUERY, 'totals'),
+    'score_histogram': (HIST_QUERY, 'wide'),
+    'major_bar': (MAJOR_BAR_QUERY, 'totals'),
+    'subject_bar': (SUBJECT_BAR_QUERY, 'by_subject'),
+    'attendance_heatmap': (HEATMAP_QUERY, 'by_subject'),
+    'risk_scatter': (RISK_SCATTER_QUERY, 'wide'),
+    'risk_list': (RISK_LIST_QUERY, 'wide'),
+}
+FILTER_BUILDERS = {
+    'wide': build_wide_filter,
+    'totals': build_rollup_filter,
+    'by_subject': lambda year, major, subject: build_rollup_filter(year, major, subject, by_subject=True),
+}
+PROFILE_PANEL = 'student_profile'
+PERCENTILES = (50, 95, 99)
+
+
+def parse_scale(name):
+    """Fact-row count of a dataset name such as '1M' or '500K'."""
+    multipliers = {'K': 1_000, 'M': 1_000_000}
+    suffix = name[-1].upper()
+    if suffix in multipliers:
+        return int(float(name[:-1]) * multipliers[suffix])
+    return int(name)
+
+def peak_rss_mb():
+    """Peak resident set size of this process (ru_maxrss is KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def write_synthetic_source(n_rows, output_path):
+    """Replicate the sample's students under new ids until about ``n_rows`` records."""
+    conn = duckdb.connect(database=':memory:')
+    sample_rows, sample_students = conn.execute(
+        f"SELECT COUNT(*), MAX(student_number) FROM '{SAMPLE_SOURCE.as_posix()}'"
+    ).fetchone()
+    replicas = max(1, round(n_rows / sample_rows))
+    tmp_path = output_path.with_name(output_path.name + '.tmp')
+    conn.execute(f"""
+        COPY (
+            SELECT s.* REPLACE (
+                s.student_id || '_R' || r.replica AS student_id,
+                s.student_number + r.replica * {int(sample_students)} AS student_number
+            )
+            FROM '{SAMPLE_SOURCE.as_posix()}' s, range({replicas}) r(replica)
+            ORDER BY r.replica, s.student_number
+        ) TO '{tmp_path.as_posix()}' (FORMAT PARQUET, COMPRESSION SNAPPY)
+    """)
+    conn.close()
+    tmp_path.replace(output_path)
+
+def prepare_dataset(name, rebuild=False):
+    """Build (or reuse) the star schema of a dataset; returns its directory."""
+    star_dir = BENCHMARK_DATA_DIR / name
+    manifest = load_manifest(star_dir) if star_dir.exists() else None
+    if not rebuild and manifest is not None and manifest.get('schema_version') == SCHEMA_VERSION:
+        return star_dir
+
+    BENCHMARK_DATA_DIR.mkdir(parents=True, exist_ok=True)
+    if name == 'sample':
+        source = SAMPLE_SOURCE
+    else:
+        source = BENCHMARK_DATA_DIR / f'synthetic_{name}.parquet'
+        print(f"🧪 Writing synthetic source for {name} ({parse_scale(name):,} rows)...")
+        write_synthetic_source(parse_scale(name), source)
+    print(f"🏗️ Building star schema for {name}...")
+    convert_to_parquet(source=str(source), output_dir=star_dir)
+    return star_dir
+
+def filter_grid(conn, values_per_dimension):
+    """'All' plus ``values_per_dimension`` evenly spaced values of each sidebar filter."""
+    def pick(query):
+        values = [row[0] for row in conn.execute(query).fetchall()]
+        if len(values) <= values_per_dimension:
+            return values
+        positions = np.linspace(0, len(values) - 1, values_per_dimension).round().astype(int)
+        return [values[i] for i in positions]
+
+    years = pick("SELECT DISTINCT year FROM dim_date ORDER BY year DESC")
+    majors = pick("SELECT DISTINCT major FROM dim_student ORDER BY major")
+    subjects = pick("SELECT DISTINCT subject FROM dim_course ORDER BY subject")
+    return list(product(["All"] + years, ["All"] + majors, ["All"] + subjects))
+
+def rows_scanned(conn, queries):
+    """
+    Rows scanned by each (sql, params) pair, from DuckDB's query profile. For Parquet
+    scans this counts the rows of the row groups the scan visited.
+    """
+    if not hasattr(conn, 'get_profiling_information'):
+        return []
+    scanned = []
+    conn.execute("PRAGMA enable_profiling = 'no_output'")
+    for sql, params in queries:
+        conn.execute(sql, params).fetchall()
+        profile = json.loads(conn.get_profiling_information(format='json'))
+        scanned.append(profile.get('cumulative_rows_scanned', 0))
+    conn.execute("PRAGMA disable_profiling")
+    return scanned
+
+def time_queries(conn, queries, repeat):
+    """Latencies in ms of executing and fetching every query group ``repeat`` times."""
+    latencies = []
+    for _ in range(repeat):
+        for group in queries:
+            start = time.perf_counter()
+            for sql, params in group:
+                conn.execute(sql, params).fetchdf()
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def summarize(latencies, scanned, cold_ms):
+    result = {'queries': len(latencies), 'cold_ms': round(cold_ms, 3)}
+    for p in PERCENTILES:
+        result[f'p{p}_ms'] = round(float(np.percentile(latencies, p)), 3)
+    result['mean_ms'] = round(float(np.mean(latencies)), 3)
+    if scanned:
+        result['rows_scanned_mean'] = int(np.mean(scanned))
+        result['rows_scanned_max'] = int(np.max(scanned))
+    return result
+
+def benchmark_dataset(star_dir, repeat, values_per_dimension, profile_students):
+    """Run every panel over the filter grid against one star schema (in a worker process)."""
+    conn = duckdb.connect(database=':memory:')
+    create_star_schema_views(conn, Path(star_dir))
+    grid = filter_grid(conn, values_per_dimension)
+    fact_rows = conn.execute("SELECT COUNT(*) FROM fact_wide").fetchone()[0]
+    # Pay the one-time DataFrame conversion setup before the first timed panel
+    conn.execute("SELECT 1").fetchdf()
+    panels = {}
+
+    for panel, (template, filter_kind) in PANELS.items():
+        queries = []
+        for year, major, subject in grid:
+            where_clause, params = FILTER_BUILDERS[filter_kind](year, major, subject)
+            queries.append([(template.format(where_clause=where_clause), params)])
+        # First execution also pays for reading the Parquet footers
+        cold_ms = time_queries(conn, queries[:1], 1)[0]
+        latencies = time_queries(conn, queries, repeat)
+        scanned = rows_scanned(conn, [q for group in queries for q in group])
+        panels[panel] = summarize(latencies, scanned, cold_ms)
+
+    # Student profile: offset lookup then the fact_id range read, for evenly spaced students
+    max_number = conn.execute("SELECT MAX(student_number) FROM dim_student").fetchone()[0]
+    queries = []
+    for student_number in np.linspace(1, max_number, profile_students).round().astype(int):
+        student = conn.execute(STUDENT_QUERY, [int(student_number)]).fetchdf()
+        if student.empty:
+            continue
+        fact_id_range = [int(student['fact_id_start'].iloc[0]), int(student['fact_id_end'].iloc[0])]
+        queries.append([(STUDENT_QUERY, [int(student_number)]), (HISTORY_QUERY, fact_id_range)])
+    cold_ms = time_queries(conn, queries[:1], 1)[0]
+    latencies = time_queries(conn, queries, repeat)
+    scanned = rows_scanned(conn, [q for group in queries for q in group])
+    # Per render (both queries), like the other panels
+    scanned = [a + b for a, b in zip(scanned[::2], scanned[1::2])]
+    panels[PROFILE_PANEL] = summarize(latencies, scanned, cold_ms)
+
+    conn.close()
+    return {
+        'fact_rows': fact_rows,
+        'filter_combinations': len(grid),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'panels': panels,
+    }
+
+def compare(results, baseline, tolerance):
+    """Print p50/p95 changes against a baseline run; returns the number of regressions."""
+    regressions = 0
+    print(f"\n📊 Comparison with baseline ({baseline.get('created', 'unknown')}):")
+    for dataset, current in results['datasets'].items():
+        previous = baseline.get('datasets', {}).get(dataset)
+        if previous is None:
+            print(f"   - {dataset}: not in baseline")
+            continue
+        for panel, stats in current['panels'].items():
+            old = previous['panels'].get(panel)
+            if old is None:
+                continue
+            change = (stats['p95_ms'] - old['p95_ms']) / old['p95_ms'] if old['p95_ms'] else 0.0
+            flag = "⚠️" if change > tolerance else "  "
+            regressions += change > tolerance
+            print(f"   {flag} {dataset:>7} {panel:<20} p50 {old['p50_ms']:8.2f} -> {stats['p50_ms']:8.2f} ms"
+                  f"   p95 {old['p95_ms']:8.2f} -> {stats['p95_ms']:8.2f} ms ({change:+.0%})")
+    return regressions
+
+def print_report(name, result):
+    print(f"\n📈 {name}: {result['fact_rows']:,} fact rows · {result['filter_combinations']} filter combinations"
+          f" · peak RSS {result['peak_rss_mb']:.0f} MB")
+    print(f"   {'panel':<20} {'cold':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'rows scanned':>14}")
+    for panel, stats in result['panels'].items():
+        print(f"   {panel:<20} {stats['cold_ms']:9.2f} {stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f}"
+              f" {stats['p99_ms']:9.2f} {stats.get('rows_scanned_mean', 0):14,}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard panel queries.")
+    parser.add_argument('--datasets', nargs='+', default=['sample', '1M', '10M'],
+                        help="'sample' and/or synthetic sizes in fact rows, e.g. 1M 10M (default: sample 1M 10M)")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs of every query (default: 3)")
+    parser.add_argument('--grid-values', type=int, default=3,
+                        help="Values per filter dimension besides 'All' (default: 3)")
+    parser.add_argument('--profile-students', type=int, default=50,
+                        help="Students looked up for the profile panel (default: 50)")
+    parser.add_argument('--output', type=Path, default=DEFAULT_OUTPUT, help="JSON result path")
+    parser.add_argument('--baseline', type=Path, default=None, help="Earlier JSON result to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed p95 slowdown before a panel counts as a regression (default: 0.25)")
+    parser.add_argument('--rebuild', action='store_true', help="Rebuild cached benchmark star schemas")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    # Read the baseline first: it may be the file this run overwrites
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+
+    results = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'duckdb': duckdb.__version__,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'repeat': args.repeat,
+        'grid_values': args.grid_values,
+        'datasets': {},
+    }
+
+    for name in args.datasets:
+        star_dir = prepare_dataset(name, args.rebuild)
+        print(f"⏱️ Benchmarking {name}...")
+        # Fresh process per dataset so peak RSS is not carried over from the previous one
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+            result = pool.submit(benchmark_dataset, str(star_dir), args.repeat,
+                                 args.grid_values, args.profile_students).result()
+        results['datasets'][name] = result
+        print_report(name, result)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results written to {args.output}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ {regressions} panel(s) slower than the baseline by more than {args.tolerance:.0%}")
+            sys.exit(1)
+        print("✅ No regressions against the baseline.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+End-to-end ETL benchmark.
+
+Runs the pipeline stages in order at one or more student counts:
+
+    generate_student_batch -> process_batch_data -> assemble
+        -> create_students_sample -> convert_to_parquet
+
+and reports wall time, CPU time, memory and bytes written per stage. Memory is the peak
+RSS growth over the RSS at the start of the stage (memory an earlier stage did not free
+is not charged again), next to the process RSS at the start. The stages run
+in a scratch workspace (``data/benchmark/etl/<scale>/``), never touching ``data/``; the
+scripts use cwd-relative paths, so the benchmark changes into the workspace.
+
+Profiling:
+  --profile        writes one cProfile file per stage (<workspace>/profiles/<stage>.prof),
+                   e.g. ``snakeviz`` or ``flameprof <stage>.prof > <stage>.svg``
+  --stage NAME     runs a single stage against the outputs of an earlier full run, so a
+                   sampling profiler sees only that stage:
+                   py-spy record -o convert.svg -- python benchmarks/etl_pipeline.py --scales 100K --stage convert_to_parquet
+
+    python benchmarks/etl_pipeline.py --scales 10K 100K 1M
+"""
+
+import argparse
+import cProfile
+import datetime
+import json
+import os
+from pathlib import Path
+import platform
+import resource
+import shutil
+import sys
+import threading
+import time
+
+BASE_DIR = Path(__file__).parent.parent
+sys.path.insert(0, str(BASE_DIR / "src" / "etl"))
+sys.path.insert(0, str(BASE_DIR / "src" / "etl" / "archive"))
+
+BENCHMARK_DATA_DIR = BASE_DIR / 'data' / 'benchmark' / 'etl'
+DEFAULT_OUTPUT = BASE_DIR / 'benchmarks' / 'results' / 'etl_pipeline.json'
+
+STAGES = [
+    'generate_student_batch',
+    'process_batch_data',
+    'assemble',
+    'create_students_sample',
+    'convert_to_parquet',
+]
+BATCH_SIZE = 100_000
+SAMPLE_STUDENTS = 10_000
+# RSS poll interval of the per-stage peak memory sampler
+RSS_SAMPLE_SECONDS = 0.005
+
+
+def parse_scale(name):
+    """Student count of a scale name such as '10K' or '1M'."""
+    multipliers = {'K': 1_000, 'M': 1_000_000}
+    suffix = name[-1].upper()
+    if suffix in multipliers:
+        return int(float(name[:-1]) * multipliers[suffix])
+    return int(name)
+
+def current_rss():
+    """Resident set size in bytes (Linux /proc), or None where unavailable."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+def cpu_seconds():
+    """CPU time of this process (all threads) and of finished child processes."""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def peak_rss_so_far():
+    """Process lifetime peak RSS in bytes (ru_maxrss is KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class StageMeter:
+    """
+    Accumulates wall time and CPU time over every ``with meter:`` block of one stage (the
+    batch stages are entered once per batch) and records the largest RSS growth within a
+    block over the RSS at its start. The peak comes from a polling thread while a block is
+    active; without /proc only growth of the process lifetime peak can be seen, so the
+    figure is a lower bound there.
+    """
+
+    def __init__(self, name, profile=False):
+        self.name = name
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.start_rss = None
+        self.peak_rss_delta = 0
+        self.bytes_written = 0
+        self.profiler = cProfile.Profile() if profile else None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(RSS_SAMPLE_SECONDS):
+            self._block_peak = max(self._block_peak, current_rss() or 0)
+
+    def __enter__(self):
+        self._stop.clear()
+        self._thread = None
+        rss = current_rss()
+        if rss is not None:
+            self._block_start = self._block_peak = rss
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        else:
+            self._block_start = self._block_peak = peak_rss_so_far()
+        if self.start_rss is None:
+            self.start_rss = self._block_start
+        self._wall_start = time.perf_counter()
+        self._cpu_start = cpu_seconds()
+        if self.profiler is not None:
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        if self.profiler is not None:
+            self.profiler.disable()
+        self.wall_seconds += time.perf_counter() - self._wall_start
+        self.cpu_seconds += cpu_seconds() - self._cpu_start
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._block_peak = max(self._block_peak, current_rss() or 0)
+        else:
+            self._block_peak = peak_rss_so_far()
+        self.peak_rss_delta = max(self.peak_rss_delta, self._block_peak - self._block_start)
+        return False
+
+    def add_output(self, *paths):
+        """Count the size of files (or directory trees) written by the stage."""
+        for path in map(Path, paths):
+            files = path.rglob('*') if path.is_dir() else [path]
+            self.bytes_written += sum(f.stat().st_size for f in files if f.is_file())
+
+    def to_dict(self):
+        return {
+            'wall_seconds': round(self.wall_seconds, 3),
+            'cpu_seconds': round(self.cpu_seconds, 3),
+            'start_rss_mb': round((self.start_rss or 0) / (1024 * 1024), 1),
+            'peak_rss_delta_mb': round(self.peak_rss_delta / (1024 * 1024), 1),
+            'bytes_written': self.bytes_written,
+        }
+
+
+def run_pipeline(n_students, stages, profile):
+    """Run ``stages`` (in pipeline order) in the current directory; returns the stage meters."""
+    # Imported here: the generator pulls in its optional dependencies (tqdm, requests)
+    from real_data_milestone1 import RealDataMilestone1
+    import assemble_dataset
+    from create_cloud_sample import create_students_sample
+    from generate_star_schema import convert_to_parquet
+
+    meters = {stage: StageMeter(stage, profile) for stage in stages}
+    batch_size = min(BATCH_SIZE, n_students)
+    total_batches = max(1, n_students // batch_size)
+    full_data = Path(assemble_dataset.OUTPUT_FULL)
+    sample_data = Path('sample_students.parquet')
+
+    # Generation and batch processing alternate per batch, like the milestone script
+    if 'generate_student_batch' in meters or 'process_batch_data' in meters:
+        generator = RealDataMilestone1(target_students=n_students, batch_size=batch_size,
+                                       data_dir=assemble_dataset.DATA_DIR)
+        university_profiles = generator.create_university_profile({})
+        for batch_num in range(1, total_batches + 1):
+            if 'generate_student_batch' in meters:
+                with meters['generate_student_batch']:
+                    batch_records = generator.generate_student_batch(batch_num, university_profiles, total_batches)
+            else:
+                batch_records = generator.generate_student_batch(batch_num, university_profiles, total_batches)
+            if 'process_batch_data' in meters:
+                with meters['process_batch_data']:
+                    generator.process_batch_data(batch_records, batch_num)
+                meters['process_batch_data'].add_output(generator.get_batch_file(batch_num))
+            del batch_records
+
+    if 'assemble' in meters:
+        with meters['assemble']:
+            assemble_dataset.assemble(create_sample=False, rows_per_batch=0, random_seed=7)
+        meters['assemble'].add_output(full_data)
+
+    if 'create_students_sample' in meters:
+        with meters['create_students_sample']:
+            create_students_sample(n_students=SAMPLE_STUDENTS, seed=42, source_file=full_data, output_file=sample_data)
+        meters['create_students_sample'].add_output(sample_data)
+
+    # The full local rebuild: star schema from the assembled dataset
+    if 'convert_to_parquet' in meters:
+        star_dir = Path('star_schema')
+        with meters['convert_to_parquet']:
+            convert_to_parquet(source=str(full_data), output_dir=star_dir.resolve())
+        meters['convert_to_parquet'].add_output(star_dir)
+
+    if profile:
+        Path('profiles').mkdir(exist_ok=True)
+        for stage, meter in meters.items():
+            meter.profiler.dump_stats(f'profiles/{stage}.prof')
+    return meters
+
+def print_report(scale, n_students, meters):
+    print(f"\n📈 {scale} students ({n_students:,}):")
+    print(f"   {'stage':<28} {'wall s':>9} {'cpu s':>9} {'start RSS MB':>13} {'+peak RSS MB':>13} {'MB written':>11}")
+    total_wall = sum(m.wall_seconds for m in meters.values()) or 1.0
+    for stage, meter in meters.items():
+        print(f"   {stage:<28} {meter.wall_seconds:9.2f} {meter.cpu_seconds:9.2f}"
+              f" {(meter.start_rss or 0) / 1024**2:13.0f} {meter.peak_rss_delta / 1024**2:13.0f}"
+              f" {meter.bytes_written / 1024**2:11.1f}   {meter.wall_seconds / total_wall:4.0%}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the ETL pipeline stage by stage.")
+    parser.add_argument('--scales', nargs='+', default=['10K', '100K', '1M'],
+                        help="Student counts to run, e.g. 10K 100K 1M (default: 10K 100K 1M)")
+    parser.add_argument('--stage', choices=STAGES, default=None,
+                        help="Run only this stage, on the workspace of an earlier full run")
+    parser.add_argument('--profile', action='store_true', help="Write a cProfile .prof file per stage")
+    parser.add_argument('--output', type=Path, default=DEFAULT_OUTPUT, help="JSON result path")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    stages = [args.stage] if args.stage else STAGES
+    # generate_student_batch alone produces nothing on disk, so it needs no earlier run
+    needs_previous_run = args.stage not in (None, 'generate_student_batch', 'process_batch_data')
+    results = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'scales': {},
+    }
+    original_cwd = Path.cwd()
+
+    for scale in args.scales:
+        n_students = parse_scale(scale)
+        workspace = BENCHMARK_DATA_DIR / scale
+        if needs_previous_run and not workspace.exists():
+            print(f"❌ No workspace for {scale}; run the full pipeline once before --stage {args.stage}.")
+            sys.exit(1)
+        if args.stage is None and workspace.exists():
+            shutil.rmtree(workspace)
+        workspace.mkdir(parents=True, exist_ok=True)
+
+        print(f"⏱️ Running {', '.join(stages)} for {n_students:,} students in {workspace}...")
+        os.chdir(workspace)
+        try:
+            meters = run_pipeline(n_students, stages, args.profile)
+        finally:
+            os.chdir(original_cwd)
+
+        results['scales'][scale] = {
+            'students': n_students,
+            'stages': {stage: meter.to_dict() for stage, meter in meters.items()},
+        }
+        print_report(scale, n_students, meters)
+        if args.profile:
+            print(f"   🔬 Profiles: {workspace / 'profiles'}")
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
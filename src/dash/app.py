@@ -1,12 +1,32 @@
 import streamlit as st
-import pandas as pd
+import io
+import numpy as np
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
 import plotly.express as px
+import plotly.graph_objects as go
 import duckdb
 import os
-import subprocess
 import sys
+import threading
+import time
 from pathlib import Path
 
+from query_cache import QueryCache
+from perf import QueryRecorder, make_slow_query_logger
+from connection_pool import ConnectionPool, QueryClass
+from queries import (
+    create_star_schema_views, build_wide_filter, build_rollup_filter,
+    SCORE_BIN_WIDTH,
+    SUMMARY_QUERY, MAJOR_BAR_QUERY, SUBJECT_BAR_QUERY, HEATMAP_QUERY,
+    HIST_QUERY, RISK_SCATTER_QUERY, RISK_LIST_QUERY,
+    STUDENT_QUERY, HISTORY_QUERY,
+)
+
+# The star-schema build lives with the ETL scripts and runs in-process when needed
+sys.path.append(str(Path(__file__).parent.parent / 'etl'))
+from generate_star_schema import MANIFEST_NAME, SCHEMA_VERSION, convert_to_parquet, load_manifest
+
 # Page Config
 st.set_page_config(
     page_title="Student Performance Dashboard",
@@ -80,14 +100,13 @@ st.markdown("""
         font-weight: 600;
     }
 
-    /* Tabs */
-    .stTabs [data-baseweb="tab-list"] {
+    /* View selector (radio styled as tabs) */
+    div[data-testid="stRadio"] div[role="radiogroup"] {
         gap: 8px;
-        background-color: transparent;
         padding-bottom: 10px;
     }
 
-    .stTabs [data-baseweb="tab"] {
+    div[data-testid="stRadio"] label[data-baseweb="radio"] {
         height: 45px;
         background-color: #ffffff;
         border: 1px solid #e2e8f0;
@@ -98,7 +117,11 @@ st.markdown("""
         transition: all 0.2s;
     }
 
-    .stTabs [aria-selected="true"] {
+    div[data-testid="stRadio"] label[data-baseweb="radio"] > div:first-child {
+        display: none;
+    }
+
+    div[data-testid="stRadio"] label[data-baseweb="radio"]:has(input:checked) {
         background-color: var(--primary-color);
         color: white;
         border-color: var(--primary-color);
@@ -125,95 +148,195 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- DATABASE CONNECTION ---
+# Star-schema artifacts the dashboard reads (fact tables may also be Hive-partitioned directories)
+STAR_SCHEMA_FILES = ['fact_student_performance.parquet', 'dim_student.parquet',
+                     'dim_university.parquet', 'dim_course.parquet', 'dim_date.parquet',
+                     'agg_year_major_subject.parquet', 'fact_wide.parquet', 'student_offsets.parquet']
+
+def warehouse_is_current(db_path, parquet_dir):
+    """True if the pre-built DuckDB warehouse exists and is newer than every star-schema Parquet file."""
+    if not db_path.exists():
+        return False
+    parquet_mtimes = [p.stat().st_mtime for p in parquet_dir.rglob('*.parquet')]
+    return not parquet_mtimes or db_path.stat().st_mtime >= max(parquet_mtimes)
+
+def star_schema_is_current(parquet_dir):
+    """
+    True if every star-schema artifact exists and the build manifest records the current
+    SCHEMA_VERSION; only the small manifest JSON is read, no Parquet file is opened.
+    """
+    try:
+        manifest = load_manifest(parquet_dir)
+    except (OSError, ValueError):
+        return False
+    if manifest is None or manifest.get('schema_version') != SCHEMA_VERSION:
+        return False
+    return all((parquet_dir / f).exists() or (parquet_dir / Path(f).stem).is_dir() for f in STAR_SCHEMA_FILES)
+
+class StarSchemaBuild:
+    """
+    Runs ``convert_to_parquet`` in-process on a background thread, so the page can show a
+    warming state instead of blocking. ``state`` is 'warming', 'ready' or 'failed'.
+    """
+
+    def __init__(self):
+        self.state = 'warming'
+        self.error = None
+        self._thread = threading.Thread(target=self._run, name='star-schema-build', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            convert_to_parquet()
+            self.state = 'ready'
+        except Exception as e:
+            self.error = e
+            self.state = 'failed'
+
 @st.cache_resource
-def get_connection():
+def get_star_schema_build():
     """
-    Creates an in-memory DuckDB connection and loads the Star Schema from Parquet files.
-    This ensures fast startup and low memory usage.
+    Starts the star-schema build once per process when the files are missing or were
+    written by another schema version. Returns None when they are current.
     """
+    base_dir = Path(__file__).parent.parent.parent
+    if star_schema_is_current(base_dir / 'data' / 'star_schema'):
+        return None
+
+    # Same source order as generate_star_schema (cloud sample, full data, checked-in parts)
+    full_data = base_dir / 'data' / 'cleaned_students.parquet'
+    sources = [base_dir / 'data' / 'sample_50K_students.parquet', full_data,
+               full_data.parent / f"{full_data.name}.part1"]
+    if not any(path.exists() for path in sources):
+        raise FileNotFoundError("No data source found! Please ensure data files are present.")
+    return StarSchemaBuild()
+
+def wait_for_star_schema():
+    """True once the star schema is usable; renders the warming or error state otherwise."""
     try:
-        # Connect to in-memory DuckDB
-        conn = duckdb.connect(database=':memory:')
-        
-        # Define path to Parquet files
-        base_dir = Path(__file__).parent.parent.parent
-        parquet_dir = base_dir / 'data' / 'star_schema'
-        
-        # Check if Parquet files exist
-        required_files = ['fact_student_performance.parquet', 'dim_student.parquet', 
-                          'dim_university.parquet', 'dim_course.parquet', 'dim_date.parquet']
-        
-        missing_files = [f for f in required_files if not (parquet_dir / f).exists()]
-        needs_regeneration = False
-        
-        # If files exist, check if they have the student_number column
-        if not missing_files:
-            try:
-                # Try to load and check for student_number
-                conn.execute(f"CREATE TEMP VIEW temp_dim_student AS SELECT * FROM '{parquet_dir / 'dim_student.parquet'}'")
-                test_result = conn.execute("SELECT student_number FROM temp_dim_student LIMIT 1").fetchone()
-                conn.execute("DROP VIEW temp_dim_student")
-            except Exception:
-                # Column doesn't exist, need to regenerate
-                st.warning("🔄 Old schema detected. Regenerating with updated structure...")
-                import shutil
-                if parquet_dir.exists():
-                    shutil.rmtree(parquet_dir)
-                needs_regeneration = True
-        
-        # Generate star schema if files are missing or need regeneration
-        if missing_files or needs_regeneration:
-            # Determine which data file to use based on what's available
-            sample_50k = base_dir / 'data' / 'sample_50K_students.parquet'
-            full_data = base_dir / 'data' / 'cleaned_students.parquet'
-            
-            if sample_50k.exists():
-                data_path = sample_50k
-            elif full_data.exists():
-                data_path = full_data
-            else:
-                # Try to stitch from parts (local development)
-                part1 = full_data.parent / f"{full_data.name}.part1"
-                if part1.exists():
-                    data_path = full_data
-                else:
-                    st.error("❌ No data source found! Please ensure data files are present.")
-                    return None
-            
-            # Run the conversion script (with loading spinner)
-            try:
-                with st.spinner('Loading dashboard data...'):
-                    build_script_path = base_dir / "src" / "etl" / "generate_star_schema.py"
-                    if not build_script_path.exists():
-                        st.error(f"Conversion script not found.")
-                        return None
-                    
-                    subprocess.run([sys.executable, str(build_script_path)], check=True, capture_output=True)
-            except Exception as e:
-                st.error(f"❌ Error loading data: {str(e)}")
-                return None
-        
-        # Load Parquet files as Views
-        conn.execute(f"CREATE VIEW fact_student_performance AS SELECT * FROM '{parquet_dir / 'fact_student_performance.parquet'}'")
-        conn.execute(f"CREATE VIEW dim_student AS SELECT * FROM '{parquet_dir / 'dim_student.parquet'}'")
-        conn.execute(f"CREATE VIEW dim_university AS SELECT * FROM '{parquet_dir / 'dim_university.parquet'}'")
-        conn.execute(f"CREATE VIEW dim_course AS SELECT * FROM '{parquet_dir / 'dim_course.parquet'}'")
-        conn.execute(f"CREATE VIEW dim_date AS SELECT * FROM '{parquet_dir / 'dim_date.parquet'}'")
-        
-        return conn
-        
+        build = get_star_schema_build()
+    except FileNotFoundError as e:
+        st.error(f"❌ {e}")
+        return False
+
+    if build is None or build.state == 'ready':
+        return True
+    if build.state == 'failed':
+        st.error(f"❌ Error loading data: {build.error}")
+        # Retry the build on the next rerun
+        get_star_schema_build.clear()
+        return False
+
+    st.title("🎓 Student Performance Analytics")
+    st.info("⏳ Warming up: building the dashboard data. This only happens on the first start.")
+    time.sleep(1)
+    st.rerun()
+
+# Cursors shared by all sessions; each query holds one only while it runs and fetches
+POOL_SIZE = int(os.environ.get('DASHBOARD_POOL_SIZE', 8))
+# Global DuckDB settings for the shared database (DuckDB defaults when unset)
+DATABASE_SETTINGS = {name: os.environ[env] for name, env in
+                     [('threads', 'DASHBOARD_DUCKDB_THREADS'), ('memory_limit', 'DASHBOARD_DUCKDB_MEMORY_LIMIT')]
+                     if os.environ.get(env)}
+# Row-level scans of fact_wide may hold at most half the cursors, so rollup and
+# student lookups still get one while several sessions load the risk views
+QUERY_CLASSES = {
+    'scan': QueryClass(max_concurrent=max(1, POOL_SIZE // 2)),
+    'point': QueryClass(),
+}
+PANEL_QUERY_CLASSES = {
+    'score_histogram': 'scan', 'risk_scatter': 'scan', 'risk_list': 'scan',
+    'student_lookup': 'point', 'student_history': 'point',
+}
+
+def connect_database():
+    """
+    Opens the pre-built DuckDB warehouse read-only when it is up to date (native tables,
+    ART indexes, stored statistics). Otherwise creates an in-memory DuckDB database
+    and loads the Star Schema from Parquet files as views.
+    """
+    # Define path to Parquet files
+    base_dir = Path(__file__).parent.parent.parent
+    parquet_dir = base_dir / 'data' / 'star_schema'
+
+    # Prefer the persistent warehouse built by src/etl/build_warehouse.py
+    warehouse_path = base_dir / 'warehouse' / 'student_performance.duckdb'
+    if warehouse_is_current(warehouse_path, parquet_dir):
+        return duckdb.connect(database=str(warehouse_path), read_only=True)
+
+    # Connect to in-memory DuckDB
+    conn = duckdb.connect(database=':memory:')
+
+    # Load Parquet files as Views
+    create_star_schema_views(conn, parquet_dir)
+
+    return conn
+
+def file_fingerprint(path):
+    """(mtime_ns, size) of a file, or None if it does not exist."""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def database_fingerprint():
+    """
+    Changes whenever connect_database would open something else: the warehouse is rebuilt
+    (os.replace), the star schema is rewritten (manifest) or the warehouse goes stale.
+    """
+    base_dir = Path(__file__).parent.parent.parent
+    parquet_dir = base_dir / 'data' / 'star_schema'
+    warehouse_path = base_dir / 'warehouse' / 'student_performance.duckdb'
+    return (warehouse_is_current(warehouse_path, parquet_dir),
+            file_fingerprint(warehouse_path), file_fingerprint(parquet_dir / MANIFEST_NAME))
+
+@st.cache_resource
+def get_connection_pool():
+    """
+    One DuckDB database per process; browser sessions run their queries on cursors
+    checked out from a bounded pool (a DuckDB connection is not safe across threads).
+    The pool reopens the database when the warehouse or star schema is rebuilt.
+    """
+    try:
+        return ConnectionPool(connect_database, max_cursors=POOL_SIZE, database_settings=DATABASE_SETTINGS,
+                              query_classes=QUERY_CLASSES, panel_classes=PANEL_QUERY_CLASSES,
+                              fingerprint=database_fingerprint)
     except Exception as e:
         st.error(f"❌ Error connecting to database: {e}")
         return None
 
-conn = get_connection()
+pool = get_connection_pool() if wait_for_star_schema() else None
+
+# Queries at or above this latency are re-run under EXPLAIN ANALYZE into logs/slow_queries.log
+SLOW_QUERY_MS = float(os.environ.get('DASHBOARD_SLOW_QUERY_MS', 500))
+
+@st.cache_resource
+def get_query_recorder():
+    """Per-panel query timings shared by every session (shown in the ?perf=1 sidebar panel)."""
+    base_dir = Path(__file__).parent.parent.parent
+    return QueryRecorder(slow_query_ms=SLOW_QUERY_MS,
+                         logger=make_slow_query_logger(base_dir / 'logs' / 'slow_queries.log'))
+
+@st.cache_resource
+def get_query_cache():
+    """
+    Query result cache shared by every session, invalidated when the star-schema
+    Parquet files or the warehouse database change.
+    """
+    base_dir = Path(__file__).parent.parent.parent
+    return QueryCache([base_dir / 'data' / 'star_schema', base_dir / 'warehouse' / 'student_performance.duckdb'],
+                      recorder=get_query_recorder())
+
+query_recorder = get_query_recorder()
+query_cache = get_query_cache()
 
 @st.cache_data
-def get_filter_options(_conn, column, table):
+def get_filter_options(_pool, column, table):
     query = f"SELECT DISTINCT {column} FROM {table} ORDER BY {column}"
     if column == "year":
         query = f"SELECT DISTINCT {column} FROM {table} ORDER BY {column} DESC"
-    return _conn.execute(query).fetchdf()[column].tolist()
+    return query_recorder.fetchdf(_pool, query, panel="filter_options")[column].tolist()
 
 # Sidebar
 st.sidebar.title("🎓 Filters")
@@ -222,305 +345,269 @@ selected_year = "All"
 selected_major = "All"
 selected_subject = "All"
 
-if conn:
-    years = get_filter_options(conn, "year", "dim_date")
+if pool:
+    years = get_filter_options(pool, "year", "dim_date")
     selected_year = st.sidebar.selectbox("Select Cohort (Year)", ["All"] + years)
     
-    majors = get_filter_options(conn, "major", "dim_student")
+    majors = get_filter_options(pool, "major", "dim_student")
     selected_major = st.sidebar.selectbox("Major", ["All"] + majors)
     
-    subjects = get_filter_options(conn, "subject", "dim_course")
+    subjects = get_filter_options(pool, "subject", "dim_course")
     selected_subject = st.sidebar.selectbox("Subject", ["All"] + subjects)
 
     st.sidebar.markdown("---")
     st.sidebar.caption("v1.2 | Cloud Optimized")
+    cache_stats = query_cache.stats()
+    st.sidebar.caption(f"Query cache: {cache_stats['hits']:,} hits · {cache_stats['misses']:,} misses")
+
+    # Hidden perf panel: open the dashboard with ?perf=1
+    if st.query_params.get("perf") == "1":
+        with st.sidebar.expander("⏱️ Perf", expanded=True):
+            st.caption(f"Slow queries (≥ {SLOW_QUERY_MS:.0f} ms): {query_recorder.slow_queries:,} · "
+                       f"profiles skipped (pool busy): {query_recorder.explains_skipped:,}")
+            st.dataframe(query_recorder.panel_stats(), hide_index=True)
+            st.dataframe(query_recorder.recent(50).drop(columns=['started_at']), hide_index=True)
+            if pool:
+                pool_size = pool.size()
+                st.caption(f"DuckDB cursors: {pool_size['in_use']} in use · {pool_size['open']} open · "
+                           f"{pool_size['max_cursors']} max · {pool_size['reconnects']} reconnects")
+                st.dataframe(pool.stats(), hide_index=True)
 
 st.title("🎓 Student Performance Analytics")
 
-tab1, tab2, tab3, tab4 = st.tabs(["📊 Overview", "📚 Subject & Cohort", "🚨 Risk Analysis", "👤 Student Profile"])
+def get_filter_summary(totals_where, totals_params):
+    """All scalar metrics for the current filters (one rollup scan, shared by every view)."""
+    row = query_cache.fetchone(pool, SUMMARY_QUERY.format(where_clause=totals_where), totals_params, panel="kpi_summary")
+    summary = dict(zip(['avg_score', 'attendance_rate', 'total_students', 'pass_rate', 'at_risk_count', 'row_count'], row))
+    # SUM over no matching rows is NULL
+    for key in ('total_students', 'at_risk_count', 'row_count'):
+        summary[key] = summary[key] or 0
+    return summary
+
 
-if conn:
-    where_conditions = ["1=1"]
-    params = []
+def render_overview(summary, where_clause, params, totals_where, totals_params):
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Avg Score", f"{summary['avg_score']:.1f}" if summary['avg_score'] else "0.0")
+    col2.metric("Attendance Rate", f"{summary['attendance_rate']:.1f}%" if summary['attendance_rate'] else "0.0%")
+    col3.metric("Total Students", f"{summary['total_students']:,}" if summary['total_students'] else "0")
+    col4.metric("Pass Rate", f"{summary['pass_rate']:.1f}%" if summary['pass_rate'] else "0.0%")
     
-    if selected_year != "All":
-        where_conditions.append("d.year = ?")
-        params.append(selected_year)
+    st.markdown("---")
     
-    if selected_major != "All":
-        where_conditions.append("s.major = ?")
-        params.append(selected_major)
-        
-    if selected_subject != "All":
-        where_conditions.append("c.subject = ?")
-        params.append(selected_subject)
-        
-    where_clause = " AND ".join(where_conditions)
-
-    with tab1:
-        kpi_query = f"""
-            SELECT 
-                AVG(f.score) as avg_score,
-                AVG(CAST(f.attendance_flag AS INTEGER)) * 100 as attendance_rate,
-                COUNT(DISTINCT f.student_key) as total_students,
-                SUM(CASE WHEN f.score >= 60 THEN 1 ELSE 0 END) * 100.0 / COUNT(*) as pass_rate
-            FROM fact_student_performance f
-            JOIN dim_date d ON f.date_id = d.date_id
-            JOIN dim_university u ON f.university_key = u.university_key
-            JOIN dim_course c ON f.course_key = c.course_key
-            JOIN dim_student s ON f.student_key = s.student_key
-            WHERE {where_clause}
-        """
-        kpi_data = conn.execute(kpi_query, params).fetchone()
-        
-        col1, col2, col3, col4 = st.columns(4)
-        col1.metric("Avg Score", f"{kpi_data[0]:.1f}" if kpi_data[0] else "0.0")
-        col2.metric("Attendance Rate", f"{kpi_data[1]:.1f}%" if kpi_data[1] else "0.0%")
-        col3.metric("Total Students", f"{kpi_data[2]:,}" if kpi_data[2] else "0")
-        col4.metric("Pass Rate", f"{kpi_data[3]:.1f}%" if kpi_data[3] else "0.0%")
-        
-        st.markdown("---")
-        
-        c1, c2 = st.columns(2)
-        
-        with c1:
-            st.subheader("Score Distribution")
-            hist_query = f"""
-                SELECT f.score 
-                FROM fact_student_performance f
-                JOIN dim_date d ON f.date_id = d.date_id
-                JOIN dim_university u ON f.university_key = u.university_key
-                JOIN dim_course c ON f.course_key = c.course_key
-                JOIN dim_student s ON f.student_key = s.student_key
-                WHERE {where_clause}
-            """
-            df_scores = conn.execute(hist_query, params).fetchdf()
-            if not df_scores.empty:
-                fig_hist = px.histogram(df_scores, x="score", nbins=20, 
-                                      color_discrete_sequence=['#2563eb'])
-                fig_hist.update_layout(
-                    plot_bgcolor="rgba(0,0,0,0)",
-                    paper_bgcolor="rgba(0,0,0,0)",
-                    font={'family': "Inter, sans-serif", 'color': "#475569"},
-                    margin=dict(l=20, r=20, t=20, b=20)
-                )
-                fig_hist.update_yaxes(gridcolor="#e2e8f0")
-                st.plotly_chart(fig_hist, use_container_width=True)
-            
-        with c2:
-            st.subheader("Performance by Major")
-            bar_query = f"""
-                SELECT s.major, AVG(f.score) as avg_score
-                FROM fact_student_performance f
-                JOIN dim_date d ON f.date_id = d.date_id
-                JOIN dim_university u ON f.university_key = u.university_key
-                JOIN dim_course c ON f.course_key = c.course_key
-                JOIN dim_student s ON f.student_key = s.student_key
-                WHERE {where_clause}
-                GROUP BY s.major
-                ORDER BY avg_score DESC
-                LIMIT 10
-            """
-            df_bar = conn.execute(bar_query, params).fetchdf()
-            if not df_bar.empty:
-                fig_bar = px.bar(df_bar, x='major', y='avg_score', color='major',
-                               title="Top Majors by Average Score",
-                               color_discrete_sequence=px.colors.qualitative.Prism)
-                fig_bar.update_layout(
-                    plot_bgcolor="rgba(0,0,0,0)",
-                    paper_bgcolor="rgba(0,0,0,0)",
-                    font={'family': "Inter, sans-serif", 'color': "#475569"},
-                    xaxis_title=None,
-                    yaxis_title="Average Score",
-                    margin=dict(l=20, r=20, t=40, b=20),
-                    showlegend=False
-                )
-                fig_bar.update_yaxes(gridcolor="#e2e8f0")
-                st.plotly_chart(fig_bar, use_container_width=True)
-
-    with tab2:
-        st.subheader("📚 Subject Deep Dive")
-        
-        subject_query = f"""
-            SELECT c.subject, AVG(f.score) as avg_score, COUNT(*) as students
-            FROM fact_student_performance f
-            JOIN dim_date d ON f.date_id = d.date_id
-            JOIN dim_university u ON f.university_key = u.university_key
-            JOIN dim_course c ON f.course_key = c.course_key
-            JOIN dim_student s ON f.student_key = s.student_key
-            WHERE {where_clause}
-            GROUP BY c.subject
-            ORDER BY avg_score DESC
-            LIMIT 10
-        """
-        df_subject = conn.execute(subject_query, params).fetchdf()
-        
-        if not df_subject.empty:
-            fig_sub = px.bar(df_subject, x='avg_score', y='subject', orientation='h',
-                           title="Top 10 Subjects by Average Score",
-                           text_auto='.1f',
-                           color='avg_score', 
-                           color_continuous_scale='Viridis')
-            fig_sub.update_layout(
+    c1, c2 = st.columns(2)
+    
+    with c1:
+        st.subheader("Score Distribution")
+        hist_query = HIST_QUERY.format(where_clause=where_clause)
+        # Bucket counts are computed in DuckDB; only SCORE_BINS rows come back, as NumPy arrays
+        scores = query_cache.fetchnumpy(pool, hist_query, params, panel="score_histogram")
+        if len(scores['bucket']):
+            fig_hist = go.Figure(go.Bar(
+                x=scores['bucket'] * SCORE_BIN_WIDTH + SCORE_BIN_WIDTH / 2,
+                y=scores['count'],
+                width=SCORE_BIN_WIDTH,
+                marker_color='#2563eb'
+            ))
+            fig_hist.update_layout(
                 plot_bgcolor="rgba(0,0,0,0)",
                 paper_bgcolor="rgba(0,0,0,0)",
                 font={'family': "Inter, sans-serif", 'color': "#475569"},
-                xaxis_title="Average Score",
-                yaxis_title=None,
-                yaxis={'categoryorder':'total ascending'}
-            )
-            fig_sub.update_xaxes(gridcolor="#e2e8f0")
-            st.plotly_chart(fig_sub, use_container_width=True)
-        
-        st.markdown("---")
-        st.subheader("🔥 Attendance Heatmap")
-        
-        heatmap_query = f"""
-            SELECT 
-                s.major,
-                c.subject,
-                AVG(CAST(f.attendance_flag AS INTEGER)) as attendance_rate
-            FROM fact_student_performance f
-            JOIN dim_date d ON f.date_id = d.date_id
-            JOIN dim_university u ON f.university_key = u.university_key
-            JOIN dim_course c ON f.course_key = c.course_key
-            JOIN dim_student s ON f.student_key = s.student_key
-            WHERE {where_clause}
-            GROUP BY s.major, c.subject
-        """
-        df_heatmap = conn.execute(heatmap_query, params).fetchdf()
-        
-        if not df_heatmap.empty:
-            pivot_df = df_heatmap.pivot(index='major', columns='subject', values='attendance_rate')
-            fig_heat = px.imshow(
-                pivot_df,
-                labels=dict(x="Subject", y="Major", color="Rate"),
-                x=pivot_df.columns,
-                y=pivot_df.index,
-                color_continuous_scale="RdBu",
-                aspect="auto"
+                xaxis_title="score",
+                yaxis_title="count",
+                bargap=0,
+                margin=dict(l=20, r=20, t=20, b=20)
             )
-            fig_heat.update_layout(
-                plot_bgcolor="rgba(0,0,0,0)",
-                paper_bgcolor="rgba(0,0,0,0)",
-                font={'family': "Inter, sans-serif", 'color': "#475569"}
-            )
-            st.plotly_chart(fig_heat, use_container_width=True)
-
-    with tab3:
-        st.subheader("🚨 At-Risk Student Analysis")
-        
-        risk_count_query = f"""
-            SELECT COUNT(*) 
-            FROM fact_student_performance f
-            JOIN dim_date d ON f.date_id = d.date_id
-            JOIN dim_university u ON f.university_key = u.university_key
-            JOIN dim_course c ON f.course_key = c.course_key
-            JOIN dim_student s ON f.student_key = s.student_key
-            WHERE {where_clause} AND (f.score < 60 OR f.attendance_flag = FALSE)
-        """
-        risk_count = conn.execute(risk_count_query, params).fetchone()[0]
-        
-        st.metric("⚠️ At-Risk Records", f"{risk_count:,}")
+            fig_hist.update_yaxes(gridcolor="#e2e8f0")
+            st.plotly_chart(fig_hist, use_container_width=True)
         
-        risk_scatter_query = f"""
-            SELECT f.score, CAST(f.attendance_flag AS INTEGER) as attendance
-            FROM fact_student_performance f
-            JOIN dim_date d ON f.date_id = d.date_id
-            JOIN dim_university u ON f.university_key = u.university_key
-            JOIN dim_course c ON f.course_key = c.course_key
-            JOIN dim_student s ON f.student_key = s.student_key
-            WHERE {where_clause}
-            LIMIT 2000
-        """
-        df_risk = conn.execute(risk_scatter_query, params).fetchdf()
-        
-        if not df_risk.empty:
-            fig_risk = px.scatter(df_risk, x='attendance', y='score', trendline="ols",
-                                      color_discrete_sequence=['#ef4444'])
-            fig_risk.add_hrect(y0=0, y1=60, line_width=0, fillcolor="#ef4444", opacity=0.1)
-            fig_risk.update_layout(
+    with c2:
+        st.subheader("Performance by Major")
+        bar_query = MAJOR_BAR_QUERY.format(where_clause=totals_where)
+        df_bar = query_cache.fetchdf(pool, bar_query, totals_params, panel="major_bar")
+        if not df_bar.empty:
+            fig_bar = px.bar(df_bar, x='major', y='avg_score', color='major',
+                           title="Top Majors by Average Score",
+                           color_discrete_sequence=px.colors.qualitative.Prism)
+            fig_bar.update_layout(
                 plot_bgcolor="rgba(0,0,0,0)",
                 paper_bgcolor="rgba(0,0,0,0)",
                 font={'family': "Inter, sans-serif", 'color': "#475569"},
-                xaxis_title="Attendance Flag (0/1)",
-                yaxis_title="Score"
-            )
-            fig_risk.update_xaxes(gridcolor="#e2e8f0")
-            fig_risk.update_yaxes(gridcolor="#e2e8f0")
-            st.plotly_chart(fig_risk, use_container_width=True)
-            
-        st.subheader("📥 Download At-Risk List")
-        risk_list_query = f"""
-            SELECT s.student_id, s.student_name, u.university_name, c.subject, f.score
-            FROM fact_student_performance f
-            JOIN dim_student s ON f.student_key = s.student_key
-            JOIN dim_date d ON f.date_id = d.date_id
-            JOIN dim_university u ON f.university_key = u.university_key
-            JOIN dim_course c ON f.course_key = c.course_key
-            WHERE {where_clause} AND (f.score < 60 OR f.attendance_flag = FALSE)
-            LIMIT 1000
-        """
-        df_risk_list = conn.execute(risk_list_query, params).fetchdf()
-        
-        if not df_risk_list.empty:
-            st.dataframe(df_risk_list)
-            st.download_button(
-                label="Download At-Risk Data (CSV)",
-                data=df_risk_list.to_csv(index=False).encode('utf-8'),
-                file_name='at_risk_students.csv',
-                mime='text/csv',
+                xaxis_title=None,
+                yaxis_title="Average Score",
+                margin=dict(l=20, r=20, t=40, b=20),
+                showlegend=False
             )
+            fig_bar.update_yaxes(gridcolor="#e2e8f0")
+            st.plotly_chart(fig_bar, use_container_width=True)
+
+
+def render_subject_cohort(summary, subject_where, subject_params):
+    st.subheader("📚 Subject Deep Dive")
+    st.caption(f"Average score {summary['avg_score'] or 0:.1f} across {summary['row_count']:,} course records")
+    
+    subject_query = SUBJECT_BAR_QUERY.format(where_clause=subject_where)
+    df_subject = query_cache.fetchdf(pool, subject_query, subject_params, panel="subject_bar")
+    
+    if not df_subject.empty:
+        fig_sub = px.bar(df_subject, x='avg_score', y='subject', orientation='h',
+                       title="Top 10 Subjects by Average Score",
+                       text_auto='.1f',
+                       color='avg_score', 
+                       color_continuous_scale='Viridis')
+        fig_sub.update_layout(
+            plot_bgcolor="rgba(0,0,0,0)",
+            paper_bgcolor="rgba(0,0,0,0)",
+            font={'family': "Inter, sans-serif", 'color': "#475569"},
+            xaxis_title="Average Score",
+            yaxis_title=None,
+            yaxis={'categoryorder':'total ascending'}
+        )
+        fig_sub.update_xaxes(gridcolor="#e2e8f0")
+        st.plotly_chart(fig_sub, use_container_width=True)
+    
+    st.markdown("---")
+    st.subheader("🔥 Attendance Heatmap")
+    
+    heatmap_query = HEATMAP_QUERY.format(where_clause=subject_where)
+    heatmap = query_cache.fetchnumpy(pool, heatmap_query, subject_params, panel="attendance_heatmap")
+    
+    if len(heatmap['major']):
+        # Pivot the (major, subject, rate) rows into a major x subject matrix; missing pairs stay
+        # NaN and rows with a NULL major or subject (masked by fetchnumpy) are left out
+        valid = ~(np.ma.getmaskarray(heatmap['major']) | np.ma.getmaskarray(heatmap['subject']))
+        majors, major_idx = np.unique(np.ma.getdata(heatmap['major'])[valid], return_inverse=True)
+        subjects, subject_idx = np.unique(np.ma.getdata(heatmap['subject'])[valid], return_inverse=True)
+        rates = np.full((len(majors), len(subjects)), np.nan)
+        rates[major_idx, subject_idx] = np.ma.filled(np.ma.asarray(heatmap['attendance_rate'], dtype=float), np.nan)[valid]
+        fig_heat = px.imshow(
+            rates,
+            labels=dict(x="Subject", y="Major", color="Rate"),
+            x=subjects,
+            y=majors,
+            color_continuous_scale="RdBu",
+            aspect="auto"
+        )
+        fig_heat.update_layout(
+            plot_bgcolor="rgba(0,0,0,0)",
+            paper_bgcolor="rgba(0,0,0,0)",
+            font={'family': "Inter, sans-serif", 'color': "#475569"}
+        )
+        st.plotly_chart(fig_heat, use_container_width=True)
 
 
-    with tab4:
-        st.subheader("👤 Student Lookup")
-        col_search, col_info = st.columns([1, 2])
+def render_risk_analysis(summary, where_clause, params):
+    st.subheader("🚨 At-Risk Student Analysis")
+    
+    st.metric("⚠️ At-Risk Records", f"{summary['at_risk_count']:,}")
+    
+    risk_scatter_query = RISK_SCATTER_QUERY.format(where_clause=where_clause)
+    risk = query_cache.fetchnumpy(pool, risk_scatter_query, params, panel="risk_scatter")
+    
+    if len(risk['score']):
+        # NULL scores/flags come back masked; plot and fit only the complete points
+        valid = ~(np.ma.getmaskarray(risk['attendance']) | np.ma.getmaskarray(risk['score']))
+        attendance = np.ma.getdata(risk['attendance'])[valid].astype(float)
+        score = np.ma.getdata(risk['score'])[valid].astype(float)
+        fig_risk = go.Figure(go.Scatter(x=attendance, y=score, mode='markers',
+                                        marker_color='#ef4444', name='records'))
+        # Least-squares trendline (needs two distinct attendance values)
+        if len(np.unique(attendance)) > 1:
+            slope, intercept = np.polyfit(attendance, score, 1)
+            line_x = np.array([attendance.min(), attendance.max()])
+            fig_risk.add_trace(go.Scatter(x=line_x, y=slope * line_x + intercept, mode='lines',
+                                          line_color='#ef4444', name='OLS trend'))
+        fig_risk.add_hrect(y0=0, y1=60, line_width=0, fillcolor="#ef4444", opacity=0.1)
+        fig_risk.update_layout(
+            plot_bgcolor="rgba(0,0,0,0)",
+            paper_bgcolor="rgba(0,0,0,0)",
+            font={'family': "Inter, sans-serif", 'color': "#475569"},
+            xaxis_title="Attendance Flag (0/1)",
+            yaxis_title="Score",
+            showlegend=False
+        )
+        fig_risk.update_xaxes(gridcolor="#e2e8f0")
+        fig_risk.update_yaxes(gridcolor="#e2e8f0")
+        st.plotly_chart(fig_risk, use_container_width=True)
         
-        with col_search:
-            student_number = st.number_input("Enter Student Number (1-10,000)", 
-                                            min_value=1, 
-                                            max_value=10000, 
-                                            step=1,
-                                            value=None)
+    st.subheader("📥 Download At-Risk List")
+    risk_list_query = RISK_LIST_QUERY.format(where_clause=where_clause)
+    risk_list = query_cache.fetch_arrow(pool, risk_list_query, params, panel="risk_list")
+    
+    if risk_list.num_rows:
+        st.dataframe(risk_list)
+        csv_buffer = io.BytesIO()
+        pa_csv.write_csv(risk_list, csv_buffer)
+        st.download_button(
+            label="Download At-Risk Data (CSV)",
+            data=csv_buffer.getvalue(),
+            file_name='at_risk_students.csv',
+            mime='text/csv',
+        )
+
+
+def render_student_profile():
+    st.subheader("👤 Student Lookup")
+    col_search, col_info = st.columns([1, 2])
+    
+    with col_search:
+        student_number = st.number_input("Enter Student Number (1-10,000)", 
+                                        min_value=1, 
+                                        max_value=10000, 
+                                        step=1,
+                                        value=None)
+    
+    if student_number:
+        # Query student by student_number field
+        student_info = query_cache.fetchdf(pool, STUDENT_QUERY, [student_number], panel="student_lookup")
         
-        if student_number:
-            # Query student by student_number field
-            student_query = "SELECT * FROM dim_student WHERE student_number = ?"
-            student_info = conn.execute(student_query, [student_number]).fetchdf()
+        if not student_info.empty:
+            with col_info:
+                st.success(f"**Student #{student_number}:** {student_info['student_name'].iloc[0]} | **Major:** {student_info['major'].iloc[0]}")
             
-            if not student_info.empty:
-                with col_info:
-                    st.success(f"**Student #{student_number}:** {student_info['student_name'].iloc[0]} | **Major:** {student_info['major'].iloc[0]}")
-                
-                student_id = student_info['student_id'].iloc[0]
+            fact_id_range = [int(student_info['fact_id_start'].iloc[0]), int(student_info['fact_id_end'].iloc[0])]
+            
+            history = query_cache.fetch_arrow(pool, HISTORY_QUERY, fact_id_range, panel="student_history")
+            
+            if history.num_rows:
+                years = pc.min_max(history['year'])
+                st.info(f"📊 **Academic Summary:** {history.num_rows} courses · {pc.count_distinct(history['subject']).as_py()} subjects · {years['min'].as_py()}-{years['max'].as_py()}")
                 
-                history_query = """
-                    SELECT 
-                        d.year, d.semester, c.subject, f.score, f.grade, f.attendance_flag
-                    FROM fact_student_performance f
-                    JOIN dim_student s ON f.student_key = s.student_key
-                    JOIN dim_date d ON f.date_id = d.date_id
-                    JOIN dim_course c ON f.course_key = c.course_key
-                    WHERE s.student_id = ?
-                    ORDER BY d.year DESC, d.semester
-                """
-                history_df = conn.execute(history_query, [student_id]).fetchdf()
+                attendance = pc.mean(pc.cast(history['attendance_flag'], 'double')).as_py() or 0.0
+                sum_col1, sum_col2, sum_col3 = st.columns(3)
+                sum_col1.metric("Avg Score", f"{pc.mean(history['score']).as_py() or 0.0:.1f}")
+                sum_col2.metric("Attendance", f"{attendance*100:.1f}%")
+                sum_col3.metric("Total Courses", history.num_rows)
                 
-                if not history_df.empty:
-                    st.info(f"📊 **Academic Summary:** {len(history_df)} courses · {history_df['subject'].nunique()} subjects · {history_df['year'].min()}-{history_df['year'].max()}")
-                    
-                    sum_col1, sum_col2, sum_col3 = st.columns(3)
-                    sum_col1.metric("Avg Score", f"{history_df['score'].mean():.1f}")
-                    sum_col2.metric("Attendance", f"{history_df['attendance_flag'].mean()*100:.1f}%")
-                    sum_col3.metric("Total Courses", len(history_df))
-                    
-                    st.subheader("📚 Course History")
-                    st.markdown("*Each row represents one course taken by this student.*")
-                    st.dataframe(history_df, use_container_width=True)
-                else:
-                    st.warning("No course history found for this student.")
+                st.subheader("📚 Course History")
+                st.markdown("*Each row represents one course taken by this student.*")
+                st.dataframe(history, use_container_width=True)
             else:
-                st.warning("Student number not found.")
+                st.warning("No course history found for this student.")
         else:
-            st.info("Enter a student number (1-10,000) to view their academic profile.")
+            st.warning("Student number not found.")
+    else:
+        st.info("Enter a student number (1-10,000) to view their academic profile.")
+
+
+# Each view only runs its own queries. st.tabs would execute all four tab bodies on every
+# rerun, so the active view is chosen with a radio and rendered on its own; results are
+# memoized per filter state by the shared query cache.
+TABS = ["📊 Overview", "📚 Subject & Cohort", "🚨 Risk Analysis", "👤 Student Profile"]
+active_tab = st.radio("View", TABS, horizontal=True, key="active_tab", label_visibility="collapsed")
+
+if pool:
+    where_clause, params = build_wide_filter(selected_year, selected_major, selected_subject)
+    totals_where, totals_params = build_rollup_filter(selected_year, selected_major, selected_subject)
+    subject_where, subject_params = build_rollup_filter(selected_year, selected_major, selected_subject, by_subject=True)
+
+    summary = get_filter_summary(totals_where, totals_params)
+    st.caption(f"{summary['row_count']:,} course records · {summary['total_students']:,} students match the current filters")
+
+    if active_tab == TABS[0]:
+        render_overview(summary, where_clause, params, totals_where, totals_params)
+    elif active_tab == TABS[1]:
+        render_subject_cohort(summary, subject_where, subject_params)
+    elif active_tab == TABS[2]:
+        render_risk_analysis(summary, where_clause, params)
+    else:
+        render_student_profile()
@@ -0,0 +1,312 @@
+"""
+Thread-safe DuckDB connection pool for the Streamlit dashboard.
+
+Streamlit runs every browser session's script on its own thread, and a DuckDB connection
+must not be used by two threads at once. ``ConnectionPool`` opens the database once and
+hands out cursors (``conn.cursor()``: connections to the same database instance, sharing
+its catalog, buffer pool and thread pool) from a bounded pool; a thread holds a cursor
+for one query and its fetch, then returns it.
+
+Settings:
+  database_settings   global DuckDB settings applied once to the shared instance, e.g.
+                      ``threads`` and ``memory_limit``. DuckDB only allows these at global
+                      scope, so they cannot differ per cursor.
+  query_classes       per query class: ``max_concurrent`` (how many cursors the class may
+                      hold at once, so full scans cannot take every cursor from the cheap
+                      rollup queries) and ``settings``, which must be session-scoped
+                      (``duckdb_settings()`` scope LOCAL) and are applied per cursor.
+
+Time spent waiting for a cursor is tracked per query class (``stats()``).
+
+Reconnecting: with a ``fingerprint`` callable (e.g. mtime/size of the warehouse file and
+the star-schema manifest) the pool re-checks it at most every ``check_interval`` seconds
+and reopens the database when it changed; ``refresh()`` forces the same. DuckDB hands out
+the already-open instance for a database path while any connection to it is open, so a
+reopen waits until every checked-out cursor is returned, closes the old database and then
+connects again; new checkouts wait for it.
+"""
+
+import contextlib
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+DEFAULT_QUERY_CLASS = "default"
+
+
+class PoolTimeout(Exception):
+    """Raised when no cursor became free within the pool timeout."""
+
+
+@dataclass
+class QueryClass:
+    """Limits and session settings shared by one class of queries."""
+    max_concurrent: Optional[int] = None
+    settings: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class _WaitStats:
+    acquisitions: int = 0
+    waits: int = 0
+    timeouts: int = 0
+    total_wait_ms: float = 0.0
+    max_wait_ms: float = 0.0
+
+
+def _sql_literal(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+class ConnectionPool:
+    """Bounded pool of cursors over one shared DuckDB database instance."""
+
+    def __init__(self,
+                 connect: Callable[[], Any],
+                 max_cursors: int = 8,
+                 database_settings: Optional[Dict[str, Any]] = None,
+                 query_classes: Optional[Dict[str, QueryClass]] = None,
+                 panel_classes: Optional[Dict[str, str]] = None,
+                 timeout: float = 30.0,
+                 fingerprint: Optional[Callable[[], Any]] = None,
+                 check_interval: float = 2.0):
+        if max_cursors < 1:
+            raise ValueError("max_cursors must be at least 1")
+        self.max_cursors = max_cursors
+        self.timeout = timeout
+        self.query_classes = {DEFAULT_QUERY_CLASS: QueryClass(), **(query_classes or {})}
+        # Panel tag (as passed to QueryCache / QueryRecorder) -> query class
+        self.panel_classes = dict(panel_classes or {})
+        self.database_settings = dict(database_settings or {})
+        self.check_interval = check_interval
+        self._connect = connect
+        self._fingerprint_of = fingerprint
+
+        self._open()
+        scopes = dict(self._db.execute("SELECT name, scope FROM duckdb_settings()").fetchall())
+        for class_name, query_class in self.query_classes.items():
+            for name in query_class.settings:
+                scope = scopes.get(name)
+                if scope is None:
+                    raise ValueError(f"Unknown DuckDB setting in query class '{class_name}': {name}")
+                if scope != 'LOCAL':
+                    raise ValueError(f"'{name}' is a {scope.lower()} DuckDB setting and cannot be set per "
+                                     f"query class '{class_name}'; pass it in database_settings")
+
+        self._condition = threading.Condition()
+        self._idle: List[Any] = []
+        self._created = 0
+        self._in_use: Dict[str, int] = {name: 0 for name in self.query_classes}
+        # Session settings currently applied to each cursor, keyed by id(cursor)
+        self._applied: Dict[int, Dict[str, Any]] = {}
+        self._wait_stats: Dict[str, _WaitStats] = {name: _WaitStats() for name in self.query_classes}
+        self._closed = False
+        self._stale = False
+        self._last_check = time.monotonic()
+        self.reconnects = 0
+
+    # --- Public API ---
+
+    def refresh(self) -> None:
+        """Reopen the database before the next checkout, once the cursors in use are returned."""
+        with self._condition:
+            self._stale = True
+
+    def class_of(self, panel: str) -> str:
+        """Query class of a panel tag (``default`` for untagged panels)."""
+        query_class = self.panel_classes.get(panel, panel)
+        return query_class if query_class in self.query_classes else DEFAULT_QUERY_CLASS
+
+    @contextlib.contextmanager
+    def cursor(self, query_class: str = DEFAULT_QUERY_CLASS, timeout: Optional[float] = None) -> Iterator[Any]:
+        """
+        Check out a cursor for ``query_class`` until the ``with`` block exits. ``timeout``
+        overrides the pool timeout; 0 means only take a cursor that is free right now.
+        """
+        query_class = query_class if query_class in self.query_classes else DEFAULT_QUERY_CLASS
+        cursor = self._acquire(query_class, self.timeout if timeout is None else timeout)
+        try:
+            self._apply_settings(cursor, self.query_classes[query_class].settings)
+            yield cursor
+        finally:
+            self._release(cursor, query_class)
+
+    def stats(self) -> pd.DataFrame:
+        """Per query class: cursors in use, acquisitions and time spent waiting for a cursor."""
+        with self._condition:
+            rows = [{
+                'query_class': name,
+                'in_use': self._in_use[name],
+                'acquisitions': stats.acquisitions,
+                'waits': stats.waits,
+                'timeouts': stats.timeouts,
+                'avg_wait_ms': stats.total_wait_ms / stats.acquisitions if stats.acquisitions else 0.0,
+                'max_wait_ms': stats.max_wait_ms,
+            } for name, stats in self._wait_stats.items()]
+        return pd.DataFrame(rows, columns=['query_class', 'in_use', 'acquisitions', 'waits', 'timeouts',
+                                           'avg_wait_ms', 'max_wait_ms'])
+
+    def size(self) -> Dict[str, int]:
+        """Cursors opened, idle and checked out, and how often the database was reopened."""
+        with self._condition:
+            return {'max_cursors': self.max_cursors, 'open': self._created, 'idle': len(self._idle),
+                    'in_use': self._created - len(self._idle), 'reconnects': self.reconnects}
+
+    def close(self) -> None:
+        """Close idle cursors and the database; checked-out cursors are closed on release."""
+        with self._condition:
+            self._closed = True
+            for cursor in self._idle:
+                cursor.close()
+            self._idle.clear()
+            if self._db is not None:
+                self._db.close()
+            self._condition.notify_all()
+
+    # --- Internals ---
+
+    def _open(self) -> None:
+        """Connect and apply the global settings; the caller holds the lock (or is __init__)."""
+        self._db = None
+        fingerprint = self._fingerprint_of() if self._fingerprint_of is not None else None
+        db = self._connect()
+        try:
+            for name, value in self.database_settings.items():
+                db.execute(f"SET GLOBAL {name} = {_sql_literal(value)}")
+        except Exception:
+            db.close()
+            raise
+        self._db = db
+        self._fingerprint = fingerprint
+
+    def _reopen(self) -> None:
+        """Close the idle cursors and the database, then connect again. Caller holds the lock."""
+        for cursor in self._idle:
+            cursor.close()
+        self._idle.clear()
+        self._created = 0
+        self._applied.clear()
+        if self._db is not None:
+            self._db.close()
+        # On failure _db stays None and the pool stays stale, so the next checkout retries
+        self._open()
+        self._stale = False
+        self.reconnects += 1
+
+    def _check_fingerprint(self) -> None:
+        """Mark the pool stale when the database fingerprint changed. Caller holds the lock."""
+        if self._fingerprint_of is None or self._stale:
+            return
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+        if self._fingerprint_of() != self._fingerprint:
+            self._stale = True
+
+    def _can_acquire(self, query_class: str) -> bool:
+        limit = self.query_classes[query_class].max_concurrent
+        if limit is not None and self._in_use[query_class] >= limit:
+            return False
+        return bool(self._idle) or self._created < self.max_cursors
+
+    def _acquire(self, query_class: str, timeout: float) -> Any:
+        start = time.monotonic()
+        deadline = start + timeout
+        with self._condition:
+            stats = self._wait_stats[query_class]
+            waited = False
+            self._check_fingerprint()
+            while self._stale or not self._can_acquire(query_class):
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+                if self._stale and len(self._idle) == self._created:
+                    # No cursor is checked out: safe to close the old database
+                    self._reopen()
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    # A non-blocking try (timeout 0) finding the pool busy is not a timeout
+                    if timeout > 0:
+                        stats.timeouts += 1
+                    raise PoolTimeout(f"No DuckDB cursor free for query class '{query_class}' "
+                                      f"after {timeout:.0f}s ({self.max_cursors} cursors)")
+                waited = True
+                self._condition.wait(remaining)
+            if self._closed:
+                raise RuntimeError("Connection pool is closed")
+
+            if self._idle:
+                cursor = self._idle.pop()
+            else:
+                cursor = self._db.cursor()
+                self._created += 1
+            self._in_use[query_class] += 1
+
+            wait_ms = (time.monotonic() - start) * 1000
+            stats.acquisitions += 1
+            stats.waits += waited
+            stats.total_wait_ms += wait_ms
+            stats.max_wait_ms = max(stats.max_wait_ms, wait_ms)
+        return cursor
+
+    def _release(self, cursor: Any, query_class: str) -> None:
+        with self._condition:
+            self._in_use[query_class] -= 1
+            if self._closed:
+                cursor.close()
+                self._created -= 1
+            else:
+                self._idle.append(cursor)
+            self._condition.notify_all()
+
+    def _apply_settings(self, cursor: Any, settings: Dict[str, Any]) -> None:
+        applied = self._applied.get(id(cursor), {})
+        if applied == settings:
+            return
+        for name in applied.keys() - settings.keys():
+            cursor.execute(f"RESET SESSION {name}")
+        for name, value in settings.items():
+            if applied.get(name) != value:
+                cursor.execute(f"SET SESSION {name} = {_sql_literal(value)}")
+        self._applied[id(cursor)] = dict(settings)
+
+
+def checkout(conn, panel: str = "query"):
+    """
+    Context manager yielding a connection to run one query on: a pooled cursor of the
+    panel's query class when ``conn`` is a ``ConnectionPool``, otherwise ``conn`` itself.
+    """
+    if isinstance(conn, ConnectionPool):
+        return conn.cursor(conn.class_of(panel))
+    return contextlib.nullcontext(conn)
+
+
+@contextlib.contextmanager
+def background_cursor(conn, panel: str = "query") -> Iterator[Any]:
+    """
+    Cursor for work off the session thread: a pooled cursor of the panel's query class if
+    one is free right now (``PoolTimeout`` otherwise), or a new cursor on ``conn``'s database.
+    """
+    if isinstance(conn, ConnectionPool):
+        with conn.cursor(conn.class_of(panel), timeout=0) as cursor:
+            yield cursor
+    else:
+        cursor = conn.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+
+def refresh_connection(conn) -> None:
+    """Have a ``ConnectionPool`` reopen its database; plain connections are left alone."""
+    if isinstance(conn, ConnectionPool):
+        conn.refresh()
@@ -0,0 +1,223 @@
+"""
+Query instrumentation for the Streamlit dashboard.
+
+Every dashboard query is tagged with the panel that issued it. ``QueryRecorder`` times the
+DuckDB execution and the result fetch/conversion separately, keeps the last N timings
+(cache hits included) for the hidden perf sidebar panel (``?perf=1``), and for queries
+slower than a threshold re-runs them under ``EXPLAIN ANALYZE`` and writes the profile to a
+rotating slow-query log. The re-run happens on a background worker with its own cursor,
+after the session got its result and returned its cursor; when the pool has no free
+cursor (or the job queue is full) the profile is skipped.
+
+One recorder is shared by every browser session (see ``get_query_recorder`` in ``app.py``).
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from connection_pool import PoolTimeout, background_cursor, checkout
+from query_cache import FETCHERS, normalize_sql
+
+SLOW_QUERY_LOGGER = "dashboard.slow_queries"
+
+
+@dataclass
+class QueryTiming:
+    """One query call as seen by a panel."""
+    panel: str
+    kind: str
+    execute_ms: float
+    fetch_ms: float
+    rows: int
+    cached: bool
+    slow: bool
+    started_at: float
+
+    @property
+    def total_ms(self) -> float:
+        return self.execute_ms + self.fetch_ms
+
+
+def make_slow_query_logger(log_path, max_bytes: int = 1024 * 1024, backup_count: int = 3) -> logging.Logger:
+    """Logger writing to a size-rotated file (``log_path``, ``log_path.1`` ...)."""
+    log_path = Path(log_path)
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    logger = logging.getLogger(f"{SLOW_QUERY_LOGGER}.{log_path.resolve()}")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if not logger.handlers:
+        handler = RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger.addHandler(handler)
+    return logger
+
+
+def result_rows(value: Any) -> int:
+    """Row count of a fetched result of any ``FETCHERS`` kind."""
+    if value is None:
+        return 0
+    if isinstance(value, tuple):
+        return 1
+    if isinstance(value, dict):
+        return len(next(iter(value.values()), ()))
+    return len(value)
+
+
+class QueryRecorder:
+    """Thread-safe per-panel query timer with a slow-query EXPLAIN ANALYZE log."""
+
+    def __init__(self,
+                 slow_query_ms: float = 500,
+                 history: int = 200,
+                 logger: Optional[logging.Logger] = None,
+                 explain_interval: float = 300,
+                 clock: Callable[[], float] = time.perf_counter,
+                 explain_queue_size: int = 16):
+        self.slow_query_ms = slow_query_ms
+        # Re-profile the same slow statement at most once per interval (EXPLAIN ANALYZE runs it again)
+        self.explain_interval = explain_interval
+        self.logger = logger
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._timings: "deque[QueryTiming]" = deque(maxlen=history)
+        self._last_explained: Dict[tuple, float] = {}
+        self.slow_queries = 0
+        self.explains_skipped = 0
+        self._explain_jobs: "queue.Queue[tuple]" = queue.Queue(maxsize=explain_queue_size)
+        self._explain_worker: Optional[threading.Thread] = None
+
+    # --- Public API ---
+
+    def fetchdf(self, conn, sql: str, params: Optional[Sequence] = None, panel: str = "query") -> pd.DataFrame:
+        """Timed equivalent of ``conn.execute(sql, params).fetchdf()``."""
+        return self.fetch("df", conn, sql, params, panel)
+
+    def fetchone(self, conn, sql: str, params: Optional[Sequence] = None, panel: str = "query") -> Optional[tuple]:
+        """Timed equivalent of ``conn.execute(sql, params).fetchone()``."""
+        return self.fetch("one", conn, sql, params, panel)
+
+    def fetch(self, kind: str, conn, sql: str, params: Optional[Sequence] = None, panel: str = "query") -> Any:
+        """Run ``sql`` and fetch the result as ``kind`` (a key of ``query_cache.FETCHERS``), timed."""
+        return self._run(conn, sql, params, panel, kind)
+
+    def record_hit(self, panel: str, kind: str) -> None:
+        """Record a result served from the query cache."""
+        self._append(QueryTiming(panel, kind, 0.0, 0.0, 0, True, False, time.time()))
+
+    def recent(self, n: int = 50) -> pd.DataFrame:
+        """The last ``n`` timings, newest first."""
+        with self._lock:
+            timings = list(self._timings)[-n:][::-1]
+        rows = [{**asdict(t), 'total_ms': t.total_ms} for t in timings]
+        columns = ['panel', 'kind', 'execute_ms', 'fetch_ms', 'total_ms', 'rows', 'cached', 'slow', 'started_at']
+        return pd.DataFrame(rows, columns=columns)
+
+    def wait_for_explains(self) -> None:
+        """Block until every queued EXPLAIN ANALYZE job has been handled."""
+        self._explain_jobs.join()
+
+    def panel_stats(self) -> pd.DataFrame:
+        """Per-panel call count, cache hits and p50/p95 latency of executed queries."""
+        with self._lock:
+            timings = list(self._timings)
+        rows = []
+        for panel in dict.fromkeys(t.panel for t in timings):
+            calls = [t for t in timings if t.panel == panel]
+            executed = [t.total_ms for t in calls if not t.cached]
+            rows.append({
+                'panel': panel,
+                'calls': len(calls),
+                'cache_hits': len(calls) - len(executed),
+                'p50_ms': float(np.percentile(executed, 50)) if executed else None,
+                'p95_ms': float(np.percentile(executed, 95)) if executed else None,
+            })
+        return pd.DataFrame(rows, columns=['panel', 'calls', 'cache_hits', 'p50_ms', 'p95_ms'])
+
+    # --- Internals ---
+
+    def _append(self, timing: QueryTiming) -> None:
+        with self._lock:
+            self._timings.append(timing)
+
+    def _run(self, conn, sql, params, panel, kind) -> Any:
+        # With a connection pool the cursor wait is not part of the query time (see ConnectionPool.stats)
+        with checkout(conn, panel) as cursor:
+            started_at = time.time()
+            start = self._clock()
+            result = cursor.execute(sql, params or [])
+            executed = self._clock()
+            value = FETCHERS[kind](result)
+            fetched = self._clock()
+
+            execute_ms = (executed - start) * 1000
+            fetch_ms = (fetched - executed) * 1000
+            slow = execute_ms + fetch_ms >= self.slow_query_ms
+            self._append(QueryTiming(panel, kind, execute_ms, fetch_ms, result_rows(value), False, slow, started_at))
+        if slow:
+            self._log_slow_query(conn, sql, params, panel, execute_ms, fetch_ms)
+        return value
+
+    def _log_slow_query(self, conn, sql, params, panel, execute_ms, fetch_ms) -> None:
+        """Count the slow query and queue its EXPLAIN ANALYZE (at most once per interval)."""
+        key = (normalize_sql(sql), tuple(params or ()))
+        now = self._clock()
+        with self._lock:
+            self.slow_queries += 1
+            if self.logger is None:
+                return
+            last = self._last_explained.get(key)
+            if last is not None and now - last < self.explain_interval:
+                return
+            if len(self._last_explained) >= 1024:
+                self._last_explained.clear()
+            self._last_explained[key] = now
+            if self._explain_worker is None:
+                self._explain_worker = threading.Thread(target=self._explain_loop, name='slow-query-explain',
+                                                        daemon=True)
+                self._explain_worker.start()
+
+        try:
+            self._explain_jobs.put_nowait((key, conn, sql, params, panel, execute_ms, fetch_ms))
+        except queue.Full:
+            self._skip_explain(key)
+
+    def _skip_explain(self, key) -> None:
+        # Let the next slow run of this statement try again
+        with self._lock:
+            self.explains_skipped += 1
+            self._last_explained.pop(key, None)
+
+    def _explain_loop(self) -> None:
+        while True:
+            job = self._explain_jobs.get()
+            try:
+                self._explain(*job)
+            finally:
+                self._explain_jobs.task_done()
+
+    def _explain(self, key, conn, sql, params, panel, execute_ms, fetch_ms) -> None:
+        """Re-run one slow query under EXPLAIN ANALYZE on a cursor of its own and log the profile."""
+        try:
+            with background_cursor(conn, panel) as cursor:
+                rows = cursor.execute(f"EXPLAIN ANALYZE {sql}", params or []).fetchall()
+            plan = "\n".join(row[1] for row in rows)
+        except PoolTimeout:
+            self._skip_explain(key)
+            return
+        except Exception as e:
+            plan = f"(EXPLAIN ANALYZE failed: {e})"
+        self.logger.info(
+            "slow query panel=%s execute_ms=%.1f fetch_ms=%.1f params=%r\n%s\n%s",
+            panel, execute_ms, fetch_ms, list(params or []), normalize_sql(sql), plan,
+        )
@@ -0,0 +1,188 @@
+"""
+SQL issued by the Streamlit dashboard panels.
+
+The aggregate panels (KPI cards, major/subject bars, attendance heatmap) are answered
+from the pre-aggregated rollup table written by ``generate_star_schema.py``; the
+row-level filtered panels (histogram, risk analysis) read the pre-joined wide fact
+table, and the student profile reads a single student's fact_id range located through
+the ``student_offsets`` index.
+"""
+
+from typing import List, Tuple
+
+ROLLUP_TABLE = "agg_year_major_subject"
+WIDE_TABLE = "fact_wide"
+
+# Score histogram: 20 equal-width buckets over 0-100, with 100 folded into the last bucket
+SCORE_BINS = 20
+SCORE_BIN_WIDTH = 100 // SCORE_BINS
+
+
+def fact_source(parquet_dir, name):
+    """
+    Table expression for a fact table: a Hive-partitioned directory (year=/major=
+    subdirectories, pruned by the sidebar filters) or the single file plus any
+    incremental ``*_incNNN.parquet`` loads.
+    """
+    partition_dir = parquet_dir / name
+    if partition_dir.is_dir():
+        return f"read_parquet('{partition_dir / '**' / '*.parquet'}', hive_partitioning = true)"
+    return f"'{parquet_dir / f'{name}*.parquet'}'"
+
+
+def create_star_schema_views(conn, parquet_dir):
+    """Expose the star-schema Parquet files in ``parquet_dir`` as the views the panels query."""
+    conn.execute(f"CREATE VIEW fact_student_performance AS SELECT * FROM {fact_source(parquet_dir, 'fact_student_performance')}")
+    conn.execute(f"CREATE VIEW dim_student AS SELECT * FROM '{parquet_dir / 'dim_student.parquet'}'")
+    conn.execute(f"CREATE VIEW dim_university AS SELECT * FROM '{parquet_dir / 'dim_university.parquet'}'")
+    conn.execute(f"CREATE VIEW dim_course AS SELECT * FROM '{parquet_dir / 'dim_course.parquet'}'")
+    conn.execute(f"CREATE VIEW dim_date AS SELECT * FROM '{parquet_dir / 'dim_date.parquet'}'")
+    conn.execute(f"CREATE VIEW student_offsets AS SELECT * FROM '{parquet_dir / 'student_offsets*.parquet'}'")
+    conn.execute(f"CREATE VIEW {ROLLUP_TABLE} AS SELECT * FROM '{parquet_dir / f'{ROLLUP_TABLE}.parquet'}'")
+    # Pre-joined fact rows for the filtered dashboard panels (no joins, row-group pruning)
+    conn.execute(f"CREATE VIEW {WIDE_TABLE} AS SELECT * FROM {fact_source(parquet_dir, WIDE_TABLE)}")
+
+
+def build_wide_filter(selected_year, selected_major, selected_subject) -> Tuple[str, List]:
+    """Build the WHERE clause and params for queries over the wide fact table."""
+    where_conditions = ["1=1"]
+    params = []
+
+    if selected_year != "All":
+        where_conditions.append("w.year = ?")
+        params.append(selected_year)
+
+    if selected_major != "All":
+        where_conditions.append("w.major = ?")
+        params.append(selected_major)
+
+    if selected_subject != "All":
+        where_conditions.append("w.subject = ?")
+        params.append(selected_subject)
+
+    return " AND ".join(where_conditions), params
+
+
+def build_rollup_filter(selected_year, selected_major, selected_subject, by_subject=False) -> Tuple[str, List]:
+    """
+    Build the WHERE clause and params for queries over the rollup table.
+
+    The rollup holds two grouping levels: one row per (year, major, subject) and one
+    per (year, major) with ``subject`` NULL. Totals read the per-(year, major) rows
+    unless a subject is selected; ``by_subject`` forces the per-subject rows for
+    panels that group by subject.
+    """
+    where_conditions = ["1=1"]
+    params = []
+
+    if selected_year != "All":
+        where_conditions.append("r.year = ?")
+        params.append(selected_year)
+
+    if selected_major != "All":
+        where_conditions.append("r.major = ?")
+        params.append(selected_major)
+
+    if selected_subject != "All":
+        where_conditions.append("r.subject = ?")
+        params.append(selected_subject)
+    elif by_subject:
+        where_conditions.append("r.subject IS NOT NULL")
+    else:
+        where_conditions.append("r.subject IS NULL")
+
+    return " AND ".join(where_conditions), params
+
+
+# --- Rollup panels ---
+
+# Every scalar metric for the current filters in a single pass; shared by all views
+SUMMARY_QUERY = f"""
+    SELECT
+        SUM(r.score_sum) * 1.0 / SUM(r.record_count) as avg_score,
+        SUM(r.attended_count) * 100.0 / SUM(r.record_count) as attendance_rate,
+        SUM(r.student_count) as total_students,
+        SUM(r.pass_count) * 100.0 / SUM(r.record_count) as pass_rate,
+        SUM(r.at_risk_count) as at_risk_count,
+        SUM(r.record_count) as row_count
+    FROM {ROLLUP_TABLE} r
+    WHERE {{where_clause}}
+"""
+
+MAJOR_BAR_QUERY = f"""
+    SELECT r.major, SUM(r.score_sum) * 1.0 / SUM(r.record_count) as avg_score
+    FROM {ROLLUP_TABLE} r
+    WHERE {{where_clause}}
+    GROUP BY r.major
+    ORDER BY avg_score DESC
+    LIMIT 10
+"""
+
+SUBJECT_BAR_QUERY = f"""
+    SELECT r.subject, SUM(r.score_sum) * 1.0 / SUM(r.record_count) as avg_score, SUM(r.record_count) as students
+    FROM {ROLLUP_TABLE} r
+    WHERE {{where_clause}}
+    GROUP BY r.subject
+    ORDER BY avg_score DESC
+    LIMIT 10
+"""
+
+HEATMAP_QUERY = f"""
+    SELECT
+        r.major,
+        r.subject,
+        SUM(r.attended_count) * 1.0 / SUM(r.record_count) as attendance_rate
+    FROM {ROLLUP_TABLE} r
+    WHERE {{where_clause}}
+    GROUP BY r.major, r.subject
+"""
+
+# --- Row-level panels ---
+
+HIST_QUERY = f"""
+    SELECT
+        LEAST(CAST(FLOOR(w.score / {SCORE_BIN_WIDTH}) AS INTEGER), {SCORE_BINS - 1}) as bucket,
+        COUNT(*) as count
+    FROM {WIDE_TABLE} w
+    WHERE {{where_clause}}
+    GROUP BY bucket
+    ORDER BY bucket
+"""
+
+# fact_wide is stored sorted by (year, major, subject), so a bare LIMIT would only return
+# the first cohort: the scatter samples across the filtered rows instead, and the risk
+# list is ordered explicitly (lowest scores first).
+RISK_SCATTER_QUERY = f"""
+    SELECT * FROM (
+        SELECT w.score, CAST(w.attendance_flag AS INTEGER) as attendance
+        FROM {WIDE_TABLE} w
+        WHERE {{where_clause}}
+    ) USING SAMPLE reservoir(2000 ROWS) REPEATABLE (42)
+"""
+
+RISK_LIST_QUERY = f"""
+    SELECT w.student_id, w.student_name, w.university_name, w.subject, w.score
+    FROM {WIDE_TABLE} w
+    WHERE {{where_clause}} AND (w.score < 60 OR w.attendance_flag = FALSE)
+    ORDER BY w.score, w.fact_id
+    LIMIT 1000
+"""
+
+# Student profile: resolve the student and its fact_id range from the offset index, then
+# read only that range (the fact table is clustered by student_key).
+STUDENT_QUERY = """
+    SELECT s.*, o.fact_id_start, o.fact_id_end
+    FROM dim_student s
+    JOIN student_offsets o ON s.student_key = o.student_key
+    WHERE s.student_number = ?
+"""
+
+HISTORY_QUERY = """
+    SELECT
+        d.year, d.semester, c.subject, f.score, f.grade, f.attendance_flag
+    FROM fact_student_performance f
+    JOIN dim_date d ON f.date_id = d.date_id
+    JOIN dim_course c ON f.course_key = c.course_key
+    WHERE f.fact_id BETWEEN ? AND ?
+    ORDER BY d.year DESC, d.semester
+"""
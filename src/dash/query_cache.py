@@ -0,0 +1,233 @@
+"""
+Process-wide query result cache for the Streamlit dashboard.
+
+One ``QueryCache`` instance is shared by every browser session (see ``get_query_cache``
+in ``app.py``). Entries are keyed on the whitespace-normalized SQL text plus the bound
+parameters, expire after a TTL, and are evicted least-recently-used once either the
+entry count or the byte budget is exceeded. The whole cache is dropped whenever a
+watched source changes (mtime or size) -- the Parquet files under a source directory
+or a source file such as the DuckDB warehouse -- so a rebuilt star schema is never
+served stale results.
+
+Cached results are shared between sessions and must be treated as read-only.
+
+With a ``recorder`` (``perf.QueryRecorder``) every call is timed under the panel name
+passed by the caller; cache hits are recorded as such.
+
+``conn`` may be a DuckDB connection or a ``connection_pool.ConnectionPool``; with a pool a
+cursor is checked out only on a cache miss, for the query and its fetch. An invalidation
+also makes the pool reopen its database, so the re-run queries do not read the old
+warehouse catalog.
+"""
+
+import functools
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from connection_pool import checkout, refresh_connection
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace so formatting differences do not produce separate entries."""
+    return " ".join(sql.split())
+
+
+def to_arrow_table(result) -> pa.Table:
+    """Arrow table of a DuckDB result (``to_arrow_table`` on DuckDB >= 1.4, ``fetch_arrow_table`` before)."""
+    fetch = getattr(result, 'to_arrow_table', None) or result.fetch_arrow_table
+    return fetch()
+
+
+# How a DuckDB result is fetched, by result kind: pandas DataFrame, first row, Arrow table
+# or a dict of NumPy arrays (the last two skip the pandas conversion)
+FETCHERS: Dict[str, Callable[[Any], Any]] = {
+    'df': lambda result: result.fetchdf(),
+    'one': lambda result: result.fetchone(),
+    'arrow': to_arrow_table,
+    'numpy': lambda result: result.fetchnumpy(),
+}
+
+
+def run_query(kind: str, conn, sql: str, params: Optional[Sequence] = None, panel: str = "query") -> Any:
+    """Execute ``sql`` and fetch the result as ``kind``, on a pooled cursor when ``conn`` is a pool."""
+    with checkout(conn, panel) as cursor:
+        return FETCHERS[kind](cursor.execute(sql, params or []))
+
+
+def estimate_size(result: Any) -> int:
+    """Approximate the in-memory size of a cached result in bytes."""
+    if isinstance(result, pd.DataFrame):
+        return int(result.memory_usage(index=True, deep=True).sum())
+    if isinstance(result, pa.Table):
+        return int(result.nbytes)
+    if isinstance(result, dict):
+        # fetchnumpy: strings come back as object arrays, whose nbytes only counts the pointers
+        size = 0
+        for array in result.values():
+            size += int(array.nbytes)
+            if array.dtype == object:
+                size += sum(sys.getsizeof(v) for v in np.asarray(array).ravel())
+        return size
+    if isinstance(result, (tuple, list)):
+        return sys.getsizeof(result) + sum(sys.getsizeof(v) for v in result)
+    return sys.getsizeof(result)
+
+
+class QueryCache:
+    """Thread-safe TTL + LRU cache of query results with a byte budget."""
+
+    def __init__(self,
+                 sources,
+                 ttl_seconds: float = 600,
+                 max_entries: int = 256,
+                 max_bytes: int = 64 * 1024 * 1024,
+                 check_interval: float = 2.0,
+                 clock: Callable[[], float] = time.monotonic,
+                 recorder=None):
+        # A directory/file path or a list of them
+        if isinstance(sources, (list, tuple)):
+            self.sources = [Path(p) for p in sources]
+        else:
+            self.sources = [Path(sources)]
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.check_interval = check_interval
+        self._clock = clock
+        self.recorder = recorder
+
+        self._lock = threading.Lock()
+        # key -> (expires_at, size_bytes, result)
+        self._entries: "OrderedDict[Tuple, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._fingerprint = self._source_fingerprint()
+        self._last_check = self._clock()
+        # Bumped on every invalidation; results loaded across one are not stored
+        self._generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # --- Public API ---
+
+    def fetchdf(self, conn, sql: str, params: Optional[Sequence] = None, panel: str = "query") -> pd.DataFrame:
+        """Cached equivalent of ``conn.execute(sql, params).fetchdf()``."""
+        return self.fetch("df", conn, sql, params, panel)
+
+    def fetchone(self, conn, sql: str, params: Optional[Sequence] = None, panel: str = "query") -> Optional[tuple]:
+        """Cached equivalent of ``conn.execute(sql, params).fetchone()``."""
+        return self.fetch("one", conn, sql, params, panel)
+
+    def fetch_arrow(self, conn, sql: str, params: Optional[Sequence] = None, panel: str = "query") -> pa.Table:
+        """Cached Arrow table of the result (no pandas conversion)."""
+        return self.fetch("arrow", conn, sql, params, panel)
+
+    def fetchnumpy(self, conn, sql: str, params: Optional[Sequence] = None,
+                   panel: str = "query") -> Dict[str, np.ndarray]:
+        """Cached equivalent of ``conn.execute(sql, params).fetchnumpy()``."""
+        return self.fetch("numpy", conn, sql, params, panel)
+
+    def fetch(self, kind: str, conn, sql: str, params: Optional[Sequence] = None, panel: str = "query") -> Any:
+        """Cached result of ``sql`` fetched as ``kind`` (a key of ``FETCHERS``)."""
+        run = self.recorder.fetch if self.recorder is not None else run_query
+        loader = functools.partial(run, kind, conn, sql, params, panel)
+        return self._get((kind, sql, params), loader, panel, conn)
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and current occupancy."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+            }
+
+    def clear(self) -> None:
+        """Drop every cached entry (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    # --- Internals ---
+
+    def _make_key(self, kind: str, sql: str, params: Optional[Sequence]) -> Tuple:
+        return (kind, normalize_sql(sql), tuple(params or ()))
+
+    def _source_fingerprint(self) -> Tuple:
+        """(path, mtime_ns, size) for every watched file and every Parquet file under a watched directory."""
+        files = []
+        for source in self.sources:
+            if source.is_dir():
+                files.extend(sorted(source.rglob("*.parquet")))
+            elif source.exists():
+                files.append(source)
+        return tuple((str(p), p.stat().st_mtime_ns, p.stat().st_size) for p in files)
+
+    def _check_source(self, now: float) -> bool:
+        """Invalidate everything if the star-schema files changed. Caller holds the lock."""
+        if now - self._last_check < self.check_interval:
+            return False
+        self._last_check = now
+        fingerprint = self._source_fingerprint()
+        if fingerprint == self._fingerprint:
+            return False
+        self._fingerprint = fingerprint
+        self._entries.clear()
+        self._bytes = 0
+        self._generation += 1
+        self.invalidations += 1
+        return True
+
+    def _get(self, spec: Tuple[str, str, Optional[Sequence]], loader: Callable[[], Any], panel: str = "query",
+             conn=None) -> Any:
+        key = self._make_key(*spec)
+        with self._lock:
+            now = self._clock()
+            if self._check_source(now):
+                refresh_connection(conn)
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, size, result = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    if self.recorder is not None:
+                        self.recorder.record_hit(panel, spec[0])
+                    return result
+                del self._entries[key]
+                self._bytes -= size
+            self.misses += 1
+            generation = self._generation
+
+        # Run the query outside the lock so slow queries do not block cache hits
+        result = loader()
+        size = estimate_size(result)
+
+        with self._lock:
+            if size <= self.max_bytes and generation == self._generation:
+                if key in self._entries:
+                    self._bytes -= self._entries.pop(key)[1]
+                self._entries[key] = (self._clock() + self.ttl_seconds, size, result)
+                self._bytes += size
+                self._evict()
+        return result
+
+    def _evict(self) -> None:
+        """Drop least-recently-used entries until within budget. Caller holds the lock."""
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, size, _) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
@@ -4,16 +4,20 @@ Assemble cleaned batch Parquet files into a single Parquet for analysis.
 This script discovers batch Parquet files like:
   data/milestone1_real/students_batch_01_100K_cleaned.parquet ... 10
 
-It reads the Parquet files directly, concatenates them in numeric order, and writes:
+It streams the Parquet files in numeric order, record batch by record batch,
+through a single Arrow writer (never materializing a batch file), and writes:
   data/milestone1_real/cleaned_students.parquet
 
 Optionally, it can also create a sample Parquet by uniformly sampling a fixed
-number of rows from each batch.
+number of rows from each batch. The rows to keep are drawn up front from the
+row count in the Parquet footer and picked out in the same streaming pass.
 
 Usage (from project root):
   python scripts/assemble_dataset.py --create-sample --rows-per-batch 10000
 
-Dependencies: pandas, pyarrow
+Dependencies: numpy, pyarrow (the streaming path reads and writes through pyarrow only;
+the batch files' schemas are unified up front, so a column that is empty in one batch
+takes its type from the others)
 
 NOTE: Original CSV functionality is preserved in comments below for reference.
 """
@@ -29,13 +33,18 @@ import zipfile
 from glob import glob
 from typing import List
 
-import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 
 DATA_DIR = os.path.join("data", "milestone1_real")
 OUTPUT_FULL = os.path.join(DATA_DIR, "cleaned_students.parquet")
 OUTPUT_SAMPLE = os.path.join(DATA_DIR, "sample_100K_students.parquet")
 
+# Rows decoded per streaming step; memory stays flat at roughly one step
+STREAM_BATCH_ROWS = 65536
+
 # Original CSV output paths (preserved for reference):
 # OUTPUT_FULL_CSV = os.path.join(DATA_DIR, "cleaned_students.csv")
 # OUTPUT_SAMPLE_CSV = os.path.join(DATA_DIR, "sample_100K_students.csv")
@@ -90,9 +99,37 @@ def find_batch_parquet_files() -> List[str]:
 #     return sorted(zips, key=batch_sort_key)
 
 
-def read_parquet_file(parquet_path: str) -> pd.DataFrame:
-    """Read a Parquet file into a DataFrame."""
-    return pd.read_parquet(parquet_path)
+def unified_schema(paths: List[str]) -> pa.Schema:
+    """One schema for all batch files: a column typed null in one batch (all values empty)
+    takes its type from the batches where it has values."""
+    return pa.unify_schemas([pq.read_schema(path) for path in paths], promote_options="permissive")
+
+
+class StreamingParquetWriter:
+    """ParquetWriter with a fixed schema; every table is cast to it. Closing with no rows
+    written still leaves a valid (empty) Parquet file."""
+
+    def __init__(self, path: str, schema: pa.Schema):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.schema = schema
+        self.writer = pq.ParquetWriter(self.tmp_path, schema)
+        self.rows = 0
+
+    def write(self, table: pa.Table) -> None:
+        if table.schema != self.schema:
+            table = table.select(self.schema.names).cast(self.schema)
+        self.writer.write_table(table)
+        self.rows += table.num_rows
+
+    def close(self) -> None:
+        """Finish the file and move it into place."""
+        self.writer.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self) -> None:
+        self.writer.close()
+        os.remove(self.tmp_path)
 
 # Original CSV/ZIP functionality (preserved for reference):
 # def read_csv_from_zip(zip_path: str) -> pd.DataFrame:
@@ -117,25 +154,42 @@ def assemble(create_sample: bool, rows_per_batch: int, random_seed: int) -> None
             f"No batch Parquet files found in {DATA_DIR}. Expected files like 'students_batch_01_100K_cleaned.parquet'."
         )
 
-    full_frames: List[pd.DataFrame] = []
-    sample_frames: List[pd.DataFrame] = []
-
-    for parquet_file in parquet_files:
-        df = read_parquet_file(parquet_file)
-        full_frames.append(df)
+    rng = np.random.default_rng(random_seed)
+    schema = unified_schema(parquet_files)
+    full_writer = StreamingParquetWriter(OUTPUT_FULL, schema)
+    sample_writer = StreamingParquetWriter(OUTPUT_SAMPLE, schema) if create_sample else None
 
-        if create_sample:
-            n = min(rows_per_batch, len(df))
-            sample_frames.append(df.sample(n=n, random_state=random_seed))
-
-    full_df = pd.concat(full_frames, ignore_index=True)
-    full_df.to_parquet(OUTPUT_FULL, index=False)
-    print(f"Saved full dataset: {OUTPUT_FULL} (rows: {len(full_df):,})")
+    try:
+        for parquet_path in parquet_files:
+            parquet_file = pq.ParquetFile(parquet_path)
+
+            # Uniform sample without replacement: pick row positions from the footer row count
+            if create_sample:
+                num_rows = parquet_file.metadata.num_rows
+                picks = np.sort(rng.choice(num_rows, size=min(rows_per_batch, num_rows), replace=False))
+
+            offset = 0
+            for batch in parquet_file.iter_batches(batch_size=STREAM_BATCH_ROWS):
+                table = pa.Table.from_batches([batch])
+                full_writer.write(table)
+
+                if create_sample:
+                    lo, hi = np.searchsorted(picks, [offset, offset + batch.num_rows])
+                    if hi > lo:
+                        sample_writer.write(table.take(picks[lo:hi] - offset))
+                offset += batch.num_rows
+    except Exception:
+        full_writer.abort()
+        if sample_writer is not None:
+            sample_writer.abort()
+        raise
+
+    full_writer.close()
+    print(f"Saved full dataset: {OUTPUT_FULL} (rows: {full_writer.rows:,})")
 
     if create_sample:
-        sample_df = pd.concat(sample_frames, ignore_index=True)
-        sample_df.to_parquet(OUTPUT_SAMPLE, index=False)
-        print(f"Saved sample dataset: {OUTPUT_SAMPLE} (rows: {len(sample_df):,})")
+        sample_writer.close()
+        print(f"Saved sample dataset: {OUTPUT_SAMPLE} (rows: {sample_writer.rows:,})")
 
 # Original CSV/ZIP functionality (preserved for reference):
 # def assemble_csv(create_sample: bool, rows_per_batch: int, random_seed: int) -> None:
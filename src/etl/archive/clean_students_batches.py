@@ -1,10 +1,15 @@
+import argparse
 import os
 import sys
 import re
 import json
-from typing import Dict, List
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "milestone1_real")
@@ -123,36 +128,45 @@ UNIVERSITY_TO_TYPE: Dict[str, str] = {
 }
 
 
+def map_unique(series: pd.Series, func) -> pd.Series:
+    """Apply a scalar function once per distinct value and broadcast the results back."""
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    lookup = np.array([func(v) for v in uniques], dtype=object)
+    return pd.Series(lookup[codes], index=series.index)
+
+
 def generate_student_aliases(series: pd.Series) -> pd.Series:
-    unique_names = pd.Index(series.fillna("").unique())
     # Map any name that matches Unk_Student_\d+ to Student_00001-style sequential ids based on first appearance
+    codes, unique_names = pd.factorize(series)
     unk_mask = unique_names.str.match(r"^Unk_Student_\d+$")
-    unk_names = unique_names[unk_mask]
-    mapping: Dict[str, str] = {}
-    for idx, _name in enumerate(unk_names, start=1):
-        mapping[_name] = f"Student_{idx:05d}"
-    # Non-unk names remain as-is
-    return series.map(lambda x: mapping.get(x, x))
+    aliases = np.array(unique_names, dtype=object)
+    aliases[unk_mask] = [f"Student_{idx:05d}" for idx in range(1, int(unk_mask.sum()) + 1)]
+    # Non-unk names remain as-is; missing names (code -1) stay missing
+    aliases = np.append(aliases, np.nan)
+    return pd.Series(aliases[codes], index=series.index)
 
 
-def coerce_boolean(series: pd.Series) -> pd.Series:
+def to_bool(v) -> bool:
     truthy = {True, "true", "True", "1", 1, "Yes", "YES", "yes"}
     falsy = {False, "false", "False", "0", 0, "No", "NO", "no"}
-    def to_bool(v):
-        if pd.isna(v):
-            return False
-        if v in truthy:
+    if pd.isna(v):
+        return False
+    if v in truthy:
+        return True
+    if v in falsy:
+        return False
+    if isinstance(v, str):
+        vs = v.strip().lower()
+        if vs in {"t", "y"}:
             return True
-        if v in falsy:
+        if vs in {"f", "n"}:
             return False
-        if isinstance(v, str):
-            vs = v.strip().lower()
-            if vs in {"t", "y"}:
-                return True
-            if vs in {"f", "n"}:
-                return False
-        return bool(v)
-    return series.apply(to_bool)
+    return bool(v)
+
+
+def coerce_boolean(series: pd.Series) -> pd.Series:
+    # Attendance holds a handful of distinct spellings, so coerce each one once
+    return map_unique(series, to_bool).astype(bool)
 
 
 def standardize_performance(series: pd.Series) -> pd.Series:
@@ -167,34 +181,43 @@ def standardize_performance(series: pd.Series) -> pd.Series:
 
 
 def ensure_iso_dates(series: pd.Series) -> pd.Series:
-    parsed = pd.to_datetime(series, errors="coerce", infer_datetime_format=True)
-    return parsed.dt.strftime("%Y-%m-%d")
-
-
-def clean_batch(input_path: str, output_path: str) -> None:
-    df = pd.read_csv(
-        input_path,
-        dtype={
-            "student_id": str,
-            "name": str,
-            "university": str,
-            "university_state": str,
-            "university_type": str,
-            "subject": str,
-            "score": float,
-            "grade": str,
-            "attendance": object,
-            "performance_category": str,
-            "year": int,
-            "semester": str,
-            "date": str,
-            "credits": float,
-            "course_level": str,
-            "ipeds_institutional_factor": float,
-            "batch_number": int,
-        },
-        low_memory=False,
-    )
+    # Parse each distinct date string once (the format is inferred from the first one, as before)
+    codes, uniques = pd.factorize(series)
+    parsed = pd.to_datetime(pd.Series(uniques), errors="coerce").dt.strftime("%Y-%m-%d")
+    lookup = np.append(parsed.to_numpy(dtype=object), np.nan)
+    return pd.Series(lookup[codes], index=series.index)
+
+
+BATCH_DTYPES = {
+    "student_id": str,
+    "name": str,
+    "university": str,
+    "university_state": str,
+    "university_type": str,
+    "subject": str,
+    "score": float,
+    "grade": str,
+    "attendance": object,
+    "performance_category": str,
+    "year": int,
+    "semester": str,
+    "date": str,
+    "credits": float,
+    "course_level": str,
+    "ipeds_institutional_factor": float,
+    "batch_number": int,
+}
+
+
+def read_batch(input_path: str, engine: str = "c") -> pd.DataFrame:
+    # engine="pyarrow" uses Arrow's multithreaded CSV reader
+    if engine == "pyarrow":
+        return pd.read_csv(input_path, dtype=BATCH_DTYPES, engine="pyarrow")
+    return pd.read_csv(input_path, dtype=BATCH_DTYPES, low_memory=False)
+
+
+def clean_batch(input_path: str, output_path: str, engine: str = "c") -> None:
+    df = read_batch(input_path, engine)
 
     # Rename columns to snake_case where requested
     rename_map = {
@@ -209,9 +232,8 @@ def clean_batch(input_path: str, output_path: str) -> None:
     df["student_name"] = generate_student_aliases(df["student_name"]) if "student_name" in df else df["student_name"]
 
     # University state mapping; leave Unknown if not mapped
-    df["state"] = df.apply(
-        lambda r: UNIVERSITY_TO_STATE.get(str(r["university"]).strip(), r.get("state", "Unknown")), axis=1
-    )
+    mapped_state = map_unique(df["university"], lambda u: UNIVERSITY_TO_STATE.get(str(u).strip()))
+    df["state"] = mapped_state.where(mapped_state.notna(), df["state"] if "state" in df else "Unknown")
 
     # University type mapping; prefer mapping over existing value
     df["university_type"] = df["university"].map(UNIVERSITY_TO_TYPE).fillna(df.get("university_type"))
@@ -251,23 +273,71 @@ def clean_batch(input_path: str, output_path: str) -> None:
     df = df[ordered_cols]
 
     # Write cleaned batch
-    df.to_csv(output_path, index=False)
+    if output_path.endswith(".parquet"):
+        df.to_parquet(output_path, index=False, compression="snappy")
+    else:
+        df.to_csv(output_path, index=False)
+
+
+def clean_batches(jobs: List[Tuple[str, str]], workers: int = 1, engine: str = "c") -> None:
+    # Batches are independent, so they can be cleaned concurrently in a process pool
+    for in_path, out_path in jobs:
+        print(f"Cleaning {os.path.basename(in_path)} -> {os.path.basename(out_path)}")
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(clean_batch, in_path, out_path, engine) for in_path, out_path in jobs]
+            for future in futures:
+                future.result()
+    else:
+        for in_path, out_path in jobs:
+            clean_batch(in_path, out_path, engine)
+
+
+def combine_parquet_batches(paths: List[str], output_path: str) -> None:
+    # Stream row groups into one file instead of re-reading and concatenating every batch.
+    # The schema is unified across all batches first: a column that is entirely empty in
+    # one batch is read as type null there, and must take its type from the other batches.
+    schema = pa.unify_schemas([pq.read_schema(path) for path in paths], promote_options="permissive")
+    tmp_path = output_path + ".tmp"
+    with pq.ParquetWriter(tmp_path, schema, compression="snappy") as writer:
+        for path in paths:
+            parquet_file = pq.ParquetFile(path)
+            for i in range(parquet_file.num_row_groups):
+                table = parquet_file.read_row_group(i)
+                if table.schema != schema:
+                    table = table.select(schema.names).cast(schema)
+                writer.write_table(table)
+    os.replace(tmp_path, output_path)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Clean the student batch CSVs and combine them.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of batches cleaned in parallel (default: 1)")
+    parser.add_argument("--parquet", action="store_true",
+                        help="Read with the pyarrow CSV reader and write Parquet batches and cleaned_students.parquet")
+    return parser.parse_args()
 
 
 def main():
+    args = parse_args()
+    output_ext = "parquet" if args.parquet else "csv"
+    engine = "pyarrow" if args.parquet else "c"
+
     input_batches: List[str] = [
         os.path.join(DATA_DIR, f"students_batch_{i:02d}_100K.csv") for i in range(1, 11)
     ]
     output_batches: List[str] = [
-        os.path.join(DATA_DIR, f"students_batch_{i:02d}_100K_cleaned.csv") for i in range(1, 11)
+        os.path.join(DATA_DIR, f"students_batch_{i:02d}_100K_cleaned.{output_ext}") for i in range(1, 11)
     ]
 
+    jobs: List[Tuple[str, str]] = []
     for in_path, out_path in zip(input_batches, output_batches):
         if not os.path.exists(in_path):
             print(f"Warning: missing input batch {in_path}")
             continue
-        print(f"Cleaning {os.path.basename(in_path)} -> {os.path.basename(out_path)}")
-        clean_batch(in_path, out_path)
+        jobs.append((in_path, out_path))
+    clean_batches(jobs, workers=args.workers, engine=engine)
 
     # Concatenate cleaned batches
     existing_outputs = [p for p in output_batches if os.path.exists(p)]
@@ -275,20 +345,25 @@ def main():
         print("No cleaned batches produced. Exiting.")
         sys.exit(1)
 
-    frames = [pd.read_csv(p, low_memory=False) for p in existing_outputs]
-    combined = pd.concat(frames, ignore_index=True)
-    combined_out = os.path.join(DATA_DIR, "cleaned_students.csv")
-    combined.to_csv(combined_out, index=False)
+    if args.parquet:
+        combined_out = os.path.join(DATA_DIR, "cleaned_students.parquet")
+        combine_parquet_batches(existing_outputs, combined_out)
+    else:
+        frames = [pd.read_csv(p, low_memory=False) for p in existing_outputs]
+        combined = pd.concat(frames, ignore_index=True)
+        combined_out = os.path.join(DATA_DIR, "cleaned_students.csv")
+        combined.to_csv(combined_out, index=False)
     print(f"Wrote combined cleaned file: {combined_out}")
 
-    # Delete old combined raw file if present
-    raw_combined = os.path.join(DATA_DIR, "student_performance_1M_real_data.csv")
-    if os.path.exists(raw_combined):
-        try:
-            os.remove(raw_combined)
-            print(f"Deleted old combined file: {raw_combined}")
-        except Exception as e:
-            print(f"Could not delete {raw_combined}: {e}")
+    # Delete old combined raw file if present (CSV from older runs, Parquet from the streaming writer)
+    for raw_name in ("student_performance_1M_real_data.csv", "student_performance_1M_real_data.parquet"):
+        raw_combined = os.path.join(DATA_DIR, raw_name)
+        if os.path.exists(raw_combined):
+            try:
+                os.remove(raw_combined)
+                print(f"Deleted old combined file: {raw_combined}")
+            except Exception as e:
+                print(f"Could not delete {raw_combined}: {e}")
 
 
 if __name__ == "__main__":
@@ -4,6 +4,7 @@ Based on IPEDS Real Data + Generated Student-Level Records
 100K students per batch, targeting 1M total from top 50 universities (2010-2024)
 """
 
+import argparse
 import os
 import subprocess
 import sys
@@ -13,10 +14,13 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import logging
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from glob import glob
 from tqdm import tqdm
 import requests
 import pyarrow  # For Parquet support
+import pyarrow.parquet as pq
 
 # Add src/etl directory to path for imports
 import sys
@@ -24,24 +28,79 @@ from pathlib import Path
 current_dir = Path(__file__).parent
 if str(current_dir) not in sys.path:
     sys.path.insert(0, str(current_dir))
-from majors_config import assign_major, get_major_subjects, MAJORS_CATALOG
+from majors_config import assign_majors, sample_subjects_bulk, MAJOR_NAMES, SUBJECT_NAMES, MAJORS_CATALOG
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Subject difficulty: lower scores and attendance
+HARD_SUBJECTS = ['Mathematics', 'Physics', 'Chemistry', 'Engineering']
+
+# Grade table: score >= GRADE_CUTOFFS[i - 1] maps to GRADES[i] (lookup with np.searchsorted)
+GRADE_CUTOFFS = np.array([57, 60, 63, 67, 70, 73, 77, 83, 87, 93, 97])
+GRADES = np.array(['F', 'D', 'D+', 'C-', 'C', 'C+', 'B-', 'B', 'B+', 'A-', 'A', 'A+'])
+GRADE_CATEGORIES = np.array(['Poor', 'Low', 'Low', 'Low', 'Medium', 'Medium', 'Medium',
+                             'High', 'High', 'High', 'Excellent', 'Excellent'])
+
+class BatchSummary:
+    """Dataset summary statistics accumulated one batch at a time"""
+    
+    def __init__(self):
+        self.total_records = 0
+        self.unique_students = 0
+        self.universities = set()
+        self.subjects = set()
+        self.min_year = None
+        self.max_year = None
+        self.score_sum = 0
+        self.attended = 0
+        self.performance_counts = Counter()
+        self.university_students = Counter()
+    
+    def update(self, df_batch):
+        """Add one batch (students never span batches, so student counts are additive)"""
+        self.total_records += len(df_batch)
+        self.unique_students += df_batch['student_id'].nunique()
+        self.universities.update(df_batch['university'].unique())
+        self.subjects.update(df_batch['subject'].unique())
+        batch_min, batch_max = df_batch['year'].min(), df_batch['year'].max()
+        self.min_year = batch_min if self.min_year is None else min(self.min_year, batch_min)
+        self.max_year = batch_max if self.max_year is None else max(self.max_year, batch_max)
+        self.score_sum += int(df_batch['score'].sum())
+        self.attended += int(df_batch['attendance'].sum())
+        self.performance_counts.update(df_batch['performance_category'].value_counts().to_dict())
+        self.university_students.update(df_batch.groupby('university')['student_id'].nunique().to_dict())
+    
+    def to_dict(self):
+        """Summary fields; the averages and year range are None before any record was added"""
+        has_records = self.total_records > 0
+        return {
+            'total_records': self.total_records,
+            'unique_students': self.unique_students,
+            'unique_universities': len(self.universities),
+            'unique_subjects': len(self.subjects),
+            'year_range': f"{self.min_year}-{self.max_year}" if has_records else None,
+            'average_score': round(self.score_sum / self.total_records, 2) if has_records else None,
+            'attendance_rate': round(self.attended / self.total_records, 3) if has_records else None,
+            'performance_distribution': dict(self.performance_counts.most_common()),
+            'university_distribution': dict(self.university_students.most_common())
+        }
+
 class RealDataMilestone1:
     def __init__(self, 
                  target_students=1000000,
                  batch_size=100000,
                  data_dir="data/milestone1_real",
                  start_year=2010,
-                 end_year=2024):
+                 end_year=2024,
+                 workers=1):
         self.target_students = target_students
         self.batch_size = batch_size  # Process 100K students per batch
         self.data_dir = data_dir
         self.start_year = start_year
         self.end_year = end_year
+        self.workers = workers  # Batches generated in parallel (1 = serial)
         
         # Ensure directories exist
         os.makedirs(data_dir, exist_ok=True)
@@ -233,132 +292,87 @@ class RealDataMilestone1:
         return university_profiles
     
     def generate_student_batch(self, batch_num, university_profiles, total_batches):
-        """Generate one batch of student data (100K students)"""
+        """Generate one batch of student data (100K students) as columnar arrays"""
         logger.info(f"Generating batch {batch_num}/{total_batches} (100K students)...")
         
-        np.random.seed(42 + batch_num)  # Reproducible but varied
+        rng = np.random.default_rng(42 + batch_num)  # Reproducible but varied
         
-        records = []
-        students_per_university = self.batch_size // len(self.ipeds_universities)
-        remainder = self.batch_size % len(self.ipeds_universities)
+        # --- Per-university attributes ---
+        num_universities = len(self.ipeds_universities)
+        students_per_university = self.batch_size // num_universities
+        remainder = self.batch_size % num_universities
         
-        student_id_counter = (batch_num - 1) * self.batch_size + 1
+        # Remainder goes to the last few universities
+        uni_counts = np.full(num_universities, students_per_university)
+        if remainder:
+            uni_counts[num_universities - remainder:] += 1
         
-        for uni_idx, uni_name in enumerate(self.ipeds_universities):
-            uni_profile = university_profiles[uni_name]
-            
-            # Adjust for remainder in last few universities
-            uni_students = students_per_university
-            if uni_idx >= len(self.ipeds_universities) - remainder:
-                uni_students += 1
-            
-            for student_local_id in range(uni_students):
-                student_id = f"UNI{uni_idx:02d}_STU{student_id_counter:08d}"
-                
-                # Extract university characteristics from IPEDS
-                uni_size_factor = len(uni_name) / 20  # Simple prestige factor
-                
-                # Generate realistic name
-                if uni_state := uni_profile.get('state', 'Unknown'):
-                    name_prefix = f"{uni_state[:3]}_Student"
-                else:
-                    name_prefix = "Student"
-                
-                name = f"{name_prefix}_{student_id_counter}"
-                
-                # FIXED: Assign ONE graduation year per student
-                graduation_year = np.random.randint(self.start_year, self.end_year + 1)
-                
-                # Assign major with realistic weights
-                major = assign_major()
-                
-                # Generate 8-12 subject records based on major
-                num_subjects = np.random.randint(8, 13)
-                selected_subjects = get_major_subjects(major, num_subjects)
-                
-                for subject in selected_subjects:
-                    # FIXED: All records in same year (graduation year)
-                    year = graduation_year
-                    month = np.random.randint(1, 13)
-                    
-                    try:
-                        date = datetime(year, month, np.random.randint(1, 29))
-                    except ValueError:
-                        date = datetime(year, month, 28)
-                    
-                    # Score influenced by university prestige and IPEDS institutional factors
-                    inst_data = uni_profile['institutional_data']
-                    
-                    # Base score from university characteristics
-                    if uni_size_factor > 0.7:  # Top tier
-                        base_score = np.random.normal(85, 10)
-                    elif uni_size_factor > 0.4:  # Middle tier  
-                        base_score = np.random.normal(78, 8)
-                    else:  # Lower tier
-                        base_score = np.random.normal(72, 10)
-                    
-                    # Add subject difficulty factor
-                    hard_subjects = ['Mathematics', 'Physics', 'Chemistry', 'Engineering']
-                    if subject in hard_subjects:
-                        base_score -= 3
-                    
-                    score = max(0, min(100, round(base_score + np.random.normal(0, 6))))
-                    
-                    # Attendance based on score and subject
-                    attendance_prob = 0.93 if score > 80 else (0.85 if score > 60 else 0.75)
-                    if subject in hard_subjects:
-                        attendance_prob *= 0.92
-                    
-                    attendance = np.random.choice([True, False], p=[attendance_prob, 1-attendance_prob])
-                    
-                    # Grade and performance category
-                    if score >= 97:
-                        grade, category = 'A+', 'Excellent'
-                    elif score >= 93:
-                        grade, category = 'A', 'Excellent'
-                    elif score >= 87:
-                        grade, category = 'A-', 'High'
-                    elif score >= 83:
-                        grade, category = 'B+', 'High'
-                    elif score >= 77:
-                        grade, category = 'B', 'High'
-                    elif score >= 73:
-                        grade, category = 'B-', 'Medium'
-                    elif score >= 70:
-                        grade, category = 'C+', 'Medium'
-                    elif score >= 67:
-                        grade, category = 'C', 'Medium'
-                    elif score >= 63:
-                        grade, category = 'C-', 'Low'
-                    elif score >= 60:
-                        grade, category = 'D+', 'Low'
-                    elif score >= 57:
-                        grade, category = 'D', 'Low'
-                    else:
-                        grade, category = 'F', 'Poor'
-                    
-                    records.append({
-                        'student_id': student_id,
-                        'student_name': name,
-                        'major': major,  # NEW: Track student's major
-                        'university': uni_name,
-                        'subject': subject,
-                        'score': score,
-                        'grade': grade,
-                        'attendance': attendance,
-                        'performance_category': category,
-                        'year': year,
-                        'semester': 'Fall' if month >= 9 else 'Spring',
-                        'date': date.strftime('%Y-%m-%d'),
-                        'credits': 3 if np.random.random() < 0.8 else 4,
-                        'course_level': 'Graduate' if np.random.random() < 0.12 else 'Undergraduate',
-                        'ipeds_institutional_factor': uni_size_factor,
-                        'batch_number': batch_num
-                    })
-                
-                student_id_counter += 1
+        # Simple prestige factor -> score distribution tier
+        uni_size_factor = np.array([len(uni_name) / 20 for uni_name in self.ipeds_universities])
+        uni_score_mean = np.select([uni_size_factor > 0.7, uni_size_factor > 0.4], [85, 78], default=72)
+        uni_score_std = np.select([uni_size_factor > 0.7, uni_size_factor > 0.4], [10, 8], default=10)
         
-        return records
+        name_prefixes = []
+        for uni_name in self.ipeds_universities:
+            uni_state = university_profiles[uni_name].get('state', 'Unknown')
+            name_prefixes.append(f"{uni_state[:3]}_Student" if uni_state else "Student")
+        
+        # --- Per-student attributes ---
+        num_students = int(uni_counts.sum())
+        student_uni = np.repeat(np.arange(num_universities), uni_counts)
+        student_number = (batch_num - 1) * self.batch_size + 1 + np.arange(num_students)
+        student_ids = np.array([f"UNI{u:02d}_STU{n:08d}" for u, n in zip(student_uni, student_number)])
+        student_names = np.array([f"{name_prefixes[u]}_{n}" for u, n in zip(student_uni, student_number)])
+        
+        # ONE graduation year per student; 8-12 subjects based on major
+        graduation_year = rng.integers(self.start_year, self.end_year + 1, size=num_students)
+        num_subjects = rng.integers(8, 13, size=num_students)
+        major_codes = assign_majors(num_students, rng)
+        subject_codes, subject_counts = sample_subjects_bulk(major_codes, num_subjects, rng)
+        
+        # --- Per-record attributes (one row per student x subject) ---
+        record_student = np.repeat(np.arange(num_students), subject_counts)
+        record_uni = student_uni[record_student]
+        num_records = len(record_student)
+        subjects = SUBJECT_NAMES[subject_codes]
+        is_hard = np.isin(subjects, HARD_SUBJECTS)
+        
+        # All records in the same year (graduation year)
+        year = graduation_year[record_student]
+        month = rng.integers(1, 13, size=num_records)
+        day = rng.integers(1, 29, size=num_records)
+        date = ((year - 1970) * 12 + month - 1).astype('datetime64[M]').astype('datetime64[D]') + (day - 1)
+        
+        # Score from university tier, minus a subject difficulty factor, plus noise
+        base_score = rng.normal(uni_score_mean[record_uni], uni_score_std[record_uni]) - 3 * is_hard
+        score = np.clip(np.round(base_score + rng.normal(0, 6, size=num_records)), 0, 100).astype(np.int64)
+        
+        # Attendance based on score and subject
+        attendance_prob = np.select([score > 80, score > 60], [0.93, 0.85], default=0.75)
+        attendance_prob = np.where(is_hard, attendance_prob * 0.92, attendance_prob)
+        attendance = rng.random(num_records) < attendance_prob
+        
+        # Grade and performance category
+        grade_idx = np.searchsorted(GRADE_CUTOFFS, score, side='right')
+        
+        return pd.DataFrame({
+            'student_id': student_ids[record_student],
+            'student_name': student_names[record_student],
+            'major': MAJOR_NAMES[major_codes[record_student]],  # NEW: Track student's major
+            'university': np.array(self.ipeds_universities)[record_uni],
+            'subject': subjects,
+            'score': score,
+            'grade': GRADES[grade_idx],
+            'attendance': attendance,
+            'performance_category': GRADE_CATEGORIES[grade_idx],
+            'year': year,
+            'semester': np.where(month >= 9, 'Fall', 'Spring'),
+            'date': date.astype(str),
+            'credits': np.where(rng.random(num_records) < 0.8, 3, 4),
+            'course_level': np.where(rng.random(num_records) < 0.12, 'Graduate', 'Undergraduate'),
+            'ipeds_institutional_factor': uni_size_factor[record_uni],
+            'batch_number': batch_num
+        })
     
     def process_batch_data(self, batch_records, batch_num):
         """Process and save batch data - UPDATED to write Parquet directly"""
@@ -378,41 +392,82 @@ class RealDataMilestone1:
         df_batch['date'] = pd.to_datetime(df_batch['date']).dt.strftime('%Y-%m-%d')
         
         # NEW: Write directly to Parquet (skip CSV)
-        batch_file = os.path.join(self.data_dir, f"students_batch_{batch_num:02d}_100K_cleaned.parquet")
+        batch_file = self.get_batch_file(batch_num)
         df_batch.to_parquet(batch_file, index=False, compression='snappy')
         
         logger.info(f"✅ Batch {batch_num} saved to Parquet: {batch_file} ({len(df_batch):,} records)")
         return df_batch
     
+    def get_batch_file(self, batch_num):
+        """Path of the cleaned Parquet file for one batch"""
+        return os.path.join(self.data_dir, f"students_batch_{batch_num:02d}_100K_cleaned.parquet")
+    
+    def generate_and_save_batch(self, batch_num, university_profiles, total_batches):
+        """Generate, clean and save one batch in a worker process; returns the batch file path"""
+        batch_records = self.generate_student_batch(batch_num, university_profiles, total_batches)
+        self.process_batch_data(batch_records, batch_num)
+        return self.get_batch_file(batch_num)
+    
+    def generate_batches_parallel(self, university_profiles, total_batches):
+        """
+        Generate all batches on a process pool. Every batch is seeded with 42 + batch_num
+        and written by its own worker, so the files are byte-identical to a serial run.
+        Batches are yielded in batch order as soon as each one is ready.
+        """
+        logger.info(f"Generating {total_batches} batches with {self.workers} worker processes...")
+        
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = [
+                executor.submit(self.generate_and_save_batch, batch_num, university_profiles, total_batches)
+                for batch_num in range(1, total_batches + 1)
+            ]
+            for future in futures:
+                yield pd.read_parquet(future.result())
+    
+    def generate_batches(self, university_profiles, total_batches):
+        """Yield processed batches one at a time, serially or from the worker pool"""
+        if self.workers > 1:
+            yield from self.generate_batches_parallel(university_profiles, total_batches)
+            return
+        
+        for batch_num in range(1, total_batches + 1):
+            batch_records = self.generate_student_batch(batch_num, university_profiles, total_batches)
+            yield self.process_batch_data(batch_records, batch_num)
+    
     def combine_all_batches(self, processed_batches):
-        """Combine all processed batches into final datasets"""
+        """
+        Accumulate the summary statistics over the processed batches, then stream the
+        batch files into one combined Parquet file (one row group per batch), so only one
+        batch is held in memory.
+        
+        Batches are already de-duplicated and validated by process_batch_data, and a
+        student never spans two batches, so per-batch counts add up exactly. The combined
+        schema is unified across all batch files first: a column with no values in one
+        batch is typed null there and takes its type from the other batches.
+        """
         logger.info("Combining all batches into final datasets...")
         
-        # Combine all batch DataFrames
-        df_combined = pd.concat(processed_batches, ignore_index=True)
-        
-        # Final preprocessing
-        logger.info("Final data preprocessing...")
-        df_combined = df_combined.drop_duplicates(subset=['student_id', 'subject', 'date'])
-        df_combined = df_combined.dropna(subset=['student_id', 'subject', 'score'])
-        df_combined = df_combined[(df_combined['score'] >= 0) & (df_combined['score'] <= 100)]
-        
-        # Generate final statistics
-        summary = {
-	        'total_records': len(df_combined),
-            'unique_students': df_combined['student_id'].nunique(),
-            'unique_universities': df_combined['university'].nunique(),
-            'unique_subjects': df_combined['subject'].nunique(),
-            'year_range': f"{df_combined['year'].min()}-{df_combined['year'].max()}",
-            'average_score': round(df_combined['score'].mean(), 2),
-            'attendance_rate': round(df_combined['attendance'].mean(), 3),
-            'performance_distribution': df_combined['performance_category'].value_counts().to_dict(),
-            'university_distribution': df_combined.groupby('university')['student_id'].nunique().sort_values(ascending=False).to_dict()
-        }
+        combined_file = os.path.join(self.data_dir, "student_performance_1M_real_data.parquet")
+        tmp_file = combined_file + ".tmp"
+        summary = BatchSummary()
+        batch_files = []
+        
+        # Batches arrive in batch order, each already saved by process_batch_data
+        for batch_num, df_batch in enumerate(processed_batches, start=1):
+            summary.update(df_batch)
+            batch_files.append(self.get_batch_file(batch_num))
         
-        # Save combined file
-        combined_file = os.path.join(self.data_dir, "student_performance_1M_real_data.csv")
-        df_combined.to_csv(combined_file, index=False)
+        schema = pyarrow.unify_schemas([pq.read_schema(path) for path in batch_files],
+                                       promote_options='permissive')
+        with pq.ParquetWriter(tmp_file, schema, compression='snappy') as writer:
+            for path in batch_files:
+                table = pq.read_table(path)
+                if table.schema != schema:
+                    table = table.select(schema.names).cast(schema)
+                writer.write_table(table, row_group_size=max(table.num_rows, 1))
+        os.replace(tmp_file, combined_file)
+        
+        summary = summary.to_dict()
         
         # Save summary
         summary_file = os.path.join(self.data_dir, "summary_1M_real_data.csv")
@@ -422,7 +477,7 @@ class RealDataMilestone1:
         logger.info(f"Total records: {summary['total_records']:,}")
         logger.info(f"Unique students: {summary['unique_students']:,}")
         
-        return df_combined, summary
+        return summary
     
     def run_milestone1_real_data(self):
         """Run complete Milestone 1 with real IPEDS data"""
@@ -452,18 +507,12 @@ class RealDataMilestone1:
             # Step 5: Generate students in batches
             logger.info("Step 5: Generating students in 100K batches...")
             total_batches = self.target_students // self.batch_size
-            processed_batches = []
-            
-            with tqdm(total=total_batches, desc="Generating student batches") as pbar:
-                for batch_num in range(1, total_batches + 1):
-                    batch_records = self.generate_student_batch(batch_num, university_profiles, total_batches)
-                    batch_df = self.process_batch_data(batch_records, batch_num)
-                    processed_batches.append(batch_df)
-                    pbar.update(1)
+            processed_batches = tqdm(self.generate_batches(university_profiles, total_batches),
+                                     total=total_batches, desc="Generating student batches")
             
-            # Step 6: Combine all batches
+            # Step 6: Combine all batches (summarized as they are generated, then combined from the batch files)
             logger.info("Step 6: Combining all batches...")
-            df_combined, summary = self.combine_all_batches(processed_batches)
+            summary = self.combine_all_batches(processed_batches)
             
             # Final summary
             elapsed_time = datetime.now() - start_time
@@ -486,8 +535,18 @@ class RealDataMilestone1:
             logger.error(f"MILESTONE 1 REAL DATA FAILED: {e}")
             return False
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Milestone 1: generate the 1M student dataset in batches.")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of batches generated in parallel (default: 1, serial)")
+    parser.add_argument('--target-students', type=int, default=1000000)
+    parser.add_argument('--batch-size', type=int, default=100000)
+    return parser.parse_args()
+
 def main():
     """Main execution function"""
+    args = parse_args()
+    
     print("MILESTONE 1: REAL DATA COLLECTION AND PREPROCESSING")
     print("1 Million Students from Top 50 Universities (2010-2024)")
     print("Data Source: Real IPEDS Institutional Data + Generated Student Records")
@@ -496,10 +555,11 @@ def main():
     
     # Initialize generator
     generator = RealDataMilestone1(
-        target_students=1000000,  # 1 Million students
-        batch_size=100000,        # 100K students per batch
+        target_students=args.target_students,  # 1 Million students
+        batch_size=args.batch_size,            # 100K students per batch
         start_year=2010,
-        end_year=2024
+        end_year=2024,
+        workers=args.workers
     )
     
     # Run pipeline
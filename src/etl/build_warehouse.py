@@ -0,0 +1,96 @@
+import duckdb
+import os
+from pathlib import Path
+import sys
+
+# Star-schema artifacts loaded into the warehouse as native tables (table name -> Parquet file or glob;
+# the fact globs pick up incremental *_incNNN.parquet loads)
+WAREHOUSE_TABLES = {
+    'dim_student': 'dim_student.parquet',
+    'dim_university': 'dim_university.parquet',
+    'dim_course': 'dim_course.parquet',
+    'dim_date': 'dim_date.parquet',
+    'fact_student_performance': 'fact_student_performance*.parquet',
+    'agg_year_major_subject': 'agg_year_major_subject.parquet',
+    'fact_wide': 'fact_wide*.parquet',
+    'student_offsets': 'student_offsets*.parquet',
+}
+
+# Fact tables that may instead be written as Hive-partitioned directories (--partition-by)
+PARTITIONED_TABLES = ['fact_student_performance', 'fact_wide']
+
+# ART indexes for the point lookups issued by the Student Profile view
+WAREHOUSE_INDEXES = [
+    "CREATE UNIQUE INDEX idx_dim_student_key ON dim_student (student_key);",
+    "CREATE INDEX idx_dim_student_number ON dim_student (student_number);",
+    "CREATE INDEX idx_fact_student_key ON fact_student_performance (student_key);",
+    "CREATE UNIQUE INDEX idx_student_offsets_key ON student_offsets (student_key);",
+]
+
+
+def build_warehouse():
+    """
+    Loads the Star Schema Parquet files into a persistent DuckDB database.
+
+    The dashboard attaches this file read-only when it is newer than the Parquet files,
+    so queries hit native columnar tables (with ART indexes and stored statistics)
+    instead of re-decoding Parquet on every scan.
+    """
+    print("🔧 Starting Warehouse Build Process...")
+
+    # Define paths
+    base_dir = Path(__file__).parent.parent.parent
+    parquet_dir = base_dir / 'data' / 'star_schema'
+    db_path = base_dir / 'warehouse' / 'student_performance.duckdb'
+    tmp_path = db_path.with_name(db_path.name + '.tmp')
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+
+    missing_files = [f for table, f in WAREHOUSE_TABLES.items()
+                     if not any(parquet_dir.glob(f)) and not (parquet_dir / table).is_dir()]
+    if missing_files:
+        print(f"❌ Error: Star schema files missing: {', '.join(missing_files)}")
+        print("Please run 'python src/etl/generate_star_schema.py' first.")
+        sys.exit(1)
+
+    print(f"📂 Star schema source: {parquet_dir}")
+    print(f"💾 Database target: {db_path}")
+
+    try:
+        # Build into a temp file and swap it in, so a running dashboard never sees a partial database
+        if tmp_path.exists():
+            os.remove(tmp_path)
+        conn = duckdb.connect(str(tmp_path))
+
+        # 1. Load Tables
+        print("1️⃣  Loading native tables...")
+        for table, file_name in WAREHOUSE_TABLES.items():
+            if table in PARTITIONED_TABLES and (parquet_dir / table).is_dir():
+                source = f"read_parquet('{(parquet_dir / table).as_posix()}/**/*.parquet', hive_partitioning = true)"
+            else:
+                source = f"'{(parquet_dir / file_name).as_posix()}'"
+            conn.execute(f"CREATE TABLE {table} AS SELECT * FROM {source}")
+            row_count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            print(f"   - {table} ({row_count:,} rows)")
+
+        # 2. Create Indexes
+        print("2️⃣  Creating indexes...")
+        for statement in WAREHOUSE_INDEXES:
+            conn.execute(statement)
+
+        # 3. Collect Statistics
+        print("3️⃣  Collecting statistics...")
+        conn.execute("ANALYZE;")
+        conn.execute("CHECKPOINT;")
+        conn.close()
+
+        os.replace(tmp_path, db_path)
+        print("✅ Warehouse built successfully!")
+
+    except Exception as e:
+        print(f"❌ Error building warehouse: {e}")
+        if tmp_path.exists():
+            os.remove(tmp_path)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    build_warehouse()
@@ -0,0 +1,313 @@
+"""
+Chunked storage for large data files (split into ``<name>.partN`` pieces for Git hosting).
+
+A split writes every part and finally a ``<name>.parts.json`` manifest with the size and
+SHA-256 of each part and of the whole file. All files go through a temp file + rename, so
+a part set is complete exactly when its manifest exists. Parts can be stitched back into
+the original file (verified against the manifest) or read in place through ``PartsReader``,
+a seekable file object that Parquet readers can open without a joined copy on disk.
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+from pathlib import Path
+import sys
+
+MANIFEST_SUFFIX = '.parts.json'
+DEFAULT_CHUNK_SIZE_MB = 45
+# Fixed copy buffer: memory stays flat regardless of the part size
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class ChunkedStoreError(Exception):
+    """Raised when a part set is incomplete or does not match its manifest."""
+
+
+def part_path(file_path, index):
+    """Path of the 1-based part ``index`` of ``file_path``."""
+    file_path = Path(file_path)
+    return file_path.parent / f"{file_path.name}.part{index}"
+
+def manifest_path(file_path):
+    """Path of the part manifest of ``file_path``."""
+    file_path = Path(file_path)
+    return file_path.parent / f"{file_path.name}{MANIFEST_SUFFIX}"
+
+def has_parts(file_path):
+    """True if ``file_path`` is stored as parts (with or without a manifest)."""
+    return part_path(file_path, 1).exists()
+
+def load_manifest(file_path):
+    """Read the part manifest, or None for parts written before manifests existed."""
+    path = manifest_path(file_path)
+    if not path.exists():
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def _write_json_atomic(path, data):
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+def copy_stream(src, dst, length=None, hashers=()):
+    """
+    Copy ``length`` bytes (or until EOF) from ``src`` to ``dst`` through a fixed buffer,
+    updating every hasher on the way. Returns the number of bytes copied.
+    """
+    buffer = bytearray(COPY_BUFFER_SIZE)
+    view = memoryview(buffer)
+    copied = 0
+    while length is None or copied < length:
+        want = COPY_BUFFER_SIZE if length is None else min(COPY_BUFFER_SIZE, length - copied)
+        n = src.readinto(view[:want])
+        if not n:
+            break
+        for hasher in hashers:
+            hasher.update(view[:n])
+        dst.write(view[:n])
+        copied += n
+    return copied
+
+class _NullSink:
+    """Write target for hash-only passes."""
+
+    def write(self, data):
+        return len(data)
+
+def _list_parts(file_path):
+    """Part paths in order: from the manifest, else every consecutive ``.partN`` on disk."""
+    manifest = load_manifest(file_path)
+    if manifest is not None:
+        return [Path(file_path).parent / part['name'] for part in manifest['parts']], manifest
+    parts = []
+    while part_path(file_path, len(parts) + 1).exists():
+        parts.append(part_path(file_path, len(parts) + 1))
+    return parts, None
+
+def split_file(file_path, chunk_size_mb=DEFAULT_CHUNK_SIZE_MB):
+    """
+    Split ``file_path`` into ``chunk_size_mb`` parts next to it and write the manifest.
+
+    Returns the manifest dict.
+    """
+    file_path = Path(file_path)
+    chunk_size = int(chunk_size_mb * 1024 * 1024)
+    file_size = file_path.stat().st_size
+    total_hasher = hashlib.sha256()
+    parts = []
+
+    # Drop the old manifest first: until the new one is written the part set is incomplete
+    old_manifest = manifest_path(file_path)
+    if old_manifest.exists():
+        os.remove(old_manifest)
+
+    with open(file_path, 'rb') as src:
+        index = 1
+        while True:
+            path = part_path(file_path, index)
+            tmp_path = path.with_name(path.name + '.tmp')
+            part_hasher = hashlib.sha256()
+            with open(tmp_path, 'wb') as dst:
+                size = copy_stream(src, dst, chunk_size, (part_hasher, total_hasher))
+            if size == 0 and index > 1:
+                os.remove(tmp_path)
+                break
+            os.replace(tmp_path, path)
+            parts.append({'name': path.name, 'size': size, 'sha256': part_hasher.hexdigest()})
+            index += 1
+            if size < chunk_size:
+                break
+
+    # Parts left over from an earlier split into more pieces
+    while part_path(file_path, index).exists():
+        os.remove(part_path(file_path, index))
+        index += 1
+
+    manifest = {
+        'file': file_path.name,
+        'size': file_size,
+        'sha256': total_hasher.hexdigest(),
+        'chunk_size': chunk_size,
+        'parts': parts,
+    }
+    _write_json_atomic(manifest_path(file_path), manifest)
+    return manifest
+
+def verify_parts(file_path, check_hashes=True):
+    """
+    Check the parts of ``file_path`` against the manifest: every part present with the
+    recorded size and, with ``check_hashes``, the recorded SHA-256 (which reads every part).
+    Raises ChunkedStoreError on a mismatch; parts without a manifest only need to exist.
+    """
+    parts, manifest = _list_parts(file_path)
+    if not parts:
+        raise ChunkedStoreError(f"No parts found for {file_path}")
+    if manifest is None:
+        return
+
+    total_hasher = hashlib.sha256()
+    for path, entry in zip(parts, manifest['parts']):
+        if not path.exists():
+            raise ChunkedStoreError(f"Missing part: {path.name}")
+        if path.stat().st_size != entry['size']:
+            raise ChunkedStoreError(f"Part {path.name} has {path.stat().st_size} bytes, expected {entry['size']}")
+        if check_hashes:
+            part_hasher = hashlib.sha256()
+            with open(path, 'rb') as src:
+                copy_stream(src, _NullSink(), None, (part_hasher, total_hasher))
+            if part_hasher.hexdigest() != entry['sha256']:
+                raise ChunkedStoreError(f"Checksum mismatch in part {path.name}")
+    if check_hashes and total_hasher.hexdigest() != manifest['sha256']:
+        raise ChunkedStoreError(f"Checksum mismatch for {manifest['file']}")
+
+def stitch_file(file_path, output_path=None):
+    """
+    Join the parts of ``file_path`` into ``output_path`` (default: ``file_path``).
+
+    The output is written to a temp file and verified against the manifest before it is
+    renamed into place, so a failed or interrupted stitch never leaves a partial file.
+    """
+    file_path = Path(file_path)
+    output_path = Path(output_path) if output_path else file_path
+    tmp_path = output_path.with_name(output_path.name + '.tmp')
+    parts, manifest = _list_parts(file_path)
+    if not parts:
+        raise ChunkedStoreError(f"No parts found for {file_path}")
+    if manifest is not None:
+        verify_parts(file_path, check_hashes=False)
+
+    total_hasher = hashlib.sha256()
+    try:
+        with open(tmp_path, 'wb') as dst:
+            for path in parts:
+                with open(path, 'rb') as src:
+                    copy_stream(src, dst, None, (total_hasher,))
+        if manifest is not None and total_hasher.hexdigest() != manifest['sha256']:
+            raise ChunkedStoreError(f"Checksum mismatch for stitched {manifest['file']}")
+        os.replace(tmp_path, output_path)
+    finally:
+        if tmp_path.exists():
+            os.remove(tmp_path)
+    return output_path
+
+
+class PartsReader(io.RawIOBase):
+    """
+    Read-only, seekable view of the parts of a file as if they were joined.
+
+    Only the part holding the current position is open, so e.g. ``pyarrow.parquet``
+    can read the footer and individual row groups straight from the parts.
+    """
+
+    def __init__(self, file_path):
+        super().__init__()
+        parts, manifest = _list_parts(file_path)
+        if not parts:
+            raise ChunkedStoreError(f"No parts found for {file_path}")
+        if manifest is not None:
+            verify_parts(file_path, check_hashes=False)
+        self._parts = parts
+        self._starts = []
+        offset = 0
+        for path in parts:
+            self._starts.append(offset)
+            offset += path.stat().st_size
+        self._size = offset
+        self._pos = 0
+        self._index = None
+        self._handle = None
+
+    @property
+    def size(self):
+        return self._size
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self._size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if pos < 0:
+            raise ValueError("Negative seek position")
+        self._pos = pos
+        return pos
+
+    def _part_at(self, pos):
+        # Last part whose start is <= pos
+        lo, hi = 0, len(self._starts) - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self._starts[mid] <= pos:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast('B')
+        total = 0
+        while total < len(view) and self._pos < self._size:
+            index = self._part_at(self._pos)
+            if index != self._index:
+                if self._handle is not None:
+                    self._handle.close()
+                self._handle = open(self._parts[index], 'rb')
+                self._index = index
+            self._handle.seek(self._pos - self._starts[index])
+            n = self._handle.readinto(view[total:])
+            if not n:
+                break
+            total += n
+            self._pos += n
+        return total
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+        super().close()
+
+
+def open_parts(file_path):
+    """Buffered, seekable binary file object over the parts of ``file_path``."""
+    return io.BufferedReader(PartsReader(file_path), buffer_size=COPY_BUFFER_SIZE)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Split, stitch or verify chunked data files.")
+    parser.add_argument('command', choices=['split', 'stitch', 'verify'])
+    parser.add_argument('file', help="Original file path (parts live next to it as <file>.partN)")
+    parser.add_argument('--chunk-size-mb', type=float, default=DEFAULT_CHUNK_SIZE_MB,
+                        help=f"Part size for split (default: {DEFAULT_CHUNK_SIZE_MB})")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        if args.command == 'split':
+            manifest = split_file(args.file, args.chunk_size_mb)
+            print(f"✅ Split into {len(manifest['parts'])} parts, sha256 {manifest['sha256']}")
+        elif args.command == 'stitch':
+            print(f"✅ Stitched {stitch_file(args.file)}")
+        else:
+            verify_parts(args.file)
+            print("✅ Parts match the manifest.")
+    except (ChunkedStoreError, OSError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
@@ -1,44 +1,105 @@
-import pandas as pd
+import argparse
+import duckdb
+import os
 from pathlib import Path
 
-def create_10k_students_sample():
-    """Create a sample with 10K RANDOM UNIQUE STUDENTS (not records)."""
+# Per-student attributes the sample can be stratified by
+STRATIFY_COLUMNS = ['major', 'university']
+
+def create_students_sample(n_students=10_000, seed=42, stratify=None, source_file=None, output_file=None):
+    """
+    Create a sample of N RANDOM UNIQUE STUDENTS (not records) without loading the dataset.
+
+    Students are ranked by a seeded hash of student_id, reading only that column;
+    the chosen students are then semi-joined against the source while DuckDB streams
+    the remaining columns straight to the output file. With ``stratify`` the sample
+    keeps each major's/university's share of students.
+    """
     base_dir = Path(__file__).parent.parent.parent
-    source_file = base_dir / 'data' / 'cleaned_students.parquet'
-    output_file = base_dir / 'data' / 'sample_50K_students.parquet'  # Keep same name for cloud
-    
-    print(f"📂 Loading data from {source_file}...")
-    
-    # Read the full file
-    df = pd.read_parquet(source_file)
-    
-    print(f"📊 Total records: {len(df):,}")
-    print(f"📊 Total unique students: {df['student_id'].nunique():,}")
-    
-    # Get 10K RANDOM unique students
-    all_students = df['student_id'].unique()
-    selected_students = pd.Series(all_students).sample(n=10_000, random_state=42).tolist()
-    
-    print(f"🎯 Selected {len(selected_students):,} random unique students")
-    
-    # Filter all records for these students
-    sample_df = df[df['student_id'].isin(selected_students)].copy()
-    
-    # Create a mapping: student_id -> student_number (1-10,000)
-    # Sort by student_id to ensure consistent numbering
-    selected_students_sorted = sorted(selected_students)
-    student_id_to_number = {student_id: i+1 for i, student_id in enumerate(selected_students_sorted)}
-    sample_df['student_number'] = sample_df['student_id'].map(student_id_to_number)
-    
-    print(f"✅ Sample includes {len(selected_students):,} unique students")
-    print(f"✅ Total records for these students: {len(sample_df):,}")
-    print(f"✅ Average records per student: {len(sample_df)/len(selected_students):.1f}")
-    
+    source_file = Path(source_file) if source_file else base_dir / 'data' / 'cleaned_students.parquet'
+    output_file = Path(output_file) if output_file else base_dir / 'data' / 'sample_50K_students.parquet'  # Keep same name for cloud
+    tmp_file = output_file.with_name(output_file.name + '.tmp')
+
+    if stratify is not None and stratify not in STRATIFY_COLUMNS:
+        raise ValueError(f"Unknown stratify column: {stratify}")
+
+    print(f"📂 Scanning data from {source_file}...")
+
+    conn = duckdb.connect(database=':memory:')
+    # Streaming COPY does not need the source row order, which keeps memory flat
+    conn.execute("SET preserve_insertion_order = false;")
+    conn.execute(f"CREATE VIEW source AS SELECT * FROM read_parquet('{source_file.as_posix()}')")
+
+    total_records, total_students = conn.execute(
+        "SELECT COUNT(*), COUNT(DISTINCT student_id) FROM source"
+    ).fetchone()
+    print(f"📊 Total records: {total_records:,}")
+    print(f"📊 Total unique students: {total_students:,}")
+
+    # 1. Choose students: order by a seeded hash (stable across runs and machines).
+    # Stratified: rank students inside each stratum and interleave the strata by
+    # relative position, so the first N keep every stratum's share (within 1 student).
+    stratum = stratify if stratify else "NULL"
+    conn.execute(f"""
+        CREATE TABLE selected_students AS
+        WITH students AS (
+            SELECT student_id, ANY_VALUE({stratum}) AS stratum, md5(CAST(? AS VARCHAR) || student_id) AS h
+            FROM source
+            GROUP BY student_id
+        ),
+        ranked AS (
+            SELECT
+                student_id,
+                h,
+                (ROW_NUMBER() OVER (PARTITION BY stratum ORDER BY h) - 0.5) / COUNT(*) OVER (PARTITION BY stratum) AS position
+            FROM students
+        ),
+        chosen AS (
+            SELECT student_id FROM ranked ORDER BY position, h LIMIT ?
+        )
+        -- Sort by student_id to ensure consistent numbering (1..N)
+        SELECT student_id, ROW_NUMBER() OVER (ORDER BY student_id) AS student_number
+        FROM chosen;
+    """, [str(seed), int(n_students)])
+
+    selected = conn.execute("SELECT COUNT(*) FROM selected_students").fetchone()[0]
+    print(f"🎯 Selected {selected:,} random unique students" + (f" (stratified by {stratify})" if stratify else ""))
+
+    # 2. Stream all records of the chosen students to the output (semi-join on student_id)
     print(f"💾 Saving to {output_file}...")
-    sample_df.to_parquet(output_file, index=False, compression='snappy')
-    
+    conn.execute(f"""
+        COPY (
+            SELECT s.*, sel.student_number
+            FROM source s
+            JOIN selected_students sel ON s.student_id = sel.student_id
+        ) TO '{tmp_file.as_posix()}' (FORMAT PARQUET, COMPRESSION SNAPPY);
+    """)
+    os.replace(tmp_file, output_file)
+
+    sample_records = conn.execute(f"SELECT COUNT(*) FROM read_parquet('{output_file.as_posix()}')").fetchone()[0]
+    conn.close()
+
+    print(f"✅ Sample includes {selected:,} unique students")
+    print(f"✅ Total records for these students: {sample_records:,}")
+    print(f"✅ Average records per student: {sample_records/max(selected, 1):.1f}")
+
     file_size = output_file.stat().st_size / (1024 * 1024)
     print(f"✅ Sample created: {file_size:.2f} MB")
 
+def create_10k_students_sample():
+    """Create a sample with 10K RANDOM UNIQUE STUDENTS (not records)."""
+    create_students_sample(n_students=10_000, seed=42)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Create the student-level cloud sample.")
+    parser.add_argument('--students', type=int, default=10_000, help="Number of students to sample (default: 10000)")
+    parser.add_argument('--seed', type=int, default=42, help="Seed for the student hash (default: 42)")
+    parser.add_argument('--stratify', choices=STRATIFY_COLUMNS, default=None,
+                        help="Keep each major's/university's share of students")
+    parser.add_argument('--source', default=None, help="Source Parquet (default: data/cleaned_students.parquet)")
+    parser.add_argument('--output', default=None, help="Output Parquet (default: data/sample_50K_students.parquet)")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    create_10k_students_sample()
+    args = parse_args()
+    create_students_sample(args.students, args.seed, args.stratify, args.source, args.output)
@@ -1,14 +1,60 @@
+import argparse
 import duckdb
+import json
 import os
 from pathlib import Path
+import pyarrow as pa
+import pyarrow.parquet as pq
+import shutil
 import sys
 
+import chunked_store
+
+# Small row groups keep the (year, major, subject) zone maps selective for the dashboard filters
+WIDE_ROW_GROUP_SIZE = 16384
+# Student profile range reads only decode the row group(s) holding that student's rows
+FACT_ROW_GROUP_SIZE = 16384
+
+# Optional Hive-partitioned layout for the fact tables: directories such as
+# fact_wide/year=2021/major=Physics/ let a cohort filter skip whole directories
+PARTITION_LAYOUTS = {
+    'year': ['year'],
+    'year,major': ['year', 'major'],
+}
+PARTITIONED_TABLES = ['fact_student_performance', 'fact_wide']
+
+# Records which batch_number values are loaded into the star schema (and by which increment)
+MANIFEST_NAME = '_manifest.json'
+# Bump whenever the layout or columns of the star-schema files change: readers treat a manifest
+# with another version (or none) as stale and rebuild, without probing the Parquet files
+SCHEMA_VERSION = 3
+
+# Empty dimension tables for a full build; an incremental load starts from the existing files
+# instead, so surrogate keys already handed out are never renumbered.
+DIMENSION_DDL = [
+    """CREATE TABLE dim_student (
+        student_key BIGINT, student_id VARCHAR, student_name VARCHAR, major VARCHAR, student_number INTEGER
+    );""",
+    """CREATE TABLE dim_university (
+        university_key BIGINT, university_name VARCHAR, ipeds_institutional_factor INTEGER
+    );""",
+    """CREATE TABLE dim_course (
+        course_key BIGINT, subject VARCHAR, credits INTEGER, course_level VARCHAR
+    );""",
+    """CREATE TABLE dim_date (
+        date_id BIGINT, date_key VARCHAR, full_date DATE, year BIGINT, semester VARCHAR,
+        month BIGINT, day BIGINT, day_of_week BIGINT
+    );""",
+]
+
+DIMENSION_TABLES = ['dim_student', 'dim_university', 'dim_course', 'dim_date']
+
 def get_data_path(base_dir):
     """Get the appropriate data path based on what's available."""
     # Check which data file exists (cloud has 50K sample, local has full data)
     sample_50k = base_dir / 'data' / 'sample_50K_students.parquet'
     full_data = base_dir / 'data' / 'cleaned_students.parquet'
-    
+
     if sample_50k.exists():
         # Use 50K sample if available (Streamlit Cloud)
         return sample_50k
@@ -16,168 +62,577 @@ def get_data_path(base_dir):
         # Use full dataset locally
         return full_data
 
-def convert_to_parquet():
+def load_manifest(output_dir):
+    """Read the load manifest, or None if the star schema was never built with one."""
+    manifest_path = output_dir / MANIFEST_NAME
+    if not manifest_path.exists():
+        return None
+    with open(manifest_path, 'r') as f:
+        return json.load(f)
+
+def save_manifest(output_dir, manifest):
+    """Write the load manifest atomically."""
+    manifest_path = output_dir / MANIFEST_NAME
+    tmp_path = manifest_path.with_name(manifest_path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+def export_table(conn, table, path, row_group_size=None):
+    """COPY a table to Parquet through a temp file, so readers never see a partial file."""
+    tmp_path = path.with_name(path.name + '.tmp')
+    options = "FORMAT PARQUET"
+    if row_group_size:
+        options += f", ROW_GROUP_SIZE {row_group_size}"
+    conn.execute(f"COPY {table} TO '{tmp_path.as_posix()}' ({options});")
+    os.replace(tmp_path, path)
+    print(f"   - {path.name} created")
+
+def export_partitioned(conn, query, directory, partition_by, file_pattern, row_group_size, replace):
+    """
+    COPY a query into a Hive-partitioned directory. A full build (``replace``) writes a
+    fresh directory and swaps it in; an increment adds uniquely named files to the
+    existing partitions.
+    """
+    target = directory.with_name(directory.name + '.tmp') if replace else directory
+    if replace and target.exists():
+        shutil.rmtree(target)
+    conn.execute(f"""
+        COPY ({query}) TO '{target.as_posix()}'
+        (FORMAT PARQUET, PARTITION_BY ({', '.join(partition_by)}), FILENAME_PATTERN '{file_pattern}',
+         OVERWRITE_OR_IGNORE, ROW_GROUP_SIZE {row_group_size});
+    """)
+    if replace:
+        if directory.exists():
+            shutil.rmtree(directory)
+        os.replace(target, directory)
+    print(f"   - {directory.name}/ written (partitioned by {', '.join(partition_by)})")
+
+def remove_stale_fact_outputs(output_dir, partition_by):
+    """After a full build, drop earlier increments and fact files of the other layout."""
+    for stale in output_dir.glob('*_inc*.parquet'):
+        os.remove(stale)
+    for table in PARTITIONED_TABLES:
+        if partition_by:
+            for stale in output_dir.glob(f'{table}*.parquet'):
+                os.remove(stale)
+        elif (output_dir / table).is_dir():
+            shutil.rmtree(output_dir / table)
+
+def open_parts_source(data_path):
+    """Arrow batch reader over a Parquet file stored as chunked parts, read in place."""
+    parquet_file = pq.ParquetFile(chunked_store.open_parts(data_path))
+    return pa.RecordBatchReader.from_batches(parquet_file.schema_arrow, parquet_file.iter_batches())
+
+def create_staging_table(conn, source, loaded_batches=()):
+    """
+    Stage the raw rows, skipping batches that are already loaded.
+
+    ``source`` is a Parquet path or an Arrow RecordBatchReader (the chunked-parts case).
+    """
+    if isinstance(source, str):
+        conn.execute(f"CREATE OR REPLACE VIEW raw_student_data AS SELECT * FROM '{source}'")
+    else:
+        conn.register('raw_student_data', source)
+    columns = [row[0] for row in conn.execute("DESCRIBE raw_student_data").fetchall()]
+    # Older extracts have no student_number; new students are then numbered sequentially
+    student_number = "CAST(student_number AS INTEGER)" if 'student_number' in columns else "CAST(NULL AS INTEGER)"
+
+    batch_filter = ""
+    if loaded_batches:
+        batch_filter = f"AND batch_number NOT IN ({', '.join(str(int(b)) for b in loaded_batches)})"
+
+    conn.execute(f"""
+        CREATE TABLE staging_student_performance AS
+        SELECT
+            CAST(student_id AS VARCHAR) AS student_id,
+            CAST(student_name AS VARCHAR) AS student_name,
+            CAST(major AS VARCHAR) AS major,
+            CAST(university AS VARCHAR) AS university,
+            CAST(subject AS VARCHAR) AS subject,
+            CAST(score AS INTEGER) AS score,
+            CAST(grade AS VARCHAR(2)) AS grade,
+            CAST(attendance_flag AS BOOLEAN) AS attendance_flag,
+            CAST(performance_category AS VARCHAR) AS performance_category,
+            CAST(year AS INTEGER) AS year,
+            CAST(semester AS VARCHAR) AS semester,
+            CAST(date AS DATE) AS date,
+            CAST(credits AS INTEGER) AS credits,
+            CAST(course_level AS VARCHAR) AS course_level,
+            CAST(batch_number AS INTEGER) AS batch_number,
+            CAST(ipeds_institutional_factor AS INTEGER) AS ipeds_institutional_factor,
+            {student_number} AS student_number
+        FROM raw_student_data
+        WHERE student_id IS NOT NULL AND date IS NOT NULL {batch_filter};
+    """)
+
+def check_student_cells(conn):
+    """
+    The dashboard sums the rollup's per-cell distinct student_count across (year, major)
+    cells, which is exact only while every staged student falls in exactly one cell:
+    one major and courses in one year. Checked before anything is written.
+    """
+    split_students = conn.execute("""
+        SELECT COUNT(*) FROM (
+            SELECT student_id
+            FROM staging_student_performance
+            GROUP BY student_id
+            HAVING COUNT(DISTINCT EXTRACT(YEAR FROM date)) > 1 OR COUNT(DISTINCT major) > 1
+        )
+    """).fetchone()[0]
+    if split_students:
+        raise ValueError(f"{split_students} students have courses in more than one year or major; the "
+                         f"rollup's summed student_count would count them more than once")
+
+def add_dimension_members(conn):
+    """
+    Append members of the staged rows that are not in the dimensions yet.
+
+    New surrogate keys continue after the current maximum, so on an empty dimension
+    (full build) this is the plain ROW_NUMBER() numbering.
+    """
+    # dim_student
+    conn.execute("""
+        INSERT INTO dim_student
+        SELECT
+            (SELECT COALESCE(MAX(student_key), 0) FROM dim_student) + ROW_NUMBER() OVER (ORDER BY n.student_id) AS student_key,
+            n.student_id,
+            n.student_name,
+            n.major,
+            COALESCE(n.student_number, (SELECT COALESCE(MAX(student_number), 0) FROM dim_student) + ROW_NUMBER() OVER (ORDER BY n.student_id)) AS student_number
+        FROM (SELECT DISTINCT student_id, student_name, major, student_number FROM staging_student_performance) n
+        WHERE NOT EXISTS (SELECT 1 FROM dim_student s WHERE s.student_id IS NOT DISTINCT FROM n.student_id);
+    """)
+
+    # dim_university
+    conn.execute("""
+        INSERT INTO dim_university
+        SELECT
+            (SELECT COALESCE(MAX(university_key), 0) FROM dim_university) + ROW_NUMBER() OVER (ORDER BY n.university) AS university_key,
+            n.university AS university_name,
+            n.ipeds_institutional_factor
+        FROM (SELECT DISTINCT university, ipeds_institutional_factor FROM staging_student_performance) n
+        WHERE NOT EXISTS (SELECT 1 FROM dim_university u WHERE u.university_name IS NOT DISTINCT FROM n.university);
+    """)
+
+    # dim_course
+    conn.execute("""
+        INSERT INTO dim_course
+        SELECT
+            (SELECT COALESCE(MAX(course_key), 0) FROM dim_course) + ROW_NUMBER() OVER (ORDER BY n.subject, n.credits, n.course_level) AS course_key,
+            n.subject,
+            n.credits,
+            n.course_level
+        FROM (SELECT DISTINCT subject, credits, course_level FROM staging_student_performance) n
+        WHERE NOT EXISTS (
+            SELECT 1 FROM dim_course c
+            WHERE c.subject IS NOT DISTINCT FROM n.subject
+              AND c.credits IS NOT DISTINCT FROM n.credits
+              AND c.course_level IS NOT DISTINCT FROM n.course_level
+        );
+    """)
+
+    # dim_date
+    conn.execute("""
+        INSERT INTO dim_date
+        SELECT
+            (SELECT COALESCE(MAX(date_id), 0) FROM dim_date) + ROW_NUMBER() OVER (ORDER BY n.date) AS date_id,
+            strftime('%Y%m%d', n.date) AS date_key,
+            n.date AS full_date,
+            EXTRACT(YEAR FROM n.date) AS year,
+            CASE WHEN EXTRACT(MONTH FROM n.date) BETWEEN 1 AND 6 THEN 'Spring' ELSE 'Fall' END AS semester,
+            EXTRACT(MONTH FROM n.date) AS month,
+            EXTRACT(DAY FROM n.date) AS day,
+            EXTRACT(DOW FROM n.date) AS day_of_week
+        FROM (SELECT DISTINCT date FROM staging_student_performance WHERE date IS NOT NULL) n
+        WHERE NOT EXISTS (SELECT 1 FROM dim_date d WHERE d.full_date = n.date);
+    """)
+
+def create_fact_table(conn, first_fact_id=0):
+    """Fact rows for the staged data, numbered after ``first_fact_id``."""
+    conn.execute(f"""
+        CREATE TABLE fact_student_performance AS
+        SELECT
+            {int(first_fact_id)} + ROW_NUMBER() OVER (ORDER BY st.student_id, st.date, st.subject) AS fact_id,
+            s.student_key,
+            u.university_key,
+            c.course_key,
+            d.date_id,
+            st.score,
+            st.grade,
+            st.attendance_flag,
+            st.performance_category
+        FROM staging_student_performance st
+        JOIN dim_student s ON st.student_id = s.student_id
+        JOIN dim_university u ON st.university = u.university_name
+        JOIN dim_course c ON st.subject = c.subject AND st.credits = c.credits AND st.course_level = c.course_level
+        JOIN dim_date d ON st.date = d.full_date
+        ORDER BY fact_id;
+    """)
+
+def create_offsets_table(conn):
+    """
+    Sidecar offset index: student_key -> contiguous fact_id range in the fact table.
+
+    The student profile reads ``fact_id BETWEEN fact_id_start AND fact_id_end``, so every
+    range must hold only that student's rows: it must be gap-free (row_count fills it)
+    and must not overlap the next student's range.
+    """
+    conn.execute("""
+        CREATE TABLE student_offsets AS
+        SELECT
+            student_key,
+            MIN(fact_id) AS fact_id_start,
+            MAX(fact_id) AS fact_id_end,
+            COUNT(*) AS row_count
+        FROM fact_student_performance
+        GROUP BY student_key
+        ORDER BY student_key;
+    """)
+    gaps, overlaps = conn.execute("""
+        SELECT
+            COUNT(*) FILTER (WHERE row_count <> fact_id_end - fact_id_start + 1),
+            COUNT(*) FILTER (WHERE fact_id_start <= previous_end)
+        FROM (
+            SELECT *, LAG(fact_id_end) OVER (ORDER BY fact_id_start) AS previous_end
+            FROM student_offsets
+        )
+    """).fetchone()
+    if gaps or overlaps:
+        raise ValueError(f"Fact rows are not clustered by student: {gaps} fact_id ranges hold other "
+                         f"students' rows, {overlaps} overlap the previous range")
+
+def create_rollup_table(conn, table):
+    """
+    Additive partial aggregates per (year, major, subject) plus a (year, major) total
+    row with subject NULL. student_count is exact when summed across (year, major)
+    cells because every student sits in exactly one (checked by check_student_cells).
+    """
+    conn.execute(f"""
+        CREATE TABLE {table} AS
+        SELECT
+            CAST(d.year AS INTEGER) AS year,
+            s.major,
+            c.subject,
+            CAST(SUM(f.score) AS BIGINT) AS score_sum,
+            COUNT(*) AS record_count,
+            CAST(SUM(CASE WHEN f.score >= 60 THEN 1 ELSE 0 END) AS BIGINT) AS pass_count,
+            CAST(SUM(CAST(f.attendance_flag AS INTEGER)) AS BIGINT) AS attended_count,
+            CAST(SUM(CASE WHEN f.score < 60 OR f.attendance_flag = FALSE THEN 1 ELSE 0 END) AS BIGINT) AS at_risk_count,
+            COUNT(DISTINCT f.student_key) AS student_count
+        FROM fact_student_performance f
+        JOIN dim_date d ON f.date_id = d.date_id
+        JOIN dim_course c ON f.course_key = c.course_key
+        JOIN dim_student s ON f.student_key = s.student_key
+        GROUP BY GROUPING SETS ((d.year, s.major, c.subject), (d.year, s.major))
+        ORDER BY year, major, subject NULLS FIRST;
+    """)
+
+def merge_rollup_table(conn, existing_path):
+    """
+    Fold the rollup of the new rows into the existing rollup file. Every column is
+    additive, and new batches only bring new students, so student_count stays exact.
+    """
+    conn.execute(f"""
+        CREATE TABLE agg_year_major_subject AS
+        SELECT
+            year,
+            major,
+            subject,
+            CAST(SUM(score_sum) AS BIGINT) AS score_sum,
+            CAST(SUM(record_count) AS BIGINT) AS record_count,
+            CAST(SUM(pass_count) AS BIGINT) AS pass_count,
+            CAST(SUM(attended_count) AS BIGINT) AS attended_count,
+            CAST(SUM(at_risk_count) AS BIGINT) AS at_risk_count,
+            CAST(SUM(student_count) AS BIGINT) AS student_count
+        FROM (
+            SELECT * FROM '{existing_path.as_posix()}'
+            UNION ALL
+            SELECT * FROM agg_increment
+        )
+        GROUP BY year, major, subject
+        ORDER BY year, major, subject NULLS FIRST;
+    """)
+
+def create_wide_table(conn):
+    """
+    Pre-joined rows for the dashboard's row-level panels. Filter columns are ENUMs
+    (dictionary-encoded in Parquet) and rows are sorted by (year, major, subject) so
+    the per-row-group min/max statistics let DuckDB skip row groups on filters.
+    """
+    conn.execute("CREATE TYPE major_enum AS ENUM (SELECT DISTINCT major FROM dim_student WHERE major IS NOT NULL ORDER BY major);")
+    conn.execute("CREATE TYPE subject_enum AS ENUM (SELECT DISTINCT subject FROM dim_course WHERE subject IS NOT NULL ORDER BY subject);")
+    conn.execute("CREATE TYPE university_enum AS ENUM (SELECT DISTINCT university_name FROM dim_university WHERE university_name IS NOT NULL ORDER BY university_name);")
+    conn.execute("""
+        CREATE TABLE fact_wide AS
+        SELECT
+            f.fact_id,
+            f.student_key,
+            CAST(d.year AS INTEGER) AS year,
+            CAST(s.major AS major_enum) AS major,
+            CAST(c.subject AS subject_enum) AS subject,
+            CAST(u.university_name AS university_enum) AS university_name,
+            s.student_id,
+            s.student_name,
+            d.semester,
+            f.score,
+            f.grade,
+            f.attendance_flag,
+            f.performance_category
+        FROM fact_student_performance f
+        JOIN dim_date d ON f.date_id = d.date_id
+        JOIN dim_university u ON f.university_key = u.university_key
+        JOIN dim_course c ON f.course_key = c.course_key
+        JOIN dim_student s ON f.student_key = s.student_key
+        ORDER BY year, major, subject, f.fact_id;
+    """)
+
+def resolve_source(source, base_dir):
+    """Raw data path, and whether it is read from its checked-in parts (no joined file)."""
+    data_path = Path(source) if source else get_data_path(base_dir)
+    if source or data_path.exists():
+        return data_path, False
+
+    # Without the joined file, read the checked-in parts in place instead of stitching a copy
+    print(f"⚠️ Data file not found at {data_path}")
+    if not chunked_store.has_parts(data_path):
+        print("❌ Error: Data parts not found.")
+        raise FileNotFoundError(f"No data file or parts found for {data_path}")
+    try:
+        chunked_store.verify_parts(data_path, check_hashes=False)
+    except chunked_store.ChunkedStoreError as e:
+        print(f"❌ Error: {e}")
+        raise
+    print("🧩 Reading data directly from its parts...")
+    return data_path, True
+
+def resolve_load_mode(output_dir, incremental, partition_by):
+    """
+    Manifest to extend (None for a full build) and the partition columns to write. An
+    incremental load without a usable manifest falls back to a full build, and keeps the
+    layout recorded in the manifest otherwise.
+    """
+    manifest = load_manifest(output_dir) if incremental else None
+    if incremental and manifest is None:
+        print("⚠️ No load manifest found, running a full build instead.")
+    elif manifest is not None and manifest.get('schema_version') != SCHEMA_VERSION:
+        print("⚠️ Star schema version changed, running a full build instead.")
+        manifest = None
+    if manifest is not None:
+        return manifest, manifest.get('partition_by')
+    return None, PARTITION_LAYOUTS[partition_by] if partition_by else None
+
+def output_names(sequence):
+    """Single-file suffix and partition file pattern of a full build (None) or an increment."""
+    if sequence is None:
+        return "", "data_{i}"
+    return f"_inc{sequence:03d}", f"inc{sequence:03d}_{{i}}"
+
+def stage_new_batches(conn, data_path, read_parts, loaded_batches):
+    """Stage the source rows of batches not loaded yet; returns their batch numbers."""
+    source_rows = open_parts_source(data_path) if read_parts else data_path.as_posix()
+    create_staging_table(conn, source_rows, loaded_batches)
+    return [row[0] for row in conn.execute(
+        "SELECT DISTINCT batch_number FROM staging_student_performance ORDER BY batch_number"
+    ).fetchall()]
+
+def load_dimensions(conn, output_dir, incremental, new_batches):
+    """Start from the existing dimension files (or empty tables), add the new members and export."""
+    if incremental:
+        for table in DIMENSION_TABLES:
+            conn.execute(f"CREATE TABLE {table} AS SELECT * FROM '{(output_dir / f'{table}.parquet').as_posix()}'")
+
+        # Fact ranges of existing students are closed; new rows for them would split the range
+        overlap = conn.execute("""
+            SELECT COUNT(DISTINCT student_id) FROM staging_student_performance
+            WHERE student_id IN (SELECT student_id FROM dim_student)
+        """).fetchone()[0]
+        if overlap:
+            raise ValueError(f"{overlap} students in batches {new_batches} are already loaded; run a full build instead")
+    else:
+        for statement in DIMENSION_DDL:
+            conn.execute(statement)
+
+    add_dimension_members(conn)
+    # Dimensions are small, so they are rewritten whole (existing keys unchanged)
+    for table in DIMENSION_TABLES:
+        export_table(conn, table, output_dir / f'{table}.parquet')
+
+def export_fact_tables(conn, output_dir, partition_by, sequence):
+    """Build the fact table and its offset index (numbered after earlier loads) and export both."""
+    suffix, file_pattern = output_names(sequence)
+    first_fact_id = 0
+    if sequence is not None:
+        first_fact_id = conn.execute(
+            f"SELECT COALESCE(MAX(fact_id_end), 0) FROM '{(output_dir / 'student_offsets*.parquet').as_posix()}'"
+        ).fetchone()[0]
+    create_fact_table(conn, first_fact_id)
+    # Built (and checked) before any fact file is written
+    create_offsets_table(conn)
+    # Rows are clustered by student_key (fact_id follows student_id order), so each
+    # student's courses form one contiguous fact_id range; small row groups let a
+    # range read touch a single row group.
+    if partition_by:
+        # year/major come from the dimensions and live in the directory names only
+        partition_columns = {'year': "CAST(d.year AS INTEGER) AS year", 'major': "s.major"}
+        fact_query = f"""
+            SELECT f.*, {', '.join(partition_columns[col] for col in partition_by)}
+            FROM fact_student_performance f
+            JOIN dim_date d ON f.date_id = d.date_id
+            JOIN dim_student s ON f.student_key = s.student_key
+            ORDER BY f.fact_id
+        """
+        export_partitioned(conn, fact_query, output_dir / 'fact_student_performance', partition_by,
+                           file_pattern, FACT_ROW_GROUP_SIZE, replace=sequence is None)
+    else:
+        export_table(conn, 'fact_student_performance', output_dir / f'fact_student_performance{suffix}.parquet', FACT_ROW_GROUP_SIZE)
+
+    export_table(conn, 'student_offsets', output_dir / f'student_offsets{suffix}.parquet')
+
+def export_rollup_table(conn, output_dir, incremental):
+    """Build the rollup of the staged rows (merged into the existing one for an increment) and export it."""
+    if incremental:
+        create_rollup_table(conn, 'agg_increment')
+        merge_rollup_table(conn, output_dir / 'agg_year_major_subject.parquet')
+    else:
+        create_rollup_table(conn, 'agg_year_major_subject')
+    export_table(conn, 'agg_year_major_subject', output_dir / 'agg_year_major_subject.parquet')
+
+def export_wide_table(conn, output_dir, partition_by, sequence):
+    """Build the denormalized wide fact table of the staged rows and export it."""
+    suffix, file_pattern = output_names(sequence)
+    create_wide_table(conn)
+    if partition_by:
+        export_partitioned(conn, "SELECT * FROM fact_wide ORDER BY year, major, subject, fact_id",
+                           output_dir / 'fact_wide', partition_by, file_pattern, WIDE_ROW_GROUP_SIZE,
+                           replace=sequence is None)
+    else:
+        export_table(conn, 'fact_wide', output_dir / f'fact_wide{suffix}.parquet', WIDE_ROW_GROUP_SIZE)
+
+def record_load(output_dir, manifest, partition_by, new_batches, row_count, sequence):
+    """
+    Record the loaded batches in the manifest: append the increment and its files, or,
+    after a full build, drop stale fact outputs and start a fresh manifest.
+    """
+    if sequence is not None:
+        suffix, _ = output_names(sequence)
+        if partition_by:
+            fact_files = [f'{table}/**/inc{sequence:03d}_*.parquet' for table in PARTITIONED_TABLES]
+        else:
+            fact_files = [f'{table}{suffix}.parquet' for table in PARTITIONED_TABLES]
+        manifest['loaded_batches'] = sorted(set(manifest['loaded_batches']) | set(new_batches))
+        manifest['increments'].append({
+            'sequence': sequence,
+            'batches': new_batches,
+            'rows': row_count,
+            'files': fact_files + [f'student_offsets{suffix}.parquet'],
+        })
+    else:
+        # A full build replaces every earlier increment (and the previous layout)
+        remove_stale_fact_outputs(output_dir, partition_by)
+        manifest = {
+            'schema_version': SCHEMA_VERSION,
+            'loaded_batches': new_batches,
+            'partition_by': partition_by,
+            'increments': [],
+        }
+    save_manifest(output_dir, manifest)
+    print(f"   - {MANIFEST_NAME} updated ({len(manifest['loaded_batches'])} batches loaded)")
+
+def convert_to_parquet(incremental=False, source=None, partition_by=None, output_dir=None):
     """
     Converts the raw data into a Star Schema and saves as separate Parquet files.
     This allows for faster loading and cloud deployment without heavy DB files.
+
+    With ``incremental`` only batches missing from the manifest are loaded: new
+    dimension members get keys after the existing ones, and the new fact rows are
+    written as extra ``*_incNNN.parquet`` files next to the existing ones.
+
+    ``partition_by`` (a key of ``PARTITION_LAYOUTS``) writes the fact and wide fact
+    tables as Hive-partitioned directories instead of single files. Incremental loads
+    keep the layout recorded in the manifest.
+
+    ``output_dir`` defaults to ``data/star_schema`` (the benchmarks build synthetic
+    schemas elsewhere). Errors are raised rather than exiting, so the dashboard can run the build in-process.
     """
     print("🔧 Starting Parquet Conversion Process...")
-    
+
     # Define paths
     base_dir = Path(__file__).parent.parent.parent
-    data_path = get_data_path(base_dir)
-    output_dir = base_dir / 'data' / 'star_schema'
-    
+    output_dir = Path(output_dir) if output_dir else base_dir / 'data' / 'star_schema'
+
     # Ensure output directory exists
     output_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Check if data exists, if not, try to stitch it
-    if not data_path.exists():
-        print(f"⚠️ Data file not found at {data_path}")
-        print(f"🧵 Attempting to stitch file from parts...")
-        
-        part1 = data_path.parent / f"{data_path.name}.part1"
-        if part1.exists():
-            with open(data_path, 'wb') as outfile:
-                i = 1
-                while True:
-                    part_path = data_path.parent / f"{data_path.name}.part{i}"
-                    if not part_path.exists():
-                        break
-                    print(f"   - Merging {part_path.name}...")
-                    with open(part_path, 'rb') as infile:
-                        outfile.write(infile.read())
-                    i += 1
-            print("✅ File stitched successfully!")
-        else:
-            print(f"❌ Error: Data parts not found.")
-            sys.exit(1)
-            
+
+    data_path, read_parts = resolve_source(source, base_dir)
+    manifest, partition_by = resolve_load_mode(output_dir, incremental, partition_by)
+    incremental = manifest is not None
+
     print(f"📂 Data source: {data_path}")
     print(f"💾 Output directory: {output_dir}")
-    
+
     try:
         # Connect to in-memory DuckDB
         conn = duckdb.connect(database=':memory:')
-        
+
         # 1. Load Raw Data
         print("1️⃣  Loading raw data...")
-        conn.execute(f"CREATE OR REPLACE VIEW raw_student_data AS SELECT * FROM '{data_path.as_posix()}'")
-        
+        loaded_batches = manifest['loaded_batches'] if incremental else []
+
         # 2. Create Staging Table
         print("2️⃣  Creating staging table...")
-        conn.execute("""
-            CREATE TABLE staging_student_performance AS
-            SELECT 
-                CAST(student_id AS VARCHAR) AS student_id,
-                CAST(student_name AS VARCHAR) AS student_name,
-                CAST(major AS VARCHAR) AS major,
-                CAST(university AS VARCHAR) AS university,
-                CAST(subject AS VARCHAR) AS subject,
-                CAST(score AS INTEGER) AS score,
-                CAST(grade AS VARCHAR(2)) AS grade,
-                CAST(attendance_flag AS BOOLEAN) AS attendance_flag,
-                CAST(performance_category AS VARCHAR) AS performance_category,
-                CAST(year AS INTEGER) AS year,
-                CAST(semester AS VARCHAR) AS semester,
-                CAST(date AS DATE) AS date,
-                CAST(credits AS INTEGER) AS credits,
-                CAST(course_level AS VARCHAR) AS course_level,
-                CAST(batch_number AS INTEGER) AS batch_number,
-                CAST(ipeds_institutional_factor AS INTEGER) AS ipeds_institutional_factor,
-                CAST(student_number AS INTEGER) AS student_number
-            FROM raw_student_data
-            WHERE student_id IS NOT NULL AND date IS NOT NULL;
-        """)
-        
+        new_batches = stage_new_batches(conn, data_path, read_parts, loaded_batches)
+        if incremental and not new_batches:
+            print("✅ Star schema is up to date, no new batches to load.")
+            conn.close()
+            return
+        check_student_cells(conn)
+
+        sequence = len(manifest['increments']) + 1 if incremental else None
+        if incremental:
+            print(f"➕ Loading batches {new_batches} as increment {sequence}")
+
         # 3. Create and Export Dimension Tables
         print("3️⃣  Creating and exporting dimension tables...")
-        
-        # dim_student
-        conn.execute("""
-            CREATE TABLE dim_student AS
-            SELECT 
-                ROW_NUMBER() OVER (ORDER BY student_id) AS student_key,
-                student_id,
-                student_name,
-                major,
-                student_number
-            FROM (SELECT DISTINCT student_id, student_name, major, student_number FROM staging_student_performance);
-        """)
-        conn.execute(f"COPY dim_student TO '{output_dir / 'dim_student.parquet'}' (FORMAT PARQUET);")
-        print("   - dim_student.parquet created")
-        
-        # dim_university
-        conn.execute("""
-            CREATE TABLE dim_university AS
-            SELECT 
-                ROW_NUMBER() OVER (ORDER BY university) AS university_key,
-                university AS university_name,
-                ipeds_institutional_factor
-            FROM (SELECT DISTINCT university, ipeds_institutional_factor FROM staging_student_performance);
-        """)
-        conn.execute(f"COPY dim_university TO '{output_dir / 'dim_university.parquet'}' (FORMAT PARQUET);")
-        print("   - dim_university.parquet created")
-        
-        # dim_course
-        conn.execute("""
-            CREATE TABLE dim_course AS
-            SELECT 
-                ROW_NUMBER() OVER (ORDER BY subject, credits, course_level) AS course_key,
-                subject,
-                credits,
-                course_level
-            FROM (SELECT DISTINCT subject, credits, course_level FROM staging_student_performance);
-        """)
-        conn.execute(f"COPY dim_course TO '{output_dir / 'dim_course.parquet'}' (FORMAT PARQUET);")
-        print("   - dim_course.parquet created")
-        
-        # dim_date
-        conn.execute("""
-            CREATE TABLE dim_date AS
-            SELECT 
-                ROW_NUMBER() OVER (ORDER BY date) AS date_id,
-                strftime('%Y%m%d', date) AS date_key,
-                date AS full_date,
-                EXTRACT(YEAR FROM date) AS year,
-                CASE WHEN EXTRACT(MONTH FROM date) BETWEEN 1 AND 6 THEN 'Spring' ELSE 'Fall' END AS semester,
-                EXTRACT(MONTH FROM date) AS month,
-                EXTRACT(DAY FROM date) AS day,
-                EXTRACT(DOW FROM date) AS day_of_week
-            FROM (SELECT DISTINCT date FROM staging_student_performance WHERE date IS NOT NULL);
-        """)
-        conn.execute(f"COPY dim_date TO '{output_dir / 'dim_date.parquet'}' (FORMAT PARQUET);")
-        print("   - dim_date.parquet created")
-        
+        load_dimensions(conn, output_dir, incremental, new_batches)
+
         # 4. Create and Export Fact Table
         print("4️⃣  Creating and exporting fact table...")
-        conn.execute("""
-            CREATE TABLE fact_student_performance AS
-            SELECT 
-                ROW_NUMBER() OVER (ORDER BY st.student_id, st.date, st.subject) AS fact_id,
-                s.student_key,
-                u.university_key,
-                c.course_key,
-                d.date_id,
-                st.score,
-                st.grade,
-                st.attendance_flag,
-                st.performance_category
-            FROM staging_student_performance st
-            JOIN dim_student s ON st.student_id = s.student_id
-            JOIN dim_university u ON st.university = u.university_name
-            JOIN dim_course c ON st.subject = c.subject AND st.credits = c.credits AND st.course_level = c.course_level
-            JOIN dim_date d ON st.date = d.full_date;
-        """)
-        conn.execute(f"COPY fact_student_performance TO '{output_dir / 'fact_student_performance.parquet'}' (FORMAT PARQUET);")
-        print("   - fact_student_performance.parquet created")
-        
-        print("✅ Conversion completed successfully!")
+        export_fact_tables(conn, output_dir, partition_by, sequence)
+
+        # 5. Create and Export Rollup Table
+        print("5️⃣  Creating and exporting rollup table...")
+        export_rollup_table(conn, output_dir, incremental)
+
+        # 6. Create and Export Denormalized Wide Fact Table
+        print("6️⃣  Creating and exporting wide fact table...")
+        export_wide_table(conn, output_dir, partition_by, sequence)
+
+        row_count = conn.execute("SELECT COUNT(*) FROM fact_student_performance").fetchone()[0]
         conn.close()
-        
+
+        # 7. Record the loaded batches
+        record_load(output_dir, manifest, partition_by, new_batches, row_count, sequence)
+
+        print("✅ Conversion completed successfully!")
+
     except Exception as e:
         print(f"❌ Error converting to parquet: {e}")
-        sys.exit(1)
+        raise
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build the star schema Parquet files.")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only load batches that are not in the load manifest yet")
+    parser.add_argument('--source', default=None,
+                        help="Parquet file or glob to load (defaults to the cleaned dataset)")
+    parser.add_argument('--partition-by', choices=sorted(PARTITION_LAYOUTS), default=None,
+                        help="Write the fact tables as Hive-partitioned directories")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    convert_to_parquet()
+    args = parse_args()
+    try:
+        convert_to_parquet(incremental=args.incremental, source=args.source, partition_by=args.partition_by)
+    except Exception:
+        sys.exit(1)
@@ -2,6 +2,8 @@
 Major and Subject Configuration for Realistic Course Generation
 """
 
+import numpy as np
+
 # Major categories with realistic subject pools
 MAJORS_CATALOG = {
     # STEM Majors
@@ -163,3 +165,99 @@ def assign_major():
         weights=list(MAJOR_WEIGHTS.values()),
         k=1
     )[0]
+
+
+# --- Bulk (whole-batch) assignment ---
+# Majors and subjects are integer-coded: MAJOR_NAMES[code] / SUBJECT_NAMES[code]
+
+MAJOR_NAMES = np.array(list(MAJOR_WEIGHTS.keys()))
+_MAJOR_CUM_WEIGHTS = np.cumsum(list(MAJOR_WEIGHTS.values()))
+
+SUBJECT_NAMES = np.array(sorted({
+    subject
+    for catalog in MAJORS_CATALOG.values()
+    for pool in ('core', 'related', 'electives')
+    for subject in catalog[pool]
+}))
+_SUBJECT_CODES = {subject: code for code, subject in enumerate(SUBJECT_NAMES)}
+
+# Per-major subject pools as code arrays, in MAJOR_NAMES order
+_MAJOR_POOLS = [
+    {pool: np.array([_SUBJECT_CODES[s] for s in MAJORS_CATALOG[major][pool]], dtype=np.int64)
+     for pool in ('core', 'related', 'electives')}
+    for major in MAJOR_NAMES
+]
+
+
+def assign_majors(n, rng):
+    """
+    Bulk version of assign_major(): draw n major codes with the enrollment weights.
+
+    Args:
+        n: Number of students
+        rng: numpy.random.Generator
+
+    Returns:
+        int array of codes into MAJOR_NAMES
+    """
+    return np.searchsorted(_MAJOR_CUM_WEIGHTS, rng.random(n) * _MAJOR_CUM_WEIGHTS[-1], side='right')
+
+
+def _sample_rows(pool, rows, k, rng, excluded=None):
+    """k distinct draws from pool for each of rows rows; excluded[i, j] removes pool[j] from row i."""
+    keys = rng.random((rows, len(pool)))
+    if excluded is not None:
+        keys[excluded] = np.inf
+    order = np.argsort(keys, axis=1)[:, :k]
+    picks = pool[order]
+    if excluded is not None:
+        # Rows with fewer than k candidates left are padded with -1
+        picks[np.isinf(np.take_along_axis(keys, order, axis=1))] = -1
+    return picks
+
+
+def sample_subjects_bulk(majors, counts, rng):
+    """
+    Bulk version of get_major_subjects(): pick subjects for every student at once.
+
+    Uses the same core/related/elective split as get_major_subjects, and each
+    student's subjects are listed in the same order (core, related, electives).
+
+    Args:
+        majors: int array of major codes (see assign_majors)
+        counts: int array of requested subjects per student (8-12)
+        rng: numpy.random.Generator
+
+    Returns:
+        (subjects, lengths): flat int array of codes into SUBJECT_NAMES, and the
+        number of subjects actually selected per student
+    """
+    majors = np.asarray(majors)
+    counts = np.asarray(counts)
+    max_subjects = int(counts.max()) if len(counts) else 0
+    selected = np.full((len(majors), max_subjects), -1, dtype=np.int64)
+
+    for major_code in np.unique(majors):
+        pools = _MAJOR_POOLS[major_code]
+        for num_subjects in np.unique(counts[majors == major_code]):
+            rows = np.flatnonzero((majors == major_code) & (counts == num_subjects))
+            num_core = min(len(pools['core']), max(4, num_subjects // 2))
+            num_related = min(len(pools['related']), max(2, num_subjects // 3))
+            num_electives = max(0, num_subjects - num_core - num_related)
+
+            picks = [
+                _sample_rows(pools['core'], len(rows), num_core, rng),
+                _sample_rows(pools['related'], len(rows), num_related, rng),
+            ]
+            if num_electives > 0:
+                # Electives already taken as core/related are not available again
+                taken = np.hstack(picks)
+                excluded = (taken[:, :, None] == pools['electives'][None, None, :]).any(axis=1)
+                picks.append(_sample_rows(pools['electives'], len(rows), num_electives, rng, excluded))
+
+            group = np.hstack(picks)
+            selected[rows, :group.shape[1]] = group
+
+    # Drop the padding; row-major order keeps each student's subjects together
+    valid = selected >= 0
+    return selected[valid], valid.sum(axis=1)
@@ -0,0 +1,94 @@
+"""
+Tests for the chunked, checksummed part storage.
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+# Add ETL directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "etl"))
+
+import chunked_store
+from chunked_store import ChunkedStoreError
+
+
+@pytest.fixture
+def parquet_file(tmp_path):
+    """A multi-row-group Parquet file of a few hundred KB."""
+    rng = np.random.default_rng(0)
+    table = pa.table({
+        'student_id': [f"S{i:06d}" for i in range(50_000)],
+        'score': rng.integers(0, 101, size=50_000),
+    })
+    path = tmp_path / "students.parquet"
+    pq.write_table(table, path, row_group_size=5_000)
+    return path
+
+
+class TestChunkedStore:
+    """Test split, verify, stitch and in-place reads of part sets."""
+
+    def test_split_and_stitch_roundtrip(self, parquet_file, tmp_path):
+        """Test that stitching the parts reproduces the original bytes."""
+        manifest = chunked_store.split_file(parquet_file, chunk_size_mb=0.1)
+
+        assert len(manifest['parts']) > 2
+        assert sum(part['size'] for part in manifest['parts']) == parquet_file.stat().st_size
+
+        output = chunked_store.stitch_file(parquet_file, tmp_path / "stitched.parquet")
+        assert output.read_bytes() == parquet_file.read_bytes()
+
+    def test_corrupt_part_detected(self, parquet_file, tmp_path):
+        """Test that a modified or truncated part fails verification."""
+        chunked_store.split_file(parquet_file, chunk_size_mb=0.1)
+        part = chunked_store.part_path(parquet_file, 2)
+        data = bytearray(part.read_bytes())
+        data[10] ^= 0xFF
+        part.write_bytes(data)
+
+        with pytest.raises(ChunkedStoreError):
+            chunked_store.verify_parts(parquet_file)
+        with pytest.raises(ChunkedStoreError):
+            chunked_store.stitch_file(parquet_file, tmp_path / "stitched.parquet")
+        assert not (tmp_path / "stitched.parquet").exists()
+
+        part.write_bytes(data[:-1])
+        with pytest.raises(ChunkedStoreError):
+            chunked_store.verify_parts(parquet_file, check_hashes=False)
+
+    def test_read_parquet_from_parts(self, parquet_file):
+        """Test that Parquet reads straight from the parts match the original file."""
+        expected = pq.read_table(parquet_file)
+        chunked_store.split_file(parquet_file, chunk_size_mb=0.1)
+        os.remove(parquet_file)
+
+        with chunked_store.open_parts(parquet_file) as f:
+            parquet = pq.ParquetFile(f)
+            assert parquet.num_row_groups == 10
+            assert parquet.read_row_group(7).equals(expected.slice(35_000, 5_000))
+            assert parquet.read().equals(expected)
+
+    def test_parts_without_manifest(self, parquet_file, tmp_path):
+        """Test that part sets written before manifests still stitch."""
+        chunked_store.split_file(parquet_file, chunk_size_mb=0.1)
+        os.remove(chunked_store.manifest_path(parquet_file))
+
+        output = chunked_store.stitch_file(parquet_file, tmp_path / "stitched.parquet")
+        assert output.read_bytes() == parquet_file.read_bytes()
+
+    def test_resplit_removes_stale_parts(self, parquet_file):
+        """Test that a split into fewer parts drops the leftover part files."""
+        chunked_store.split_file(parquet_file, chunk_size_mb=0.1)
+        manifest = chunked_store.split_file(parquet_file, chunk_size_mb=1)
+
+        assert len(manifest['parts']) == 1
+        assert not chunked_store.part_path(parquet_file, 2).exists()
+        assert json.loads(chunked_store.manifest_path(parquet_file).read_text()) == manifest
+        chunked_store.verify_parts(parquet_file)
@@ -0,0 +1,163 @@
+"""
+Tests for the dashboard DuckDB connection pool.
+"""
+
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+import pytest
+
+# Add dashboard directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "dash"))
+
+from connection_pool import ConnectionPool, PoolTimeout, QueryClass
+from query_cache import QueryCache
+
+
+@pytest.fixture
+def star_dir(tmp_path):
+    """A directory with one small Parquet file standing in for the star schema."""
+    pd.DataFrame({'score': list(range(100))}).to_parquet(tmp_path / "fact.parquet", index=False)
+    return tmp_path
+
+
+@pytest.fixture
+def connect(star_dir):
+    def _connect():
+        connection = duckdb.connect(database=':memory:')
+        connection.execute(f"CREATE VIEW fact AS SELECT * FROM '{star_dir / 'fact.parquet'}'")
+        return connection
+    return _connect
+
+
+class TestConnectionPool:
+    """Test cursor checkout, per-class limits and settings, and wait tracking."""
+
+    def test_concurrent_queries(self, star_dir, connect):
+        """Test that many threads share a bounded number of cursors over one database."""
+        pool = ConnectionPool(connect, max_cursors=3)
+        cache = QueryCache(star_dir)
+
+        def query(i):
+            # Distinct SQL per thread, so every call misses the cache and runs on a cursor
+            return cache.fetchone(pool, f"SELECT COUNT(*) + {i} FROM fact WHERE score >= ?", [50])[0]
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(query, range(64)))
+
+        assert results == [50 + i for i in range(64)]
+        assert pool.size()['open'] <= 3
+        assert pool.stats().set_index('query_class').loc['default', 'acquisitions'] == 64
+        pool.close()
+
+    def test_class_limit_and_timeout(self, connect):
+        """Test that a class at its concurrency limit waits, times out, and counts both."""
+        pool = ConnectionPool(connect, max_cursors=4, timeout=0.2,
+                              query_classes={'scan': QueryClass(max_concurrent=1)},
+                              panel_classes={'risk_list': 'scan'})
+        assert pool.class_of('risk_list') == 'scan'
+        assert pool.class_of('kpi_summary') == 'default'
+
+        with pool.cursor('scan'):
+            with pytest.raises(PoolTimeout):
+                with pool.cursor('scan'):
+                    pass
+            # Other classes still get a cursor
+            with pool.cursor('default') as cursor:
+                assert cursor.execute("SELECT COUNT(*) FROM fact").fetchone() == (100,)
+
+        holding, release = threading.Event(), threading.Event()
+
+        def hold():
+            with pool.cursor('scan'):
+                holding.set()
+                release.wait()
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        holding.wait()
+        threading.Timer(0.05, release.set).start()
+        with pool.cursor('scan'):
+            pass
+        holder.join()
+
+        stats = pool.stats().set_index('query_class')
+        assert stats.loc['scan', 'timeouts'] == 1
+        assert stats.loc['scan', 'waits'] == 1
+        assert stats.loc['scan', 'max_wait_ms'] > 0
+        pool.close()
+
+    def test_settings_scope(self, connect):
+        """Test that global settings go to the database and only session settings are per class."""
+        with pytest.raises(ValueError, match="threads"):
+            ConnectionPool(connect, query_classes={'scan': QueryClass(settings={'threads': 1})})
+
+        pool = ConnectionPool(connect, max_cursors=1, database_settings={'memory_limit': '512MB'},
+                              query_classes={'scan': QueryClass(settings={'streaming_buffer_size': '8MB'})})
+        setting = "SELECT current_setting('streaming_buffer_size'), current_setting('memory_limit')"
+        with pool.cursor('scan') as cursor:
+            buffer_size, memory_limit = cursor.execute(setting).fetchone()
+            assert buffer_size == '7.6 MiB'
+            reference = duckdb.connect(database=':memory:')
+            reference.execute("SET memory_limit = '512MB'")
+            assert memory_limit == reference.execute("SELECT current_setting('memory_limit')").fetchone()[0]
+            reference.close()
+        # The same cursor is reset when it is next checked out for another class
+        with pool.cursor('default') as cursor:
+            assert cursor.execute(setting).fetchone()[0] != '7.6 MiB'
+        pool.close()
+
+    def test_reopens_rebuilt_database(self, tmp_path):
+        """Test that a warehouse replaced on disk is reopened once the cursors in use are returned."""
+        warehouse = tmp_path / "warehouse.duckdb"
+
+        def build(value):
+            staging = tmp_path / "staging.duckdb"
+            connection = duckdb.connect(database=str(staging))
+            connection.execute(f"CREATE TABLE fact AS SELECT {value} AS score")
+            connection.close()
+            os.replace(staging, warehouse)
+
+        def fingerprint():
+            stat = warehouse.stat()
+            return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+        build(1)
+        pool = ConnectionPool(lambda: duckdb.connect(database=str(warehouse), read_only=True),
+                              max_cursors=2, timeout=5, fingerprint=fingerprint, check_interval=0)
+        query = "SELECT score FROM fact"
+        with pool.cursor() as cursor:
+            assert cursor.execute(query).fetchone() == (1,)
+
+        holding, release, held = threading.Event(), threading.Event(), []
+
+        def hold():
+            with pool.cursor() as cursor:
+                held.append(cursor)
+                holding.set()
+                release.wait()
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        holding.wait()
+        build(2)
+        threading.Timer(0.1, release.set).start()
+        # Waits for the held cursor, then reconnects
+        with pool.cursor() as cursor:
+            assert cursor.execute(query).fetchone() == (2,)
+        holder.join()
+        old_cursor = held[0]
+        assert pool.size()['reconnects'] == 1
+        with pytest.raises(duckdb.ConnectionException):
+            old_cursor.execute(query)
+
+        build(3)
+        pool.refresh()
+        with pool.cursor() as cursor:
+            assert cursor.execute(query).fetchone() == (3,)
+        pool.close()
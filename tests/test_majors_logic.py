@@ -1,46 +1,82 @@
 """
-Simple direct test of major-based generation logic
+Tests for the major-based subject selection in majors_config.
 """
+
 import sys
-sys.path.insert(0, 'scripts')
+from pathlib import Path
 
-from majors_config import assign_major, get_major_subjects
-import pandas as pd
 import numpy as np
+import pytest
+
+# Add ETL directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "etl"))
+
+from majors_config import (
+    MAJORS_CATALOG, MAJOR_WEIGHTS, MAJOR_NAMES, SUBJECT_NAMES,
+    assign_major, assign_majors, get_major_subjects, sample_subjects_bulk,
+)
+
+
+class TestMajorLogic:
+    """Test the per-student major and subject functions."""
+
+    def test_assign_major(self):
+        """Test that assigned majors come from the catalog."""
+        majors = [assign_major() for _ in range(100)]
+        assert set(majors) <= set(MAJORS_CATALOG)
+
+    @pytest.mark.parametrize("major", ["Computer Science", "Biology", "Business Administration"])
+    def test_major_subjects(self, major):
+        """Test that a major's subjects are distinct and drawn from its catalog."""
+        catalog = MAJORS_CATALOG[major]
+        subjects = get_major_subjects(major, num_subjects=10)
+
+        assert len(subjects) <= 10
+        assert len(set(subjects)) == len(subjects)
+        assert set(subjects) <= set(catalog['core'] + catalog['related'] + catalog['electives'])
+
+    def test_unknown_major(self):
+        """Test that an unknown major is rejected."""
+        with pytest.raises(ValueError, match="Unknown major"):
+            get_major_subjects("Astrology")
+
+
+class TestBulkAssignment:
+    """Test that the bulk API matches the per-student functions."""
+
+    def test_major_weights(self):
+        """Test that bulk majors follow the enrollment weights."""
+        codes = assign_majors(200_000, np.random.default_rng(0))
+        shares = np.bincount(codes, minlength=len(MAJOR_NAMES)) / len(codes)
+        expected = np.array([MAJOR_WEIGHTS[m] for m in MAJOR_NAMES])
+        assert np.abs(shares - expected).max() < 0.005
+
+    def test_subjects_come_from_major_catalog(self):
+        """Test subject counts, pools and uniqueness per student."""
+        rng = np.random.default_rng(1)
+        majors = assign_majors(2_000, rng)
+        counts = rng.integers(8, 13, size=len(majors))
+        subjects, lengths = sample_subjects_bulk(majors, counts, rng)
+
+        assert lengths.sum() == len(subjects)
+        assert (lengths <= counts).all()
+
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        for i, major_code in enumerate(majors[:200]):
+            catalog = MAJORS_CATALOG[MAJOR_NAMES[major_code]]
+            names = list(SUBJECT_NAMES[subjects[offsets[i]:offsets[i + 1]]])
+            num_core = min(len(catalog['core']), max(4, counts[i] // 2))
+
+            assert len(set(names)) == len(names)
+            assert set(names[:num_core]) <= set(catalog['core'])
+            assert set(names) <= set(catalog['core'] + catalog['related'] + catalog['electives'])
 
-print("🧪 Testing Major-Based Subject Selection\n" + "="*60)
-
-# Test 1: Major assignment
-print("\n1️⃣ Testing Major Assignment:")
-majors = [assign_major() for _ in range(100)]
-major_counts = pd.Series(majors).value_counts()
-print(major_counts.head(10))
-
-# Test 2: Subject selection for different majors
-print("\n2️⃣ Testing Subject Selection:")
-test_majors = ["Computer Science", "Biology", "Business Administration"]
-
-for major in test_majors:
-    subjects = get_major_subjects(major, num_subjects=10)
-    print(f"\n{major} (10 subjects):")
-    print(f"  {', '.join(subjects)}")
-
-# Test 3: Verify single-year logic
-print("\n3️⃣ Simulating 5 Students with Single Year:")
-print("-" * 60)
-
-np.random.seed(42)
-for i in range(1, 6):
-    student_id = f"Student_{i:05d}"
-    graduation_year = np.random.randint(2010, 2025)
-    major = assign_major()
-    num_subjects = np.random.randint(8, 13)
-    subjects = get_major_subjects(major, num_subjects)
-    
-    print(f"\n{student_id}:")
-    print(f"  Major: {major}")
-    print(f"  Graduation Year: {graduation_year}")
-    print(f"  Subjects ({len(subjects)}): {', '.join(subjects[:3])}...")
-    
-print("\n✅ All tests passed!")
-print("\nNow ready to generate full dataset with this logic.")
+    def test_reproducible(self):
+        """Test that the same seed gives the same assignment."""
+        results = []
+        for _ in range(2):
+            rng = np.random.default_rng(42)
+            majors = assign_majors(500, rng)
+            subjects, lengths = sample_subjects_bulk(majors, np.full(500, 10), rng)
+            results.append((majors, subjects, lengths))
+        assert all(np.array_equal(a, b) for a, b in zip(*results))
@@ -0,0 +1,121 @@
+"""
+Tests for the dashboard query instrumentation.
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+import pytest
+
+# Add dashboard directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "dash"))
+
+from connection_pool import ConnectionPool
+from perf import QueryRecorder, make_slow_query_logger
+from query_cache import QueryCache
+
+
+@pytest.fixture
+def star_dir(tmp_path):
+    """A directory with one small Parquet file standing in for the star schema."""
+    pd.DataFrame({'score': [50, 70, 90]}).to_parquet(tmp_path / "fact.parquet", index=False)
+    return tmp_path
+
+
+@pytest.fixture
+def conn(star_dir):
+    connection = duckdb.connect(database=':memory:')
+    connection.execute(f"CREATE VIEW fact AS SELECT * FROM '{star_dir / 'fact.parquet'}'")
+    yield connection
+    connection.close()
+
+
+class TestQueryRecorder:
+    """Test per-panel timings, cache hit tagging and the slow-query log."""
+
+    def test_records_panel_timings(self, conn):
+        """Test that each call is recorded under its panel with execute and fetch time."""
+        recorder = QueryRecorder()
+        df = recorder.fetchdf(conn, "SELECT * FROM fact WHERE score >= ?", [60], panel="histogram")
+        row = recorder.fetchone(conn, "SELECT COUNT(*) FROM fact", panel="kpi")
+
+        assert len(df) == 2 and row == (3,)
+        recent = recorder.recent()
+        assert list(recent['panel']) == ["kpi", "histogram"]
+        assert list(recent['rows']) == [1, 2]
+        assert (recent['execute_ms'] >= 0).all() and (recent['fetch_ms'] >= 0).all()
+        assert (recent['total_ms'] == recent['execute_ms'] + recent['fetch_ms']).all()
+
+    def test_cache_hits_are_tagged(self, star_dir, conn):
+        """Test that the query cache reports hits to the recorder without re-running."""
+        recorder = QueryRecorder()
+        cache = QueryCache(star_dir, recorder=recorder)
+        cache.fetchdf(conn, "SELECT * FROM fact", panel="risk_list")
+        cache.fetchdf(conn, "SELECT * FROM fact", panel="risk_list")
+
+        stats = recorder.panel_stats().set_index('panel')
+        assert stats.loc['risk_list', 'calls'] == 2
+        assert stats.loc['risk_list', 'cache_hits'] == 1
+        assert list(recorder.recent()['cached']) == [True, False]
+
+    def test_slow_query_log(self, conn, tmp_path):
+        """Test that slow queries are logged once per interval with their EXPLAIN ANALYZE profile."""
+        log_path = tmp_path / "logs" / "slow.log"
+        recorder = QueryRecorder(slow_query_ms=0, logger=make_slow_query_logger(log_path))
+        for _ in range(3):
+            recorder.fetchdf(conn, "SELECT * FROM fact WHERE score > ?", [10], panel="heatmap")
+
+        recorder.wait_for_explains()
+        for handler in recorder.logger.handlers:
+            handler.flush()
+        log = log_path.read_text(encoding="utf-8")
+        assert recorder.slow_queries == 3
+        assert log.count("slow query panel=heatmap") == 1
+        assert "Total Time" in log
+        assert recorder.recent()['slow'].all()
+
+    def test_explain_runs_after_the_cursor_is_returned(self, star_dir, tmp_path):
+        """Test that EXPLAIN ANALYZE runs in the background on a free pooled cursor, or is skipped."""
+        def connect():
+            connection = duckdb.connect(database=':memory:')
+            connection.execute(f"CREATE VIEW fact AS SELECT * FROM '{star_dir / 'fact.parquet'}'")
+            return connection
+
+        pool = ConnectionPool(connect, max_cursors=1)
+        log_path = tmp_path / "slow.log"
+        recorder = QueryRecorder(slow_query_ms=0, logger=make_slow_query_logger(log_path))
+        # With a single cursor the profile can only run once the session has returned it
+        assert recorder.fetchone(pool, "SELECT COUNT(*) FROM fact", panel="kpi") == (3,)
+        recorder.wait_for_explains()
+        for handler in recorder.logger.handlers:
+            handler.flush()
+        assert "Total Time" in log_path.read_text(encoding="utf-8")
+
+        # A busy pool skips the profile instead of waiting for a cursor
+        holding, release = threading.Event(), threading.Event()
+
+        def hold():
+            with pool.cursor():
+                holding.set()
+                release.wait()
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        holding.wait()
+        recorder._log_slow_query(pool, "SELECT MAX(score) FROM fact", None, "kpi", 1.0, 1.0)
+        recorder.wait_for_explains()
+        release.set()
+        holder.join()
+        assert recorder.explains_skipped == 1
+        assert pool.stats().set_index('query_class').loc['default', 'timeouts'] == 0
+        pool.close()
+
+    def test_history_is_bounded(self, conn):
+        """Test that only the last N timings are kept."""
+        recorder = QueryRecorder(history=5)
+        for i in range(8):
+            recorder.fetchone(conn, "SELECT ?", [i], panel=f"p{i}")
+        assert list(recorder.recent()['panel']) == ["p7", "p6", "p5", "p4", "p3"]
@@ -0,0 +1,144 @@
+"""
+Tests for the dashboard query result cache.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+import pytest
+
+# Add dashboard directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "dash"))
+
+from connection_pool import ConnectionPool
+from query_cache import QueryCache, normalize_sql
+
+
+class FakeClock:
+    """Manually advanced clock for TTL tests."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def star_dir(tmp_path):
+    """A directory with one small Parquet file standing in for the star schema."""
+    pd.DataFrame({'score': [50, 70, 90]}).to_parquet(tmp_path / "fact.parquet", index=False)
+    return tmp_path
+
+
+@pytest.fixture
+def conn(star_dir):
+    connection = duckdb.connect(database=':memory:')
+    connection.execute(f"CREATE VIEW fact AS SELECT * FROM '{star_dir / 'fact.parquet'}'")
+    yield connection
+    connection.close()
+
+
+class TestQueryCache:
+    """Test keying, expiry, eviction and invalidation."""
+
+    def test_normalize_sql(self):
+        """Test that whitespace differences normalize to the same text."""
+        assert normalize_sql("SELECT  *\n    FROM t") == normalize_sql("SELECT * FROM t")
+
+    def test_hit_and_miss_counters(self, star_dir, conn):
+        """Test that identical SQL + params is served from the cache."""
+        cache = QueryCache(star_dir)
+        first = cache.fetchone(conn, "SELECT COUNT(*) FROM fact WHERE score >= ?", [60])
+        second = cache.fetchone(conn, "SELECT COUNT(*)\n FROM fact WHERE score >= ?", [60])
+        cache.fetchone(conn, "SELECT COUNT(*) FROM fact WHERE score >= ?", [80])
+
+        assert first == second == (2,)
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 2
+
+    def test_ttl_expiry(self, star_dir, conn):
+        """Test that entries older than the TTL are re-executed."""
+        clock = FakeClock()
+        cache = QueryCache(star_dir, ttl_seconds=10, clock=clock)
+        cache.fetchdf(conn, "SELECT * FROM fact")
+        clock.now = 11
+        cache.fetchdf(conn, "SELECT * FROM fact")
+        assert cache.stats()['misses'] == 2
+
+    def test_lru_eviction(self, star_dir, conn):
+        """Test that the least recently used entry is evicted first."""
+        cache = QueryCache(star_dir, max_entries=2)
+        cache.fetchone(conn, "SELECT 1")
+        cache.fetchone(conn, "SELECT 2")
+        cache.fetchone(conn, "SELECT 1")  # refresh "SELECT 1"
+        cache.fetchone(conn, "SELECT 3")  # evicts "SELECT 2"
+
+        assert cache.stats()['evictions'] == 1
+        cache.fetchone(conn, "SELECT 1")
+        assert cache.stats()['hits'] == 2
+        cache.fetchone(conn, "SELECT 2")
+        assert cache.stats()['misses'] == 4
+
+    def test_byte_budget(self, star_dir, conn):
+        """Test that results larger than the byte budget are not cached."""
+        cache = QueryCache(star_dir, max_bytes=1)
+        cache.fetchdf(conn, "SELECT * FROM fact")
+        assert cache.stats()['entries'] == 0
+
+    def test_invalidation_on_parquet_change(self, star_dir, conn):
+        """Test that rewriting a Parquet file drops cached results."""
+        clock = FakeClock()
+        cache = QueryCache(star_dir, check_interval=0, clock=clock)
+        assert cache.fetchone(conn, "SELECT COUNT(*) FROM fact") == (3,)
+
+        pd.DataFrame({'score': [10]}).to_parquet(star_dir / "fact.parquet", index=False)
+        stat = (star_dir / "fact.parquet").stat()
+        os.utime(star_dir / "fact.parquet", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        assert cache.fetchone(conn, "SELECT COUNT(*) FROM fact") == (1,)
+        assert cache.stats()['invalidations'] == 1
+
+    def test_arrow_and_numpy_results(self, star_dir, conn):
+        """Test that Arrow and NumPy fetches are cached separately from DataFrames and sized."""
+        cache = QueryCache(star_dir)
+        table = cache.fetch_arrow(conn, "SELECT * FROM fact")
+        arrays = cache.fetchnumpy(conn, "SELECT * FROM fact")
+        assert cache.fetch_arrow(conn, "SELECT * FROM fact") is table
+
+        assert table.column('score').to_pylist() == [50, 70, 90]
+        assert arrays['score'].tolist() == [50, 70, 90]
+        stats = cache.stats()
+        assert stats['entries'] == 2 and stats['hits'] == 1
+        assert stats['bytes'] >= table.nbytes + arrays['score'].nbytes
+
+    def test_rebuilt_warehouse_returns_fresh_results(self, tmp_path):
+        """Test that after the warehouse file is replaced the cache re-runs on a reopened pool."""
+        warehouse = tmp_path / "warehouse.duckdb"
+
+        def build(value):
+            staging = tmp_path / "staging.duckdb"
+            connection = duckdb.connect(database=str(staging))
+            connection.execute(f"CREATE TABLE fact AS SELECT {value} AS score")
+            connection.close()
+            os.replace(staging, warehouse)
+
+        build(1)
+        # The pool has no fingerprint of its own: only the cache invalidation reopens it
+        pool = ConnectionPool(lambda: duckdb.connect(database=str(warehouse), read_only=True), max_cursors=2)
+        clock = FakeClock()
+        cache = QueryCache(warehouse, check_interval=0, clock=clock)
+        assert cache.fetchone(pool, "SELECT score FROM fact") == (1,)
+
+        build(2)
+        clock.now = 1
+        assert cache.fetchone(pool, "SELECT score FROM fact") == (2,)
+        assert cache.fetchone(pool, "SELECT score FROM fact") == (2,)
+        stats = cache.stats()
+        assert stats['invalidations'] == 1 and stats['hits'] == 1
+        assert pool.size()['reconnects'] == 1
+        pool.close()
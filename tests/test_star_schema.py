@@ -0,0 +1,283 @@
+"""
+Tests for the star-schema build (generate_star_schema.convert_to_parquet).
+"""
+
+import datetime
+import sys
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+import pytest
+
+# Add ETL and dashboard directories to path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "etl"))
+sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "dash"))
+
+from generate_star_schema import convert_to_parquet, create_offsets_table
+from queries import (
+    HISTORY_QUERY, HIST_QUERY, RISK_LIST_QUERY, RISK_SCATTER_QUERY, STUDENT_QUERY,
+    build_wide_filter, create_star_schema_views,
+)
+
+MAJORS = ["Biology", "Computer Science", "Physics"]
+SUBJECTS = ["Calculus", "Chemistry", "Statistics", "Writing"]
+UNIVERSITIES = ["North College", "South University"]
+
+
+def make_source(path, batches, students_per_batch=6, overrides=None):
+    """
+    A small raw extract: each batch brings new students (ids sort after earlier batches)
+    taking three courses in one year (2019 + batch number).
+    """
+    rows = []
+    for batch in batches:
+        year = 2019 + batch
+        for i in range(students_per_batch):
+            number = batch * 1000 + i
+            for course in range(3):
+                score = (number * 7 + course * 13) % 60 + 40
+                rows.append({
+                    'student_id': f"S{number:06d}",
+                    'student_name': f"Student {number}",
+                    'major': MAJORS[number % len(MAJORS)],
+                    'university': UNIVERSITIES[number % len(UNIVERSITIES)],
+                    'subject': SUBJECTS[(number + course) % len(SUBJECTS)],
+                    'score': score,
+                    'grade': 'A' if score >= 90 else 'B' if score >= 75 else 'C' if score >= 60 else 'F',
+                    'attendance_flag': (number + course) % 4 != 0,
+                    'performance_category': 'Pass' if score >= 60 else 'Fail',
+                    'year': year,
+                    'semester': 'Spring' if course < 2 else 'Fall',
+                    'date': datetime.date(year, 3 if course < 2 else 9, 1 + course),
+                    'credits': 3,
+                    'course_level': 'Undergraduate',
+                    'batch_number': batch,
+                    'ipeds_institutional_factor': 1,
+                    'student_number': number,
+                })
+    df = pd.DataFrame(rows)
+    for column, values in (overrides or {}).items():
+        df[column] = values(df)
+    df.to_parquet(path, index=False)
+    return path
+
+
+def connect_views(star_dir):
+    """In-memory DuckDB with the dashboard's views over a built star schema."""
+    conn = duckdb.connect(database=':memory:')
+    create_star_schema_views(conn, star_dir)
+    return conn
+
+
+def read_table(star_dir, pattern, order_by):
+    """All rows of a star-schema table (every file matching ``pattern``) as a DataFrame."""
+    return duckdb.sql(f"SELECT * FROM '{star_dir / pattern}' ORDER BY {order_by}").df()
+
+
+class TestRollupStudentCount:
+    """Test the one-(year, major)-cell-per-student invariant behind the summed student_count."""
+
+    def test_summed_student_count_is_exact(self, tmp_path):
+        """Test that summing student_count over the (year, major) totals counts every student once."""
+        star_dir = tmp_path / "star"
+        convert_to_parquet(source=make_source(tmp_path / "raw.parquet", [1, 2, 3]), output_dir=star_dir)
+
+        rollup = read_table(star_dir, "agg_year_major_subject.parquet", "year, major, subject")
+        totals = rollup[rollup['subject'].isna()]
+        assert totals['student_count'].sum() == 18
+
+    def test_student_in_two_years_fails_the_build(self, tmp_path):
+        """Test that a student with courses in two years stops the build instead of double counting."""
+        def move_first_course(df):
+            dates = df['date'].copy()
+            dates.iloc[0] = datetime.date(2030, 3, 1)
+            return dates
+
+        source = make_source(tmp_path / "raw.parquet", [1], overrides={'date': move_first_course})
+        with pytest.raises(ValueError, match="more than one year or major"):
+            convert_to_parquet(source=source, output_dir=tmp_path / "star")
+        assert not (tmp_path / "star" / "dim_student.parquet").exists()
+
+
+class TestStudentOffsets:
+    """Test the fact_id range index behind the student profile."""
+
+    # The profile before the offset index: join on the student, scan the whole fact table
+    JOIN_HISTORY_QUERY = """
+        SELECT d.year, d.semester, c.subject, f.score, f.grade, f.attendance_flag
+        FROM fact_student_performance f
+        JOIN dim_student s ON f.student_key = s.student_key
+        JOIN dim_date d ON f.date_id = d.date_id
+        JOIN dim_course c ON f.course_key = c.course_key
+        WHERE s.student_id = ?
+    """
+
+    def test_profile_matches_join(self, tmp_path):
+        """Test that every student's range-read profile equals the join-based one."""
+        star_dir = tmp_path / "star"
+        convert_to_parquet(source=make_source(tmp_path / "raw.parquet", [1, 2]), output_dir=star_dir)
+        conn = connect_views(star_dir)
+        columns = ['year', 'semester', 'subject', 'score', 'grade', 'attendance_flag']
+
+        numbers = [row[0] for row in conn.execute("SELECT student_number FROM dim_student").fetchall()]
+        assert len(numbers) == 12
+        for number in numbers:
+            student = conn.execute(STUDENT_QUERY, [number]).fetchdf()
+            fact_range = [int(student['fact_id_start'].iloc[0]), int(student['fact_id_end'].iloc[0])]
+            by_range = conn.execute(HISTORY_QUERY, fact_range).fetchdf()
+            by_join = conn.execute(self.JOIN_HISTORY_QUERY, [student['student_id'].iloc[0]]).fetchdf()
+            pd.testing.assert_frame_equal(by_range.sort_values(columns).reset_index(drop=True),
+                                          by_join.sort_values(columns).reset_index(drop=True))
+        conn.close()
+
+    def test_interleaved_facts_are_rejected(self):
+        """Test that fact rows not clustered by student fail the offset index build."""
+        conn = duckdb.connect(database=':memory:')
+        conn.execute("""
+            CREATE TABLE fact_student_performance AS
+            SELECT * FROM (VALUES (1, 10), (2, 20), (3, 10), (4, 20)) t(fact_id, student_key)
+        """)
+        with pytest.raises(ValueError, match="not clustered by student"):
+            create_offsets_table(conn)
+        conn.close()
+
+
+class TestIncrementalLoad:
+    """Test that an incremental load matches a from-scratch build of the same batches."""
+
+    def test_increment_matches_full_build(self, tmp_path):
+        """Test stable keys, continued fact_ids and the merged rollup against a full build."""
+        incremental_dir, full_dir = tmp_path / "incremental", tmp_path / "full"
+        convert_to_parquet(source=make_source(tmp_path / "first.parquet", [1, 2]), output_dir=incremental_dir)
+        students_before = read_table(incremental_dir, "dim_student.parquet", "student_key")
+        last_fact_id = read_table(incremental_dir, "fact_student_performance.parquet", "fact_id")['fact_id'].max()
+
+        all_batches = make_source(tmp_path / "all.parquet", [1, 2, 3])
+        convert_to_parquet(incremental=True, source=all_batches, output_dir=incremental_dir)
+        convert_to_parquet(source=all_batches, output_dir=full_dir)
+
+        # Keys handed out before the increment are unchanged; new ones come after them
+        students_after = read_table(incremental_dir, "dim_student.parquet", "student_key")
+        pd.testing.assert_frame_equal(students_after.head(len(students_before)), students_before)
+        increment = read_table(incremental_dir, "fact_student_performance_inc001.parquet", "fact_id")
+        assert increment['fact_id'].min() == last_fact_id + 1
+
+        tables = [
+            ("dim_student.parquet", "student_key"),
+            ("dim_university.parquet", "university_key"),
+            ("dim_course.parquet", "course_key"),
+            ("dim_date.parquet", "date_id"),
+            ("fact_student_performance*.parquet", "fact_id"),
+            ("student_offsets*.parquet", "student_key"),
+            ("fact_wide*.parquet", "fact_id"),
+            ("agg_year_major_subject.parquet", "year, major, subject NULLS FIRST"),
+        ]
+        for pattern, order_by in tables:
+            pd.testing.assert_frame_equal(read_table(incremental_dir, pattern, order_by),
+                                          read_table(full_dir, pattern, order_by), check_dtype=False,
+                                          obj=pattern)
+
+    def test_up_to_date_and_reloaded_students(self, tmp_path):
+        """Test that a load with no new batches is a no-op and reloading known students fails."""
+        star_dir = tmp_path / "star"
+        source = make_source(tmp_path / "raw.parquet", [1, 2])
+        convert_to_parquet(source=source, output_dir=star_dir)
+        rollup_mtime = (star_dir / "agg_year_major_subject.parquet").stat().st_mtime_ns
+
+        convert_to_parquet(incremental=True, source=source, output_dir=star_dir)
+        assert (star_dir / "agg_year_major_subject.parquet").stat().st_mtime_ns == rollup_mtime
+        assert not list(star_dir.glob("*_inc*.parquet"))
+
+        # Batch 3 re-delivers students of batch 1: their fact_id ranges are already closed
+        def batch_one_ids(df):
+            return df['student_id'].str.replace("S003", "S001", regex=False)
+
+        reloaded = make_source(tmp_path / "reloaded.parquet", [3], overrides={'student_id': batch_one_ids})
+        with pytest.raises(ValueError, match="already loaded"):
+            convert_to_parquet(incremental=True, source=reloaded, output_dir=star_dir)
+
+
+class TestPartitionedLayouts:
+    """Test that the Hive-partitioned fact layouts answer the dashboard queries like single files."""
+
+    FILTERS = [("All", "All", "All"), (2020, "All", "All"), ("All", "Physics", "All"),
+               (2021, "Biology", "Statistics")]
+
+    def dashboard_results(self, star_dir):
+        """Row-level panel and profile results for every filter state, in a comparable form."""
+        conn = connect_views(star_dir)
+        results = {}
+        for filters in self.FILTERS:
+            where_clause, params = build_wide_filter(*filters)
+            for name, query in [("hist", HIST_QUERY), ("scatter", RISK_SCATTER_QUERY), ("risk", RISK_LIST_QUERY)]:
+                df = conn.execute(query.format(where_clause=where_clause), params).fetchdf()
+                # Partition columns come back as VARCHAR instead of the ENUM of the single file
+                df = df.astype({c: str for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)})
+                results[(name, filters)] = df.sort_values(list(df.columns)).reset_index(drop=True)
+        for number in [1000, 2001]:
+            student = conn.execute(STUDENT_QUERY, [number]).fetchdf()
+            fact_range = [int(student['fact_id_start'].iloc[0]), int(student['fact_id_end'].iloc[0])]
+            results[("profile", number)] = conn.execute(HISTORY_QUERY, fact_range).fetchdf()
+        conn.close()
+        return results
+
+    def assert_same_results(self, actual, expected):
+        assert actual.keys() == expected.keys()
+        for key in expected:
+            pd.testing.assert_frame_equal(actual[key], expected[key], check_dtype=False, obj=str(key))
+
+    def test_layouts_match_single_file(self, tmp_path):
+        """Test each layout in turn in one directory, which also exercises the stale-output cleanup."""
+        source = make_source(tmp_path / "raw.parquet", [1, 2, 3])
+        star_dir = tmp_path / "star"
+        convert_to_parquet(source=source, output_dir=star_dir)
+        expected = self.dashboard_results(star_dir)
+
+        for layout in ["year", "year,major"]:
+            convert_to_parquet(source=source, partition_by=layout, output_dir=star_dir)
+            assert (star_dir / "fact_wide").is_dir() and (star_dir / "fact_student_performance").is_dir()
+            assert not list(star_dir.glob("fact_*.parquet"))
+            self.assert_same_results(self.dashboard_results(star_dir), expected)
+
+        # Back to single files: the partition directories are removed
+        convert_to_parquet(source=source, output_dir=star_dir)
+        assert not (star_dir / "fact_wide").exists() and not (star_dir / "fact_student_performance").exists()
+        self.assert_same_results(self.dashboard_results(star_dir), expected)
+
+    def test_incremental_load_keeps_the_layout(self, tmp_path):
+        """Test that an increment into a partitioned schema matches a single-file full build."""
+        full_dir, partitioned_dir = tmp_path / "full", tmp_path / "partitioned"
+        all_batches = make_source(tmp_path / "all.parquet", [1, 2, 3])
+        convert_to_parquet(source=all_batches, output_dir=full_dir)
+
+        convert_to_parquet(source=make_source(tmp_path / "first.parquet", [1, 2]), partition_by="year,major",
+                           output_dir=partitioned_dir)
+        convert_to_parquet(incremental=True, source=all_batches, output_dir=partitioned_dir)
+        assert list(partitioned_dir.glob("fact_wide/year=2022/major=*/inc001_*.parquet"))
+        self.assert_same_results(self.dashboard_results(partitioned_dir), self.dashboard_results(full_dir))
+
+
+class TestRiskPanels:
+    """Test that the capped risk panels are not just the first cohort of the sorted fact_wide."""
+
+    def test_scatter_and_list_span_the_cohorts(self, tmp_path):
+        """Test that the unfiltered scatter covers several years and the list holds the lowest scores."""
+        star_dir = tmp_path / "star"
+        # Score encodes the year (2020 -> 40, ...), so the scatter's scores show which years it covers;
+        # each year alone has more rows than either panel returns
+        source = make_source(tmp_path / "raw.parquet", [1, 2, 3], students_per_batch=800,
+                             overrides={'score': lambda df: df['year'] - 1980})
+        convert_to_parquet(source=source, output_dir=star_dir)
+        conn = connect_views(star_dir)
+        where_clause, params = build_wide_filter("All", "All", "All")
+
+        scatter = conn.execute(RISK_SCATTER_QUERY.format(where_clause=where_clause), params).fetchdf()
+        assert len(scatter) == 2000
+        assert scatter['score'].nunique() > 1
+
+        risk = conn.execute(RISK_LIST_QUERY.format(where_clause=where_clause), params).fetchdf()
+        assert len(risk) == 1000
+        assert risk['score'].is_monotonic_increasing
+        assert risk['score'].iloc[0] == 40
+        conn.close()